@@ -0,0 +1,183 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""In-memory stand-in for the Ceilometer API used by the monitor panels.
+
+FakeCeilometer serves synthetic ``instance.process.list`` samples of a
+configurable number of instances, processes and history depth, and counts
+the API calls made. patch() swaps it in for the ``api.ceilometer``
+functions used by the panels, so benchmarks and tests run offline.
+"""
+
+import collections
+import contextlib
+import datetime
+import json
+import operator
+import random
+
+from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor.benchmarks import synthetic
+from openstack_dashboard.dashboards.monitor.instances import meters
+
+_OPERATORS = {
+    'eq': operator.eq, '=': operator.eq,
+    'gt': operator.gt, '>': operator.gt,
+    'ge': operator.ge, '>=': operator.ge,
+    'lt': operator.lt, '<': operator.lt,
+    'le': operator.le, '<=': operator.le,
+}
+
+
+class FakeSample(object):
+    """A sample with the fields of api.ceilometer.Sample."""
+
+    def __init__(self, resource_id, project_id, timestamp, counter_volume):
+        self.resource_id = resource_id
+        self.project_id = project_id
+        self.timestamp = timestamp
+        self.counter_volume = counter_volume
+        self.resource_metadata = {'display_name': 'vm-%s' % resource_id}
+
+
+class FakeQueriedSample(object):
+    """A sample as returned by the complex query API."""
+
+    def __init__(self, sample):
+        self.resource_id = sample.resource_id
+        self.project_id = sample.project_id
+        self.timestamp = sample.timestamp
+        self.volume = sample.counter_volume
+        self.metadata = sample.resource_metadata
+
+
+class FakeMeter(object):
+    def __init__(self, name):
+        self.name = name
+        self.label = ''
+        self.description = ''
+
+    def augment(self, label=None, description=None):
+        self.label = label or ''
+        self.description = description or ''
+
+
+def history_entries(count, depth, churn=0.02, seed=0):
+    """Returns ``depth`` process lists of ``count`` processes, oldest first.
+
+    Between two lists, a ``churn`` fraction of the processes exit and as
+    many new ones start.
+    """
+    rng = random.Random(seed)
+    entries = list(synthetic.process_entries(count, seed=seed))
+    next_pid = count + 1
+    history = [list(entries)]
+    for _step in range(depth - 1):
+        changed = int(count * churn)
+        for _i in range(changed):
+            entries.pop(rng.randrange(len(entries)))
+        for _i in range(changed):
+            entry = dict(synthetic.process_entries(1, seed=next_pid)[0])
+            entry['pid'] = next_pid
+            entries.append(tuple(sorted(entry.items())))
+            next_pid += 1
+        history.append(list(entries))
+    return history
+
+
+class FakeCeilometer(object):
+    """Synthetic process list samples of ``instances`` instances.
+
+    Each instance has ``depth`` samples of ``processes`` processes, one
+    every ``interval`` seconds up to now.
+    """
+
+    def __init__(self, instances=1, processes=1000, depth=1, interval=600,
+                 projects=1, fmt='repr', seed=0):
+        self.calls = collections.Counter()
+        self.instance_ids = ['instance-%d' % i for i in range(instances)]
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        timestamps = [(now - datetime.timedelta(seconds=interval * step))
+                      .isoformat() for step in range(depth - 1, -1, -1)]
+        # The instances share their payloads, which keeps large fleets
+        # cheap to build; the decoder does not know.
+        payloads = []
+        for entries in history_entries(processes, depth, seed=seed):
+            if fmt == 'json':
+                payloads.append(json.dumps([dict(entry)
+                                            for entry in entries]))
+            else:
+                payloads.append(repr([list(entry) for entry in entries]))
+        self.samples = []
+        for position, instance_id in enumerate(self.instance_ids):
+            project_id = 'project-%d' % (position % projects)
+            for timestamp, payload in zip(timestamps, payloads):
+                self.samples.append(FakeSample(instance_id, project_id,
+                                               timestamp, payload))
+        self.samples.sort(key=operator.attrgetter('timestamp'), reverse=True)
+
+    def _match(self, sample, field, op, value):
+        return _OPERATORS[op](getattr(sample, field), value)
+
+    def sample_list(self, request, meter_name, query=None, limit=None):
+        self.calls['sample_list'] += 1
+        if meter_name != meters.PROCESS_LIST_METER:
+            return []
+        samples = [sample for sample in self.samples
+                   if all(self._match(sample, q['field'], q['op'], q['value'])
+                          for q in query or ())]
+        return samples[:limit] if limit else samples
+
+    def meter_list(self, request, query=None):
+        self.calls['meter_list'] += 1
+        return [FakeMeter('cpu'), FakeMeter(meters.PROCESS_LIST_METER)]
+
+    def _query(self, filter=None, orderby=None, limit=None):
+        self.calls['query_samples'] += 1
+        clauses = json.loads(filter)['and'] if filter else []
+        samples = self.samples
+        for clause in clauses:
+            (op, condition), = clause.items()
+            (field, value), = condition.items()
+            if field == 'meter':
+                if value != meters.PROCESS_LIST_METER:
+                    return []
+            elif op == 'in':
+                samples = [s for s in samples if getattr(s, field) in value]
+            else:
+                samples = [s for s in samples
+                           if self._match(s, field, op, value)]
+        if orderby and json.loads(orderby) == [{"timestamp": "asc"}]:
+            samples = samples[::-1]
+        samples = [FakeQueriedSample(sample) for sample in samples]
+        return samples[:limit] if limit else samples
+
+    def ceilometerclient(self, request):
+        self.calls['ceilometerclient'] += 1
+        query_samples = collections.namedtuple('QuerySamples', 'query')
+        client = collections.namedtuple('Client', 'query_samples')
+        return client(query_samples(self._query))
+
+    @contextlib.contextmanager
+    def patch(self):
+        """Serves the api.ceilometer calls of the panels from this backend."""
+        names = ('sample_list', 'meter_list', 'ceilometerclient')
+        originals = dict((name, getattr(api.ceilometer, name))
+                         for name in names)
+        try:
+            for name in names:
+                setattr(api.ceilometer, name, getattr(self, name))
+            yield self
+        finally:
+            for name, original in originals.items():
+                setattr(api.ceilometer, name, original)
@@ -0,0 +1,147 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""In-memory stand-in for the Nova server API used by the monitor panels.
+
+FakeNova holds synthetic servers that can be created, changed and deleted,
+answers ``server_list`` with the paging, filters and ``changes-since``
+semantics of Nova, and counts the calls made. patch() swaps it in for
+``api.nova.server_list``.
+"""
+
+import collections
+import contextlib
+import datetime
+import operator
+import random
+
+from openstack_dashboard import api
+
+STATUSES = ('ACTIVE', 'ACTIVE', 'ACTIVE', 'SHUTOFF', 'BUILD', 'ERROR')
+
+
+def _now():
+    return datetime.datetime.utcnow().replace(microsecond=0).isoformat()
+
+
+class FakeServer(object):
+    """A server with the fields of api.nova.Server shown by the panels."""
+
+    def __init__(self, server_id, name, tenant_id, host, status, created,
+                 flavor_id, image_id, address):
+        self.id = server_id
+        self.name = name
+        self.tenant_id = tenant_id
+        self.status = status
+        self.created = created
+        self.updated = created
+        self.flavor = {'id': flavor_id}
+        self.image = {'id': image_id}
+        self.addresses = {'private': [{'version': 4, 'addr': address}]}
+        setattr(self, 'OS-EXT-SRV-ATTR:host', host)
+        setattr(self, 'OS-EXT-STS:task_state', None)
+
+
+class FakeNova(object):
+    """``servers`` synthetic servers spread over projects and hosts.
+
+    ``server_list`` returns at most the ``limit`` search option, capped at
+    ``max_limit`` as by the ``osapi_max_limit`` of Nova; the limit of each
+    call is recorded in ``limits``. Paginated calls return pages of
+    ``page_size`` servers, the table page size of Horizon.
+    """
+
+    def __init__(self, servers=100, projects=4, hosts=8, page_size=20,
+                 max_limit=1000, seed=0):
+        self.calls = collections.Counter()
+        self.limits = []
+        self.page_size = page_size
+        self.max_limit = max_limit
+        self.projects = projects
+        self.hosts = hosts
+        self._rng = random.Random(seed)
+        self._next = 0
+        self.servers = collections.OrderedDict()
+        created = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        for i in range(servers):
+            self.create((created + datetime.timedelta(seconds=i))
+                        .replace(microsecond=0).isoformat())
+
+    def create(self, created=None, **attrs):
+        i = self._next
+        self._next += 1
+        server = FakeServer('server-%d' % i, 'vm-%d' % i,
+                            'project-%d' % (i % self.projects),
+                            'host-%d' % (i % self.hosts),
+                            self._rng.choice(STATUSES), created or _now(),
+                            str(1 + i % 5), 'image-%d' % (i % 3),
+                            '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255,
+                                             i & 255))
+        for name, value in attrs.items():
+            setattr(server, name, value)
+        self.servers[server.id] = server
+        return server
+
+    def update(self, server_id, **attrs):
+        server = self.servers[server_id]
+        for name, value in attrs.items():
+            setattr(server, name, value)
+        server.updated = _now()
+        return server
+
+    def delete(self, server_id):
+        return self.update(server_id, status='DELETED')
+
+    def server_list(self, request, search_opts=None, all_tenants=False):
+        self.calls['server_list'] += 1
+        opts = dict(search_opts or {})
+        paginate = opts.pop('paginate', False)
+        limit = opts.pop('limit', None)
+        marker = opts.pop('marker', None)
+        since = opts.pop('changes-since', None)
+        servers = sorted(self.servers.values(),
+                         key=operator.attrgetter('created', 'id'),
+                         reverse=True)
+        if since is not None:
+            servers = [server for server in servers if server.updated >= since]
+        else:
+            servers = [server for server in servers
+                       if server.status != 'DELETED']
+        for key, value in opts.items():
+            if key == 'tenant_id':
+                servers = [s for s in servers if s.tenant_id == value]
+            elif key == 'status':
+                servers = [s for s in servers if s.status == value.upper()]
+        if marker is not None:
+            ids = [server.id for server in servers]
+            servers = servers[ids.index(marker) + 1:]
+        if paginate:
+            # As Horizon does, one more server than a page is asked for to
+            # know whether more follow.
+            limit = self.page_size + 1
+        limit = min(limit or self.max_limit, self.max_limit)
+        self.limits.append(limit)
+        servers = servers[:limit]
+        if paginate:
+            return servers[:self.page_size], len(servers) > self.page_size
+        return servers, False
+
+    @contextlib.contextmanager
+    def patch(self):
+        """Serves api.nova.server_list from this backend."""
+        original = api.nova.server_list
+        try:
+            api.nova.server_list = self.server_list
+            yield self
+        finally:
+            api.nova.server_list = original
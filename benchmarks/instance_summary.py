@@ -0,0 +1,52 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Benchmark of the instance summary.
+
+Reports the time taken to group the synthetic servers of FakeNova by host,
+project, status and flavor. Run with::
+
+    python -m openstack_dashboard.dashboards.monitor.benchmarks.instance_summary
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_nova
+from openstack_dashboard.dashboards.monitor.instance_summary import summary
+
+# Number of servers, projects and hosts.
+SIZES = ((10000, 500, 200), (50000, 2000, 1000))
+
+SIZES_BY_FLAVOR = {'1': (1, 512), '2': (2, 2048), '3': (4, 4096),
+                   '4': (8, 8192), '5': (16, 16384)}
+
+
+def main(sizes=SIZES):
+    print('%9s  %9s  %7s  %10s' % ('servers', 'projects', 'hosts',
+                                   'summary (s)'))
+    for servers, projects, hosts in sizes:
+        nova = fake_nova.FakeNova(servers=servers, projects=projects,
+                                  hosts=hosts)
+        listed = list(nova.servers.values())
+        best = min(timeit.repeat(
+            lambda: summary.summarize(listed, SIZES_BY_FLAVOR),
+            number=1, repeat=3))
+        print('%9d  %9d  %7d  %10.3f' % (servers, projects, hosts, best))
+
+
+if __name__ == '__main__':
+    main(sizes=[tuple(int(arg) for arg in sys.argv[1:4])] if sys.argv[1:]
+         else SIZES)
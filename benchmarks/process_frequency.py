@@ -0,0 +1,74 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Benchmark of the fleet process frequency counts.
+
+Indexes synthetic process lists of a fleet, then reports the time taken to
+count the instances running each process name, with NumPy if it is
+installed and with the pure Python fallback. Run with::
+
+    python -m openstack_dashboard.dashboards.monitor.benchmarks.process_frequency
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.processes import fleet
+from openstack_dashboard.dashboards.monitor.processes import frequency
+
+# Number of instances, processes per instance and distinct names.
+SIZES = ((1000, 2000, 5000), (5000, 2000, 5000))
+
+
+def build_index(instances, processes, names, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ['proc-%d' % i for i in range(names)]
+    index = fleet.FleetProcessIndex()
+    for instance in range(instances):
+        index.update('vm-%d' % instance, '2016-10-18T02:00:00', [
+            process_list.Process('0x0', rng.choice(vocabulary), pid, 0, 0,
+                                 '0x0', '2016-10-18 02:39:00')
+            for pid in range(processes)])
+    return index
+
+
+def time_frequencies(index, numpy):
+    """Returns the best time of index.frequencies() with or without NumPy."""
+    installed = frequency.numpy
+    frequency.numpy = numpy
+    try:
+        return min(timeit.repeat(index.frequencies, number=1, repeat=3))
+    finally:
+        frequency.numpy = installed
+
+
+def main(sizes=SIZES):
+    print('%9s  %9s  %7s  %10s  %10s' % ('instances', 'processes', 'names',
+                                         'numpy (s)', 'python (s)'))
+    for instances, processes, names in sizes:
+        index = build_index(instances, processes, names)
+        vectorized = float('nan')
+        if frequency.numpy is not None:
+            vectorized = time_frequencies(index, frequency.numpy)
+        fallback = time_frequencies(index, None)
+        print('%9d  %9d  %7d  %10.3f  %10.3f' % (instances, processes, names,
+                                                 vectorized, fallback))
+
+
+if __name__ == '__main__':
+    main(sizes=[tuple(int(arg) for arg in sys.argv[1:4])] if sys.argv[1:]
+         else SIZES)
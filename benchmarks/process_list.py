@@ -0,0 +1,66 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Micro-benchmark of the ``instance.process.list`` payload decoder.
+
+Compares the decoder against the former ``eval()`` + ``dict()`` row building
+of ProcessListTab over synthetic payloads. Run with::
+
+    python -m openstack_dashboard.dashboards.monitor.benchmarks.process_list
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+from openstack_dashboard.dashboards.monitor.benchmarks import synthetic
+from openstack_dashboard.dashboards.monitor.instances import process_list
+
+SIZES = (1000, 10000, 50000)
+
+
+def legacy_rows(counter_volume):
+    rows = []
+    for entry in eval(counter_volume):
+        plist = dict(entry)
+        rows.append({"offset": plist['offset'],
+                     "name": plist['process_name'],
+                     "pid": plist['pid'],
+                     "uid": plist['uid'],
+                     "gid": plist['gid'],
+                     "dtb": plist['dtb'],
+                     "start_time": plist['start_time']})
+    return rows
+
+
+def best_of(func, arg, repeat):
+    return min(timeit.repeat(lambda: func(arg), number=1, repeat=repeat))
+
+
+def main(sizes=SIZES, repeat=3):
+    print('%8s  %-6s  %12s  %12s' % ('procs', 'format', 'legacy (ms)',
+                                     'decode (ms)'))
+    for size in sizes:
+        for fmt in ('repr', 'json'):
+            payload = synthetic.payload(size, fmt=fmt)
+            decoded = best_of(process_list.decode, payload, repeat) * 1000
+            if fmt == 'repr':
+                legacy = '%12.1f' % (best_of(legacy_rows, payload,
+                                             repeat) * 1000)
+            else:
+                legacy = '%12s' % '-'
+            print('%8d  %-6s  %s  %12.1f' % (size, fmt, legacy, decoded))
+
+
+if __name__ == '__main__':
+    main(sizes=[int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,62 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Memory benchmark of decoded process list snapshots.
+
+Reports the memory retained per process by the dict rows formerly built by
+ProcessListTab and by the Process records of the decoder. Requires
+tracemalloc (Python 3). Run with::
+
+    python -m openstack_dashboard.dashboards.monitor.benchmarks.process_memory
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import tracemalloc
+
+from openstack_dashboard.dashboards.monitor.benchmarks import process_list
+from openstack_dashboard.dashboards.monitor.benchmarks import synthetic
+from openstack_dashboard.dashboards.monitor.instances \
+    import process_list as decoder
+
+SIZES = (1000, 10000, 50000)
+
+
+def retained_bytes(func, payload):
+    """Returns the memory still allocated by ``func(payload)`` on return."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(payload)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def main(sizes=SIZES):
+    print('%8s  %16s  %16s' % ('procs', 'dict rows (B/p)', 'records (B/p)'))
+    for size in sizes:
+        payload = synthetic.payload(size)
+        legacy = retained_bytes(process_list.legacy_rows, payload)
+        records = retained_bytes(decoder.decode, payload)
+        print('%8d  %16.0f  %16.0f' % (size, float(legacy) / size,
+                                       float(records) / size))
+
+
+if __name__ == '__main__':
+    main(sizes=[int(arg) for arg in sys.argv[1:]] or SIZES)
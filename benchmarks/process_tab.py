@@ -0,0 +1,117 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""End-to-end benchmark of the process list views of an instance.
+
+Renders the process list and process timeline tabs against FakeCeilometer
+and reports, for a cold worker (empty caches) and a warm one, the render
+time, the peak memory allocated while rendering and the number of
+Ceilometer calls. Requires tracemalloc (Python 3) and the dashboard test
+settings, but no OpenStack service. Run with::
+
+    DJANGO_SETTINGS_MODULE=openstack_dashboard.test.settings \\
+    python -m openstack_dashboard.dashboards.monitor.benchmarks.process_tab
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import tracemalloc
+
+import django
+
+SIZES = (100, 1000, 10000, 50000)
+DEPTH = 6
+
+TABS = (('list', 'usage_report'), ('timeline', 'process_timeline'))
+
+
+class FakeInstance(object):
+    def __init__(self, instance_id):
+        self.id = instance_id
+        self.name = 'vm-%s' % instance_id
+
+
+def reset_caches():
+    from openstack_dashboard.dashboards.monitor.instances import meters
+    from openstack_dashboard.dashboards.monitor.instances import sample_times
+    from openstack_dashboard.dashboards.monitor.instances import snapshots
+    from openstack_dashboard.dashboards.monitor.instances import timeline
+    meters._catalog.reset()
+    sample_times._cache.reset()
+    snapshots._cache.reset()
+    timeline._cache.reset()
+
+
+def render_tab(instance, slug):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import client
+
+    from openstack_dashboard.dashboards.monitor.instances import tabs
+
+    request = client.RequestFactory().get('/', {'tab': 'instance_details__'
+                                                       + slug})
+    request.session = {}
+    request.user = AnonymousUser()
+    tab_group = tabs.InstanceDetailTabs(request, instance=instance,
+                                        instance_id=instance.id)
+    return tab_group.get_tab(slug).render()
+
+
+def measure(backend, func, *args):
+    """Returns the time taken by a call and the Ceilometer calls it made."""
+    backend.calls.clear()
+    start = time.time()
+    func(*args)
+    elapsed = time.time() - start
+    calls = sum(backend.calls.values())
+    return elapsed, calls
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(sizes=SIZES, depth=DEPTH):
+    django.setup()
+    from openstack_dashboard.dashboards.monitor.benchmarks \
+        import fake_ceilometer
+
+    print('%8s  %-8s  %9s  %9s  %9s  %10s  %10s' % (
+        'procs', 'tab', 'cold (s)', 'warm (s)', 'peak (MB)', 'cold calls',
+        'warm calls'))
+    for size in sizes:
+        backend = fake_ceilometer.FakeCeilometer(processes=size, depth=depth)
+        instance = FakeInstance(backend.instance_ids[0])
+        with backend.patch():
+            for label, slug in TABS:
+                reset_caches()
+                peak = peak_memory(render_tab, instance, slug)
+                reset_caches()
+                cold, cold_calls = measure(backend, render_tab, instance,
+                                           slug)
+                warm, warm_calls = measure(backend, render_tab, instance,
+                                           slug)
+                print('%8d  %-8s  %9.3f  %9.3f  %9.1f  %10d  %10d' % (
+                    size, label, cold, warm, peak / 1024.0 / 1024.0,
+                    cold_calls, warm_calls))
+
+
+if __name__ == '__main__':
+    main(sizes=[int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,51 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Synthetic ``instance.process.list`` payloads for benchmarks."""
+
+import json
+import random
+
+_NAMES = ('systemd', 'kthreadd', 'sshd', 'bash', 'python', 'java', 'nginx',
+          'postgres', 'rsyslogd', 'cron', 'dbus-daemon', 'agetty', 'sh',
+          'kworker/0:1', 'ksoftirqd/0', 'migration/0', 'qemu-ga', 'httpd')
+
+
+def process_entries(count, seed=0):
+    """Returns ``count`` process entries as sequences of key/value pairs."""
+    rng = random.Random(seed)
+    entries = []
+    for pid in range(1, count + 1):
+        entries.append((
+            ('offset', '0x%016x' % (0xffff880000000000 + pid * 0x1000)),
+            ('process_name', rng.choice(_NAMES)),
+            ('pid', pid),
+            ('uid', rng.choice((0, 0, 0, 33, 1000))),
+            ('gid', rng.choice((0, 0, 0, 33, 1000))),
+            ('dtb', '0x%08x' % rng.randrange(0x1000000, 0x7fffffff)),
+            ('start_time', '2016-10-%02d %02d:%02d:%02d UTC+0000' % (
+                rng.randint(1, 28), rng.randint(0, 23),
+                rng.randint(0, 59), rng.randint(0, 59))),
+        ))
+    return entries
+
+
+def payload(count, fmt='repr', seed=0):
+    """Returns a ``counter_volume`` string holding ``count`` processes.
+
+    ``fmt`` is ``'repr'`` for the Python literal published by older guest
+    agents or ``'json'`` for a JSON list of objects.
+    """
+    entries = process_entries(count, seed=seed)
+    if fmt == 'json':
+        return json.dumps([dict(entry) for entry in entries])
+    return repr([list(entry) for entry in entries])
@@ -0,0 +1,281 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process caches shared by the requests served by a worker."""
+
+from collections import OrderedDict
+import functools
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from horizon import exceptions
+
+from openstack_dashboard.dashboards.monitor import concurrency
+
+
+_MISSING = object()
+_NOT_FOUND = object()
+
+# Entries a TTLCache holds before it first purges the expired ones.
+_PURGE_THRESHOLD = 64
+
+
+class LRUCache(object):
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    The size of a value is given when it is stored, or computed with
+    ``sizeof``. A value larger than the whole budget is not cached.
+    """
+
+    def __init__(self, max_bytes, sizeof=sys.getsizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _key, (_value, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'bytes': self._bytes,
+                    'max_bytes': self.max_bytes}
+
+
+class TTLCache(object):
+    """Thread-safe cache whose entries expire ``ttl`` seconds after set.
+
+    Expired entries are dropped when read, and purged whenever the number of
+    entries has doubled since the last purge, so keys that are not read
+    again do not accumulate.
+    """
+
+    def __init__(self, ttl, timer=time.time):
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._purge_at = _PURGE_THRESHOLD
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._timer():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        now = self._timer()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+            if len(self._entries) >= self._purge_at:
+                self._purge(now)
+
+    def _purge(self, now):
+        expired = [key for key, (_value, expires) in self._entries.items()
+                   if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self._purge_at = max(_PURGE_THRESHOLD, 2 * len(self._entries))
+
+    def get_or_load(self, key, load):
+        """Returns the cached value of ``key``, calling ``load()`` on a miss.
+
+        ``load`` runs outside of the lock, so concurrent misses may each call
+        it; the last value loaded wins.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drops ``key``, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'entries': len(self._entries),
+                    'ttl': self.ttl}
+
+
+def is_not_found(error):
+    """Returns whether an API error reports the object as not found."""
+    return (isinstance(error, exceptions.NOT_FOUND) or
+            getattr(error, 'code', None) == 404)
+
+
+class LookupCache(object):
+    """Results of looking up objects one id at a time.
+
+    The objects found are kept for ``ttl`` seconds, and so are the ids
+    reported as not found, which get the error ``not_found(obj_id)`` without
+    being looked up again. Other errors are not kept.
+    """
+
+    def __init__(self, ttl, not_found):
+        self._results = TTLCache(ttl)
+        self._not_found = not_found
+
+    def lookup(self, scope, obj_ids, get, max_workers, known=None):
+        """Returns the objects of the given ids, and the errors of the others.
+
+        Ids are resolved with ``known(obj_id)`` first if it is given, then
+        from the results kept for ``scope``. Each distinct remaining id is
+        looked up with ``get(obj_id)`` at most once, and the lookups run
+        concurrently on at most ``max_workers`` threads. The objects and the
+        errors are both keyed by id.
+        """
+        found = {}
+        errors = {}
+        pending = []
+        for obj_id in OrderedDict.fromkeys(obj_ids):
+            obj = known(obj_id) if known is not None else None
+            if obj is None:
+                obj = self._results.get((scope, obj_id))
+            if obj is _NOT_FOUND:
+                errors[obj_id] = self._not_found(obj_id)
+            elif obj is not None:
+                found[obj_id] = obj
+            else:
+                pending.append(obj_id)
+        outcomes = concurrency.call_concurrently(
+            [functools.partial(get, obj_id) for obj_id in pending],
+            max_workers=max_workers)
+        for obj_id, outcome in zip(pending, outcomes):
+            if outcome.error is None:
+                found[obj_id] = outcome.value
+                self._results.set((scope, obj_id), outcome.value)
+            else:
+                errors[obj_id] = outcome.error
+                if is_not_found(outcome.error):
+                    self._results.set((scope, obj_id), _NOT_FOUND)
+        return found, errors
+
+    def invalidate(self):
+        """Drops every result kept, including the ids not found."""
+        self._results.invalidate()
+
+    def stats(self):
+        return self._results.stats()
+
+
+class Shared(object):
+    """A value shared by the threads of a worker, built on first use.
+
+    The settings ``build`` reads are read when the value is first needed
+    rather than when the module is imported. reset() drops the value, for
+    the next get() to build it again.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        value = self._value
+        if value is None:
+            with self._lock:
+                value = self._value
+                if value is None:
+                    value = self._value = self._build()
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+
+
+def from_setting(factory, setting, default, **kwargs):
+    """Returns a Shared ``factory(value, **kwargs)`` of a setting.
+
+    ``value`` is the value of the setting named ``setting``, or ``default``
+    if it is not set.
+    """
+    return Shared(lambda: factory(getattr(settings, setting, default),
+                                  **kwargs))
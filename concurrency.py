@@ -0,0 +1,141 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Bounded concurrent execution of independent backend calls."""
+
+import collections
+import copy
+import threading
+import time
+
+from concurrent import futures
+
+Outcome = collections.namedtuple('Outcome', ('value', 'error'))
+
+DEFAULT_MAX_WORKERS = 4
+
+# Seconds between checks for queued calls to have started.
+_START_POLL = 0.01
+
+
+class CallTimeout(Exception):
+    """Returned as the error of a call that did not finish in time."""
+
+
+def call_concurrently(functions, max_workers=DEFAULT_MAX_WORKERS,
+                      timeout=None):
+    """Calls each function on a pool of at most ``max_workers`` threads.
+
+    Returns an Outcome for each function, in the same order. An exception
+    raised by a function is returned as its error, as is a CallTimeout if
+    it did not finish within ``timeout`` seconds of its own start; such a
+    call is abandoned rather than waited for. A call still queued when
+    every thread of the pool is held by an abandoned call is abandoned too.
+    """
+    functions = list(functions)
+    if not functions:
+        return []
+    if len(functions) == 1 and timeout is None:
+        try:
+            return [Outcome(functions[0](), None)]
+        except Exception as e:
+            return [Outcome(None, e)]
+    workers = max(1, min(max_workers, len(functions)))
+    executor = futures.ThreadPoolExecutor(max_workers=workers)
+    started = {}
+    started_lock = threading.Lock()
+
+    def start(index):
+        with started_lock:
+            started[index] = time.time()
+        return functions[index]()
+
+    try:
+        pending = [executor.submit(start, index)
+                   for index in range(len(functions))]
+        if timeout is None:
+            futures.wait(pending)
+            abandoned = set()
+        else:
+            abandoned = _wait(pending, started, started_lock, workers,
+                              timeout)
+        outcomes = []
+        for index, future in enumerate(pending):
+            if index in abandoned:
+                future.cancel()
+                outcomes.append(Outcome(None, CallTimeout()))
+            elif future.exception() is not None:
+                outcomes.append(Outcome(None, future.exception()))
+            else:
+                outcomes.append(Outcome(future.result(), None))
+        return outcomes
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _wait(pending, started, started_lock, workers, timeout):
+    """Waits for the calls of call_concurrently() to finish or time out.
+
+    Returns the indexes of the calls to abandon.
+    """
+    abandoned = set()
+    while True:
+        now = time.time()
+        with started_lock:
+            start_times = dict(started)
+        running = 0
+        waiting = []
+        for index, future in enumerate(pending):
+            if future.done():
+                continue
+            if index in start_times:
+                running += 1
+            if index in abandoned:
+                continue
+            if index in start_times and now - start_times[index] >= timeout:
+                abandoned.add(index)
+            else:
+                waiting.append(index)
+        if not waiting:
+            return abandoned
+        if len([index for index in abandoned
+                if not pending[index].done()]) >= workers:
+            # No thread is left to start the queued calls.
+            abandoned.update(waiting)
+            return abandoned
+        deadlines = [start_times[index] + timeout for index in waiting
+                     if index in start_times]
+        wait = min(deadlines) - now if deadlines else _START_POLL
+        if len(deadlines) < len(waiting) and running < workers:
+            # A thread is free: a queued call is about to start.
+            wait = min(wait, _START_POLL)
+        futures.wait([pending[index] for index in waiting], timeout=wait,
+                     return_when=futures.FIRST_COMPLETED)
+
+
+class DetachedRequest(object):
+    """The credentials of a request, for calls made after it was answered.
+
+    The api modules read the user of a request, with its token, service
+    catalog and region, its session and its cookies. A thread that outlives
+    the request is given copies of those, taken while the request is being
+    served, rather than the request Django has finished with.
+    """
+
+    def __init__(self, request):
+        # Reading an attribute loads the lazy user of the request, which is
+        # then copied rather than loaded again later.
+        getattr(request.user, 'token', None)
+        self.user = copy.copy(request.user)
+        self.session = dict(request.session.items())
+        self.COOKIES = dict(request.COOKIES)
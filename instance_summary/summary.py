@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Instance counts and sizes grouped by host, project, status and flavor.
+
+A Summary computes every grouping in one pass over the servers, reading
+only the fields it groups by. Servers listed from Nova are added a page at
+a time as the pages arrive, so the whole list is never held; servers held
+by the server cache are added at once. The summary of a region is kept for
+``MONITOR_INSTANCE_SUMMARY_TTL`` seconds.
+"""
+
+import collections
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor.instances import flavors
+from openstack_dashboard.dashboards.monitor.instances import server_cache
+
+DEFAULT_TTL = 60
+
+HOST = 'host'
+PROJECT = 'project'
+STATUS = 'status'
+FLAVOR = 'flavor'
+DIMENSIONS = (HOST, PROJECT, STATUS, FLAVOR)
+
+Group = collections.namedtuple(
+    'Group', ('key', 'name', 'instances', 'vcpus', 'memory_mb'))
+
+_cache = cache.from_setting(cache.TTLCache, 'MONITOR_INSTANCE_SUMMARY_TTL',
+                            DEFAULT_TTL)
+
+
+class Summary(object):
+    """The instance count, vCPUs and RAM of each group of each dimension.
+
+    Instances of a flavor that cannot be resolved are counted, without
+    vCPUs or RAM; ``unsized`` is their number.
+    """
+
+    def __init__(self):
+        self.instances = 0
+        self.vcpus = 0
+        self.memory_mb = 0
+        self.unsized = 0
+        # Each group is a list of its instance count, vCPUs and RAM, which
+        # are updated in place.
+        self.totals = dict((dimension, {}) for dimension in DIMENSIONS)
+
+    def add(self, servers, sizes):
+        """Adds servers to the groups.
+
+        ``sizes`` maps flavor ids to their vCPUs and RAM in MB.
+        """
+        hosts = self.totals[HOST]
+        projects = self.totals[PROJECT]
+        statuses = self.totals[STATUS]
+        flavor_totals = self.totals[FLAVOR]
+        unsized = (0, 0)
+        for server in servers:
+            flavor_id = (server.flavor or {}).get('id')
+            size = sizes.get(flavor_id, unsized)
+            if size is unsized:
+                self.unsized += 1
+            vcpus, memory_mb = size
+            for groups, key in (
+                    (hosts, getattr(server, 'OS-EXT-SRV-ATTR:host', None)),
+                    (projects, server.tenant_id),
+                    (statuses, server.status),
+                    (flavor_totals, flavor_id)):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0, 0, 0]
+                group[0] += 1
+                group[1] += vcpus
+                group[2] += memory_mb
+            self.instances += 1
+            self.vcpus += vcpus
+            self.memory_mb += memory_mb
+
+    def groups(self, dimension):
+        """Returns the groups of a dimension, the largest first.
+
+        Groups are named by their key until given another name.
+        """
+        groups = [Group(key, key, instances, vcpus, memory_mb)
+                  for key, (instances, vcpus, memory_mb)
+                  in self.totals[dimension].items()]
+        groups.sort(key=lambda group: (-group.instances, u'%s' % group.key))
+        return groups
+
+
+def summarize(servers, sizes):
+    """Summarizes servers in a single pass.
+
+    ``sizes`` maps flavor ids to their vCPUs and RAM in MB.
+    """
+    summary = Summary()
+    summary.add(servers, sizes)
+    return summary
+
+
+def flavor_sizes(flavors_by_id):
+    """Returns the vCPUs and RAM of flavors, by flavor id."""
+    return dict((flavor_id, (int(flavor.vcpus), int(flavor.ram)))
+                for flavor_id, flavor in flavors_by_id.items())
+
+
+def _pages(request):
+    """Yields the servers of the region of a request, in pages."""
+    if server_cache.enabled():
+        cached = server_cache.get_cache(request)
+        cached.sync(request)
+        yield cached.servers()
+    else:
+        for page in server_cache.iter_pages(request, {}):
+            yield page
+
+
+def _load(request):
+    flavors_by_id = dict(flavors.get_catalog(request))
+    sizes = flavor_sizes(flavors_by_id)
+    unresolved = set()
+    summary = Summary()
+    for page in _pages(request):
+        # The flavors the catalog does not list are looked up as the
+        # servers using them arrive, each at most once.
+        missing = set((server.flavor or {}).get('id') for server in page)
+        missing.difference_update(flavors_by_id, unresolved, [None])
+        if missing:
+            found, errors = flavors.lookup(request, missing)
+            flavors_by_id.update(found)
+            sizes.update(flavor_sizes(found))
+            unresolved.update(errors)
+        summary.add(page, sizes)
+    return summary, flavors_by_id
+
+
+def get_summary(request):
+    """Returns the summary of the servers of the region of a request, and
+    the flavors of the servers by id.
+    """
+    region = getattr(request.user, 'services_region', None)
+    return _cache.get().get_or_load(region, lambda: _load(request))
@@ -0,0 +1,56 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import tables
+from horizon.templatetags import sizeformat
+
+
+class GroupTable(tables.DataTable):
+    name = tables.Column('name', verbose_name=_('Name'))
+    instances = tables.Column('instances', verbose_name=_('Instances'))
+    vcpus = tables.Column('vcpus', verbose_name=_('VCPUs'))
+    memory_mb = tables.Column('memory_mb', verbose_name=_('RAM'),
+                              filters=(sizeformat.mb_float_format,))
+
+    def get_object_id(self, obj):
+        return u'%s' % obj.key
+
+
+class HostTable(GroupTable):
+    class Meta(object):
+        name = 'hosts'
+        verbose_name = _("By Host")
+        multi_select = False
+
+
+class ProjectTable(GroupTable):
+    class Meta(object):
+        name = 'projects'
+        verbose_name = _("By Project")
+        multi_select = False
+
+
+class StatusTable(GroupTable):
+    class Meta(object):
+        name = 'statuses'
+        verbose_name = _("By Status")
+        multi_select = False
+
+
+class FlavorTable(GroupTable):
+    class Meta(object):
+        name = 'flavors'
+        verbose_name = _("By Flavor")
+        multi_select = False
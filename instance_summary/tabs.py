@@ -0,0 +1,95 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+from horizon import tabs
+
+from openstack_dashboard.dashboards.monitor.instance_summary import summary
+from openstack_dashboard.dashboards.monitor.instance_summary import tables
+from openstack_dashboard.dashboards.monitor import tenants
+
+DETAIL_TEMPLATE_NAME = "horizon/common/_detail_table.html"
+
+
+class GroupTab(tabs.TableTab):
+    """A tab of the groups of one dimension of the instance summary."""
+    dimension = None
+    template_name = DETAIL_TEMPLATE_NAME
+
+    def get_groups(self):
+        instance_summary = self.tab_group.kwargs['summary']
+        if instance_summary is None:
+            return []
+        return instance_summary.groups(self.dimension)
+
+
+class HostTab(GroupTab):
+    table_classes = (tables.HostTable,)
+    name = tables.HostTable.Meta.verbose_name
+    slug = tables.HostTable.Meta.name
+    dimension = summary.HOST
+
+    def get_hosts_data(self):
+        return self.get_groups()
+
+
+class ProjectTab(GroupTab):
+    table_classes = (tables.ProjectTable,)
+    name = tables.ProjectTable.Meta.verbose_name
+    slug = tables.ProjectTable.Meta.name
+    dimension = summary.PROJECT
+
+    def get_projects_data(self):
+        groups = self.get_groups()
+        try:
+            found, errors = tenants.resolve(
+                self.request, [group.key for group in groups],
+                index=tenants.get_index(self.request))
+        except Exception:
+            found = {}
+            exceptions.handle(self.request,
+                              _('Unable to retrieve project list.'))
+        return [group._replace(name=getattr(found.get(group.key), 'name',
+                                            group.key))
+                for group in groups]
+
+
+class StatusTab(GroupTab):
+    table_classes = (tables.StatusTable,)
+    name = tables.StatusTable.Meta.verbose_name
+    slug = tables.StatusTable.Meta.name
+    dimension = summary.STATUS
+
+    def get_statuses_data(self):
+        return self.get_groups()
+
+
+class FlavorTab(GroupTab):
+    table_classes = (tables.FlavorTable,)
+    name = tables.FlavorTable.Meta.verbose_name
+    slug = tables.FlavorTable.Meta.name
+    dimension = summary.FLAVOR
+
+    def get_flavors_data(self):
+        flavors = self.tab_group.kwargs['flavors']
+        return [group._replace(name=getattr(flavors.get(group.key), 'name',
+                                            group.key))
+                for group in self.get_groups()]
+
+
+class InstanceSummaryTabs(tabs.TabGroup):
+    slug = "instance_summary"
+    tabs = (HostTab, ProjectTab, StatusTab, FlavorTab)
+    sticky = True
@@ -0,0 +1,125 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import collections
+
+from django.core.urlresolvers import reverse
+from django import http
+
+from mox3.mox import IsA  # noqa
+
+from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_nova
+from openstack_dashboard.dashboards.monitor.instance_summary import summary
+from openstack_dashboard.dashboards.monitor.instances import flavors
+from openstack_dashboard.dashboards.monitor import tenants
+from openstack_dashboard.test import helpers as test
+
+
+INDEX_URL = reverse('horizon:monitor:instance_summary:index')
+
+Flavor = collections.namedtuple('Flavor', ('id', 'vcpus', 'ram'))
+
+
+class SummaryTests(test.TestCase):
+    def test_summarize(self):
+        nova = fake_nova.FakeNova(servers=40, projects=4, hosts=8)
+        servers = list(nova.servers.values())
+        # Flavor "5" cannot be resolved; its instances have no size.
+        sizes = {'1': (1, 512), '2': (2, 2048), '3': (4, 4096),
+                 '4': (8, 8192)}
+        result = summary.summarize(servers, sizes)
+        self.assertEqual(40, result.instances)
+        self.assertEqual(8, result.unsized)
+        self.assertEqual(8 * (1 + 2 + 4 + 8), result.vcpus)
+        self.assertEqual(8 * (512 + 2048 + 4096 + 8192), result.memory_mb)
+        hosts = result.groups(summary.HOST)
+        self.assertEqual(8, len(hosts))
+        self.assertEqual([5] * 8, [group.instances for group in hosts])
+        projects = dict((group.key, group)
+                        for group in result.groups(summary.PROJECT))
+        # Each project has two instances of each flavor.
+        self.assertEqual(10, projects['project-0'].instances)
+        self.assertEqual(2 * (1 + 2 + 4 + 8), projects['project-0'].vcpus)
+        for dimension in summary.DIMENSIONS:
+            groups = result.groups(dimension)
+            self.assertEqual(result.instances,
+                             sum(group.instances for group in groups))
+            self.assertEqual(result.vcpus,
+                             sum(group.vcpus for group in groups))
+
+    @test.update_settings(API_RESULT_LIMIT=15)
+    def test_summary_added_a_page_at_a_time(self):
+        summary._cache.reset()
+        flavors._cache.reset()
+        flavors._lookups.reset()
+        nova = fake_nova.FakeNova(servers=40, projects=4, hosts=8)
+        catalog = [Flavor(flavor_id, vcpus, ram)
+                   for flavor_id, vcpus, ram in (('1', 1, 512),
+                                                 ('2', 2, 2048))]
+        self.mox.StubOutWithMock(api.nova, 'flavor_list')
+        self.mox.StubOutWithMock(api.nova, 'flavor_get')
+        api.nova.flavor_list(IsA(http.HttpRequest)).AndReturn(catalog)
+        # Flavors the catalog does not list are looked up once each.
+        for flavor_id in ('3', '4', '5'):
+            api.nova.flavor_get(IsA(http.HttpRequest), flavor_id) \
+                .InAnyOrder() \
+                .AndReturn(Flavor(flavor_id, 4, 4096))
+        self.mox.ReplayAll()
+
+        with nova.patch():
+            result, flavors_by_id = summary.get_summary(self.request)
+        self.assertEqual([15, 15, 15], nova.limits)
+        self.assertEqual(40, result.instances)
+        self.assertEqual(0, result.unsized)
+        self.assertEqual(8 * (1 + 2 + 4 + 4 + 4), result.vcpus)
+        self.assertEqual(['1', '2', '3', '4', '5'], sorted(flavors_by_id))
+
+
+class InstanceSummaryViewTests(test.BaseAdminViewTests):
+    def setUp(self):
+        super(InstanceSummaryViewTests, self).setUp()
+        summary._cache.reset()
+        flavors._cache.reset()
+        flavors._lookups.reset()
+        tenants._cache.reset()
+        tenants._lookups.reset()
+
+    @test.update_settings(API_RESULT_LIMIT=1000)
+    @test.create_stubs({api.nova: ('server_list', 'flavor_list'),
+                        api.keystone: ('tenant_list',)})
+    def test_index(self):
+        servers = self.servers.list()
+        api.nova.server_list(IsA(http.HttpRequest),
+                             search_opts={'limit': 1000},
+                             all_tenants=True) \
+            .AndReturn([servers, False])
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        api.keystone.tenant_list(IsA(http.HttpRequest)) \
+            .AndReturn([self.tenants.list(), False])
+        self.mox.ReplayAll()
+
+        # The summary is computed once, then shared by the following
+        # requests.
+        for tab in ('hosts', 'projects'):
+            res = self.client.get(INDEX_URL, {'tab': 'instance_summary__%s'
+                                              % tab})
+            self.assertTemplateUsed(res, 'monitor/instance_summary/index.html')
+            self.assertEqual(len(servers), res.context['summary'].instances)
+        projects = res.context['tab_group'].get_tab('projects')
+        groups = projects._tables['projects'].data
+        self.assertEqual(
+            self.tenants.get(id=servers[0].tenant_id).name,
+            [group.name for group in groups
+             if group.key == servers[0].tenant_id][0])
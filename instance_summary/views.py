@@ -0,0 +1,53 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+from horizon import tabs
+from horizon.utils import memoized
+
+from openstack_dashboard.dashboards.monitor.instance_summary import summary
+from openstack_dashboard.dashboards.monitor.instance_summary \
+    import tabs as project_tabs
+
+
+class IndexView(tabs.TabbedTableView):
+    """Counts the instances of each host, project, status and flavor.
+
+    The groups of every tab come from one summary of the instances, which
+    is shared by the requests of a worker for
+    ``MONITOR_INSTANCE_SUMMARY_TTL`` seconds.
+    """
+    tab_group_class = project_tabs.InstanceSummaryTabs
+    template_name = 'monitor/instance_summary/index.html'
+    page_title = _("Instance Summary")
+
+    @memoized.memoized_method
+    def get_summary(self):
+        try:
+            return summary.get_summary(self.request)
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to retrieve instance list.'))
+            return None, {}
+
+    def get_tabs(self, request, **kwargs):
+        instance_summary, flavors = self.get_summary()
+        return super(IndexView, self).get_tabs(
+            request, summary=instance_summary, flavors=flavors, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['summary'] = self.get_summary()[0]
+        return context
@@ -0,0 +1,219 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Batch actions of the admin instance table run on a bounded pool.
+
+A batch action of Horizon calls Nova once for each selected instance, one
+after the other, within the request that submitted the table; draining a
+host of a few hundred instances outlasts the request. The actions of the
+admin instance table call Nova on at most ``MONITOR_BATCH_ACTION_WORKERS``
+threads instead, which bounds the load put on the Nova API.
+
+The error of each instance is raised again in the request thread and
+handled as ``BatchAction.handle`` handles it, so the messages, redirects and
+escalations of ``exceptions.handle()`` are those of Horizon.
+
+While a batch runs, its progress is kept for ``MONITOR_BATCH_PROGRESS_TTL``
+seconds under the ``batch_id`` the table form was submitted with, for the
+index page to poll. It is kept in the Django cache named by
+``MONITOR_BATCH_PROGRESS_CACHE``, ``default`` unless set, which must be
+shared by the processes serving the dashboard, such as a memcached cache:
+with a local-memory cache, a poll served by another process than the one
+running the batch finds no progress and the page stops polling.
+"""
+
+import functools
+import re
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django import shortcuts
+from django.utils.translation import ugettext_lazy as _
+from oslo_log import log
+
+from horizon import exceptions
+from horizon import messages
+from horizon.utils import functions
+
+from openstack_dashboard.dashboards.monitor import concurrency
+
+LOG = log.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_PROGRESS_TTL = 600
+DEFAULT_PROGRESS_CACHE = 'default'
+
+BATCH_PARAM = 'batch_id'
+
+_BATCH_ID = re.compile(r'^[\w-]{1,64}$')
+
+
+def _progress_cache():
+    return caches[getattr(settings, 'MONITOR_BATCH_PROGRESS_CACHE',
+                          DEFAULT_PROGRESS_CACHE)]
+
+
+def _progress_key(request, batch_id):
+    return 'monitor-batch-%s-%s' % (getattr(request.user, 'id', None),
+                                    batch_id)
+
+
+def get_progress(request, batch_id):
+    """Returns the progress of a batch of the user of a request, or None.
+
+    The progress is a dict of the ``total`` number of instances of the
+    batch, and of how many are ``done`` and of those ``failed``.
+    """
+    if not batch_id or not _BATCH_ID.match(batch_id):
+        return None
+    return _progress_cache().get(_progress_key(request, batch_id))
+
+
+class Progress(object):
+    """Counts the instances of a batch as they are done.
+
+    The counts are published under the id of the batch, if it has one.
+    """
+
+    def __init__(self, request, batch_id, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self._key = None
+        if batch_id and _BATCH_ID.match(batch_id):
+            self._key = _progress_key(request, batch_id)
+        self._lock = threading.Lock()
+        self._publish()
+
+    def finished(self, error=None):
+        with self._lock:
+            self.done += 1
+            if error is not None:
+                self.failed += 1
+            self._publish()
+
+    def _publish(self):
+        if self._key is None:
+            return
+        ttl = getattr(settings, 'MONITOR_BATCH_PROGRESS_TTL',
+                      DEFAULT_PROGRESS_TTL)
+        _progress_cache().set(self._key, {'total': self.total,
+                                          'done': self.done,
+                                          'failed': self.failed}, ttl)
+
+
+def run(request, action, obj_ids, batch_id=None):
+    """Calls ``action(request, obj_id)`` for each id on a bounded pool.
+
+    Returns the error raised for each id, or None where the action
+    succeeded, in the order of the ids.
+    """
+    obj_ids = list(obj_ids)
+    progress = Progress(request, batch_id, len(obj_ids))
+
+    def call(obj_id):
+        try:
+            action(request, obj_id)
+        except Exception as e:
+            progress.finished(e)
+            return e
+        progress.finished()
+        return None
+
+    workers = getattr(settings, 'MONITOR_BATCH_ACTION_WORKERS',
+                      DEFAULT_WORKERS)
+    outcomes = concurrency.call_concurrently(
+        [functools.partial(call, obj_id) for obj_id in obj_ids],
+        max_workers=workers)
+    return [outcome.value if outcome.error is None else outcome.error
+            for outcome in outcomes]
+
+
+class ConcurrentBatchMixin(object):
+    """Runs a batch action on the selected instances concurrently.
+
+    Mixed in before ``tables.BatchAction``; the permission checks, the
+    error handling, the messages and the redirect are those of
+    ``BatchAction.handle``.
+    """
+
+    def handle(self, table, request, obj_ids):
+        selected = []
+        action_not_allowed = []
+        for datum_id in obj_ids:
+            datum = table.get_object_by_id(datum_id)
+            datum_display = table.get_object_display(datum) or datum_id
+            if not table._filter_action(self, request, datum):
+                action_not_allowed.append(datum_display)
+                LOG.info(u'Permission denied to %s: "%s"',
+                         self._get_action_name(past=True).lower(),
+                         datum_display)
+                continue
+            selected.append((datum_id, datum, datum_display))
+
+        errors = run(request, self.action,
+                     [datum_id for datum_id, datum, display in selected],
+                     batch_id=request.POST.get(BATCH_PARAM))
+
+        action_success = []
+        action_failure = []
+        for (datum_id, datum, datum_display), error in zip(selected, errors):
+            try:
+                if error is not None:
+                    # Raised in this thread for exceptions.handle() to see
+                    # it as if the action had been called here.
+                    raise error
+                # Call update to invoke changes if needed
+                self.update(request, datum)
+                action_success.append(datum_display)
+                self.success_ids.append(datum_id)
+                LOG.info(u'%s: "%s"', self._get_action_name(past=True),
+                         datum_display)
+            except Exception as ex:
+                LOG.warning(u'Action %s failed for "%s": %s',
+                            self._get_action_name(past=True).lower(),
+                            datum_display, ex)
+                # Handle the exception but silence it since we'll display
+                # an aggregate error message later. Otherwise we'd get
+                # multiple error messages displayed to the user.
+                if getattr(ex, "_safe_message", None):
+                    ignore = False
+                else:
+                    ignore = True
+                    action_failure.append(datum_display)
+                exceptions.handle(request, ignore=ignore)
+
+        # Begin with success message class, downgrade to info if problems.
+        success_message_level = messages.success
+        if action_not_allowed:
+            msg = _('You are not allowed to %(action)s: %(objs)s')
+            params = {"action":
+                      self._get_action_name(action_not_allowed).lower(),
+                      "objs": functions.lazy_join(", ", action_not_allowed)}
+            messages.error(request, msg % params)
+            success_message_level = messages.info
+        if action_failure:
+            msg = _('Unable to %(action)s: %(objs)s')
+            params = {"action": self._get_action_name(action_failure).lower(),
+                      "objs": functions.lazy_join(", ", action_failure)}
+            messages.error(request, msg % params)
+            success_message_level = messages.info
+        if action_success:
+            msg = _('%(action)s: %(objs)s')
+            params = {"action":
+                      self._get_action_name(action_success, past=True),
+                      "objs": functions.lazy_join(", ", action_success)}
+            success_message_level(request, msg % params)
+
+        return shortcuts.redirect(self.get_success_url(request))
@@ -0,0 +1,101 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Flavor catalog shared by the requests of a worker.
+
+Flavors change rarely, so the admin instance list, the instance details
+and the instance summary resolve the flavors of instances from a catalog
+loaded with one ``flavor_list`` call per region and kept for
+``MONITOR_FLAVOR_CACHE_TTL`` seconds. invalidate() drops it, for a flavor
+created or changed since to show up on the next load.
+
+Flavors the catalog does not list, such as private or deleted ones, are
+looked up once per distinct id, concurrently. Their results are kept for
+``MONITOR_FLAVOR_LOOKUP_TTL`` seconds, including flavors Nova reports as not
+found, so a page of instances of a deleted flavor does not look it up for
+each instance or on each load.
+"""
+
+from collections import OrderedDict
+import functools
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+
+from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import cache
+
+DEFAULT_TTL = 600
+DEFAULT_LOOKUP_TTL = 300
+DEFAULT_LOOKUP_WORKERS = 4
+
+
+def _not_found(flavor_id):
+    return exceptions.NotFound(_('Flavor "%s" was not found.') % flavor_id)
+
+
+_cache = cache.from_setting(cache.TTLCache, 'MONITOR_FLAVOR_CACHE_TTL',
+                            DEFAULT_TTL)
+_lookups = cache.from_setting(cache.LookupCache, 'MONITOR_FLAVOR_LOOKUP_TTL',
+                              DEFAULT_LOOKUP_TTL, not_found=_not_found)
+
+
+def _region(request):
+    return getattr(request.user, 'services_region', None)
+
+
+def get_catalog(request):
+    """Returns the flavors of the region of a request, keyed by id."""
+    return _cache.get().get_or_load(
+        _region(request),
+        lambda: OrderedDict((flavor.id, flavor)
+                            for flavor in api.nova.flavor_list(request)))
+
+
+def lookup(request, flavor_ids):
+    """Looks up flavors the catalog does not list.
+
+    The lookups run concurrently on at most
+    ``MONITOR_FLAVOR_LOOKUP_WORKERS`` threads. Returns the flavors found and
+    the errors of the others, both keyed by flavor id.
+    """
+    workers = getattr(settings, 'MONITOR_FLAVOR_LOOKUP_WORKERS',
+                      DEFAULT_LOOKUP_WORKERS)
+    return _lookups.get().lookup(
+        _region(request), flavor_ids,
+        functools.partial(api.nova.flavor_get, request), workers)
+
+
+def get_flavor(request, flavor_id):
+    """Returns a flavor, from the catalog if it lists it.
+
+    Raises the error of the lookup of a flavor the catalog does not list.
+    """
+    flavor = get_catalog(request).get(flavor_id)
+    if flavor is not None:
+        return flavor
+    found, errors = lookup(request, [flavor_id])
+    if flavor_id in errors:
+        raise errors[flavor_id]
+    return found[flavor_id]
+
+
+def invalidate(request=None):
+    """Drops the catalog of the region of a request, or of every region.
+
+    The flavors looked up one at a time are dropped as well.
+    """
+    _cache.get().invalidate(None if request is None else _region(request))
+    _lookups.get().invalidate()
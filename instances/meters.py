@@ -0,0 +1,217 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Metering data of the process list of instances.
+
+Listing the Ceilometer meters is expensive, so the catalog of meter
+descriptors is shared by the requests of a worker and refreshed every
+``MONITOR_METER_CATALOG_TTL`` seconds.
+"""
+
+import collections
+import datetime
+import functools
+import json
+import operator
+
+from django.conf import settings
+
+from oslo_log import log
+
+from openstack_dashboard import api
+from openstack_dashboard.api import ceilometer
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor import concurrency
+from openstack_dashboard.dashboards.monitor.instances import process_list
+
+LOG = log.getLogger(__name__)
+
+PROCESS_LIST_METER = 'instance.process.list'
+
+DEFAULT_CATALOG_TTL = 300
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_WORKERS = 4
+DEFAULT_BATCH_WINDOW = 1800
+DEFAULT_BATCH_SAMPLES = 3
+
+_catalog = cache.from_setting(cache.TTLCache, 'MONITOR_METER_CATALOG_TTL',
+                              DEFAULT_CATALOG_TTL)
+
+
+def _load_catalog(request):
+    catalog = {}
+    for meter in api.ceilometer.meter_list(request):
+        catalog.setdefault(meter.name, meter)
+    return catalog
+
+
+def get_meter(request, meter_name):
+    """Returns the descriptor of a meter, or None if it is not metered.
+
+    The descriptor is labelled and described the same way as by
+    ceilometer.Meters, without building the descriptors of every meter.
+    """
+    catalog = _catalog.get().get_or_load(
+        'meters', lambda: _load_catalog(request))
+    meter = catalog.get(meter_name)
+    if meter is None:
+        return None
+    meters = ceilometer.Meters(request, ceilometer_meter_list=[meter])
+    return meters._get_meter(meter_name)
+
+
+def get_latest_sample(request, instance_id):
+    """Returns the latest process list sample of an instance, or None."""
+    query = [{"field": "resource_id",
+              "op": "eq",
+              "value": instance_id}]
+    samples = api.ceilometer.sample_list(request, PROCESS_LIST_METER,
+                                         query, limit=1)
+    return samples[0] if samples else None
+
+
+def get_sample_at(request, instance_id, timestamp):
+    """Returns the process list sample of an instance at a timestamp."""
+    query = [{"field": "resource_id", "op": "eq", "value": instance_id},
+             {"field": "timestamp", "op": "eq", "value": timestamp}]
+    samples = api.ceilometer.sample_list(request, PROCESS_LIST_METER,
+                                         query, limit=1)
+    return samples[0] if samples else None
+
+
+def get_samples_since(request, instance_id, since):
+    """Returns the process list samples of an instance since a timestamp.
+
+    The samples are returned oldest first.
+    """
+    query = [{"field": "resource_id", "op": "eq", "value": instance_id},
+             {"field": "timestamp", "op": "gt", "value": since}]
+    samples = api.ceilometer.sample_list(request, PROCESS_LIST_METER, query)
+    return sorted(samples, key=operator.attrgetter('timestamp'))
+
+
+def get_adjacent_timestamp(request, instance_id, op, timestamp, since=None):
+    """Returns the timestamp of the sample of an instance next to another.
+
+    With ``op`` '<=', that of the latest sample at or before ``timestamp``,
+    with '>=', that of the earliest sample at or after it; None if there is
+    none, or none since ``since``. A single sample is queried, with a
+    Ceilometer complex query.
+    """
+    conditions = [{"=": {"meter": PROCESS_LIST_METER}},
+                  {"=": {"resource_id": instance_id}},
+                  {op: {"timestamp": timestamp}}]
+    if since is not None:
+        conditions.append({">=": {"timestamp": since}})
+    order = "desc" if op == "<=" else "asc"
+    client = api.ceilometer.ceilometerclient(request)
+    samples = client.query_samples.query(
+        filter=json.dumps({"and": conditions}),
+        orderby=json.dumps([{"timestamp": order}]),
+        limit=1)
+    return samples[0].timestamp if samples else None
+
+
+def decode_samples(instance_id, samples):
+    """Yields the timestamp and decoded processes of each sample.
+
+    Samples whose payload is not a valid process list are skipped.
+    """
+    for sample in samples:
+        try:
+            processes = process_list.decode(sample.counter_volume)
+        except process_list.ProcessListDecodeError:
+            LOG.warning('Skipping invalid process list of instance %s '
+                        'at %s.', instance_id, sample.timestamp)
+            continue
+        yield sample.timestamp, processes
+
+
+class QueriedSample(object):
+    """Adapts a complex query sample to the api.ceilometer.Sample fields."""
+
+    def __init__(self, sample):
+        self.resource_id = sample.resource_id
+        self.project_id = sample.project_id
+        self.timestamp = sample.timestamp
+        self.counter_volume = sample.volume
+        self.resource_metadata = getattr(sample, 'metadata', {})
+
+
+def _query_chunk(request, instance_ids, since, samples_per_instance):
+    """Returns the newest sample since ``since`` of each of the instances.
+
+    Samples are queried newest first, at most ``samples_per_instance`` for
+    each instance of the query. A query that returns that many may have
+    left out the newest sample of some instances, which are then queried
+    again without the instances already found.
+    """
+    client = api.ceilometer.ceilometerclient(request)
+    latest = {}
+    remaining = list(instance_ids)
+    while remaining:
+        limit = len(remaining) * samples_per_instance
+        query_filter = {"and": [{"=": {"meter": PROCESS_LIST_METER}},
+                                {"in": {"resource_id": remaining}},
+                                {">": {"timestamp": since}}]}
+        samples = client.query_samples.query(
+            filter=json.dumps(query_filter),
+            orderby=json.dumps([{"timestamp": "desc"}]),
+            limit=limit)
+        for sample in samples:
+            latest.setdefault(sample.resource_id, QueriedSample(sample))
+        if len(samples) < limit:
+            break
+        remaining = [instance_id for instance_id in remaining
+                     if instance_id not in latest]
+    return latest
+
+
+def get_latest_samples(request, instance_ids, since=None):
+    """Returns the latest process list sample of each instance.
+
+    The result is keyed by instance id. Only samples newer than ``since``
+    are considered, by default the last ``MONITOR_SAMPLE_BATCH_WINDOW``
+    seconds; instances without a sample since then, or whose query failed,
+    are left out. The instances are queried in chunks of
+    ``MONITOR_SAMPLE_BATCH_SIZE`` with one Ceilometer complex query per
+    chunk, bounded to ``MONITOR_SAMPLE_BATCH_SAMPLES`` samples for each
+    instance, and at most ``MONITOR_SAMPLE_BATCH_WORKERS`` queries in
+    flight.
+    """
+    instance_ids = list(collections.OrderedDict.fromkeys(instance_ids))
+    size = getattr(settings, 'MONITOR_SAMPLE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    workers = getattr(settings, 'MONITOR_SAMPLE_BATCH_WORKERS',
+                      DEFAULT_BATCH_WORKERS)
+    samples_per_instance = getattr(settings, 'MONITOR_SAMPLE_BATCH_SAMPLES',
+                                   DEFAULT_BATCH_SAMPLES)
+    if since is None:
+        window = getattr(settings, 'MONITOR_SAMPLE_BATCH_WINDOW',
+                         DEFAULT_BATCH_WINDOW)
+        since = (datetime.datetime.utcnow() -
+                 datetime.timedelta(seconds=window)).isoformat()
+    chunks = [instance_ids[i:i + size]
+              for i in range(0, len(instance_ids), size)]
+    latest = {}
+    outcomes = concurrency.call_concurrently(
+        [functools.partial(_query_chunk, request, chunk, since,
+                           samples_per_instance)
+         for chunk in chunks], max_workers=workers)
+    for chunk, outcome in zip(chunks, outcomes):
+        if outcome.error is not None:
+            LOG.warning('Unable to query the process list samples of %d '
+                        'instances: %s', len(chunk), outcome.error)
+        else:
+            latest.update(outcome.value)
+    return latest
@@ -0,0 +1,93 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Pages of the admin instance list loaded ahead of being requested.
+
+Once a page of instances is retrieved, the following page is loaded in the
+background, so following the "Next" link does not wait on Nova and Neutron.
+A prefetched page belongs to the login session that requested the previous
+one, is used at most once, and is dropped after
+``MONITOR_INSTANCE_PREFETCH_TTL`` seconds; at most
+``MONITOR_INSTANCE_PREFETCH_PAGES`` pages are held by a worker.
+"""
+
+import time
+
+from concurrent import futures
+from django.conf import settings
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor import concurrency
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_PAGES = 64
+DEFAULT_WORKERS = 2
+
+# Pages are counted rather than measured: each one has the size of one.
+_cache = cache.from_setting(cache.LRUCache, 'MONITOR_INSTANCE_PREFETCH_PAGES',
+                            DEFAULT_MAX_PAGES)
+_executor = cache.from_setting(
+    lambda workers: futures.ThreadPoolExecutor(max_workers=workers),
+    'MONITOR_INSTANCE_PREFETCH_WORKERS', DEFAULT_WORKERS)
+
+
+def _session(request):
+    token = getattr(request.user, 'token', None)
+    return getattr(token, 'id', None) or request.session.session_key
+
+
+def page_key(request, search_opts):
+    """Returns the key of the page of instances of a session and filters."""
+    return _session(request), tuple(sorted(search_opts.items()))
+
+
+def prefetch(request, search_opts, load):
+    """Starts loading a page in the background, unless it is already.
+
+    ``load`` is called with a copy of ``search_opts`` and a
+    concurrency.DetachedRequest of the request, which it outlives; its
+    result is returned by take() for the same session and filters.
+    """
+    if not getattr(settings, 'MONITOR_INSTANCE_PREFETCH', True):
+        return
+    key = page_key(request, search_opts)
+    if key[0] is None:
+        return
+    pages = _cache.get()
+    entry = pages.get(key)
+    if entry is not None and entry[0] > time.time():
+        return
+    ttl = getattr(settings, 'MONITOR_INSTANCE_PREFETCH_TTL', DEFAULT_TTL)
+    future = _executor.get().submit(load, concurrency.DetachedRequest(request),
+                                    dict(search_opts))
+    pages.set(key, (time.time() + ttl, future), size=1)
+
+
+def take(request, search_opts):
+    """Returns a prefetched page and forgets it.
+
+    Waits for the page if it is still loading. Returns None if the page was
+    not prefetched, has expired, or could not be loaded, in which case the
+    caller loads it itself.
+    """
+    entry = _cache.get().pop(page_key(request, search_opts))
+    if entry is None:
+        return None
+    expires, future = entry
+    if expires <= time.time():
+        future.cancel()
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
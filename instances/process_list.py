@@ -0,0 +1,355 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Decoding of the ``instance.process.list`` sample payload.
+
+The guest agent publishes the process list of an instance as the
+``counter_volume`` of a Ceilometer sample. Depending on the agent version
+the payload is either a JSON document or the ``repr()`` of a Python list
+whose entries are dicts or sequences of ``(key, value)`` pairs.
+"""
+
+import ast
+import bisect
+import json
+import operator
+import sys
+
+
+FIELDS = ('offset', 'name', 'pid', 'uid', 'gid', 'dtb', 'start_time')
+
+
+class Process(object):
+    """A process of a snapshot.
+
+    Snapshots hold tens of thousands of processes, so records have no
+    instance dict, and their table row id is computed once when decoded.
+    Iterating a record yields its fields in FIELDS order.
+    """
+
+    __slots__ = FIELDS + ('id',)
+
+    def __init__(self, offset, name, pid, uid, gid, dtb, start_time):
+        self.offset = offset
+        self.name = name
+        self.pid = pid
+        self.uid = uid
+        self.gid = gid
+        self.dtb = dtb
+        self.start_time = start_time
+        # The pid and the start time identify a process across snapshots,
+        # but kernel threads share pid 0 and agents may omit the start
+        # time; the offset of the task in guest memory tells those apart,
+        # as in the keys of the timeline.
+        self.id = "%s-%s-%s" % (pid, start_time, offset)
+
+    def __iter__(self):
+        return iter((self.offset, self.name, self.pid, self.uid, self.gid,
+                     self.dtb, self.start_time))
+
+    def __eq__(self, other):
+        if not isinstance(other, Process):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'Process(%s)' % ', '.join(
+            '%s=%r' % field for field in zip(FIELDS, self))
+
+
+# Maps the keys used by the guest agent to the position of the field in a
+# Process record.
+_PAYLOAD_KEYS = {
+    'offset': 0,
+    'process_name': 1,
+    'pid': 2,
+    'uid': 3,
+    'gid': 4,
+    'dtb': 5,
+    'start_time': 6,
+}
+
+_INTEGER_FIELDS = (2, 3, 4)
+
+_SHARED_FIELDS = (1, 3, 4, 6)
+
+_MISSING = object()
+
+# Number of records measured by estimate_size().
+_SIZE_SAMPLE = 64
+
+
+def row_id(process):
+    """Returns the id of the table row of a process."""
+    return process.id
+
+
+class ProcessListDecodeError(ValueError):
+    """Raised when a sample payload is not a valid process list."""
+
+
+def _literal_to_json(counter_volume):
+    """Rewrites a Python list literal as JSON, or returns None.
+
+    Only payloads without double quotes, backslashes or NUL characters are
+    rewritten: in those every string is delimited by single quotes and has
+    no escapes, so splitting on the quote character separates the strings
+    from the structure without a tokenizer.
+    """
+    if ('"' in counter_volume or '\\' in counter_volume
+            or '\x00' in counter_volume):
+        return None
+    parts = counter_volume.split("'")
+    if len(parts) % 2 == 0:
+        return None
+    # The unicode prefix of Python 2 string literals is the only thing that
+    # ends a structural part, hence the 'u\x00' replacement.
+    structure = ('\x00'.join(parts[0::2])
+                 .replace('u\x00', '\x00')
+                 .replace('(', '[')
+                 .replace(')', ']')
+                 .replace('None', 'null')
+                 .replace('True', 'true')
+                 .replace('False', 'false'))
+    parts[0::2] = structure.split('\x00')
+    return '"'.join(parts)
+
+
+def _load(counter_volume):
+    if isinstance(counter_volume, (list, tuple)):
+        return counter_volume
+    try:
+        return json.loads(counter_volume)
+    except (TypeError, ValueError):
+        pass
+    # Older agents publish the repr() of a Python list, which is not JSON.
+    # It is rewritten to JSON when that can be done safely, and otherwise
+    # parsed with literal_eval; neither can execute code in the dashboard
+    # process, unlike the eval() this replaces.
+    converted = _literal_to_json(counter_volume)
+    if converted is not None:
+        try:
+            return json.loads(converted)
+        except ValueError:
+            pass
+    try:
+        return ast.literal_eval(counter_volume)
+    except (SyntaxError, TypeError, ValueError, MemoryError, RuntimeError):
+        raise ProcessListDecodeError('Process list payload is not a list '
+                                     'literal.')
+
+
+def _decode_entry(index, entry, shared):
+    row = [_MISSING] * len(FIELDS)
+    items = entry.items() if isinstance(entry, dict) else entry
+    try:
+        for key, value in items:
+            position = _PAYLOAD_KEYS.get(key)
+            if position is not None:
+                row[position] = value
+    except (TypeError, ValueError):
+        raise ProcessListDecodeError('Process entry %d is not a mapping.'
+                                     % index)
+    for position, value in enumerate(row):
+        if value is _MISSING:
+            raise ProcessListDecodeError('Process entry %d has no "%s".'
+                                         % (index, FIELDS[position]))
+    for position in _INTEGER_FIELDS:
+        try:
+            row[position] = int(row[position])
+        except (TypeError, ValueError):
+            raise ProcessListDecodeError('Process entry %d has an invalid '
+                                         '"%s".' % (index, FIELDS[position]))
+    # Names, uids, gids and boot-time start times repeat across the
+    # processes of a snapshot; the records share one object per value.
+    for position in _SHARED_FIELDS:
+        value = row[position]
+        row[position] = shared.setdefault(value, value)
+    return Process(*row)
+
+
+def decode(counter_volume):
+    """Decodes a process list payload into a list of Process records.
+
+    Raises ProcessListDecodeError if the payload is not a list or if any
+    entry lacks one of the fields shown by the process list table.
+    """
+    entries = _load(counter_volume)
+    if not isinstance(entries, (list, tuple)):
+        raise ProcessListDecodeError('Process list payload is not a list.')
+    shared = {}
+    return [_decode_entry(index, entry, shared)
+            for index, entry in enumerate(entries)]
+
+
+def estimate_size(processes):
+    """Estimates the memory used by a list of Process records, in bytes.
+
+    The size of the records is extrapolated from the first few of them,
+    which is accurate enough to budget a cache; values shared between
+    records are counted for each of them.
+    """
+    size = sys.getsizeof(processes)
+    sample = processes[:_SIZE_SAMPLE]
+    if sample:
+        sampled = sum(sys.getsizeof(process) + sys.getsizeof(process.id) +
+                      sum(sys.getsizeof(value) for value in process)
+                      for process in sample)
+        size += sampled * len(processes) // len(sample)
+    return size
+
+
+SORT_KEYS = ('pid', 'name', 'uid', 'start_time')
+
+
+def parse_filters(params):
+    """Returns the process sort order and filters of request parameters.
+
+    ``process_sort`` is one of SORT_KEYS, prefixed with '-' for descending
+    order; ``process_name`` and ``process_uid`` filter the processes.
+    """
+    sort = params.get('process_sort', 'pid')
+    if sort.lstrip('-') not in SORT_KEYS:
+        sort = 'pid'
+    try:
+        uid = int(params['process_uid'])
+    except (KeyError, ValueError):
+        uid = None
+    return {'sort': sort,
+            'name': params.get('process_name', '').strip(),
+            'uid': uid}
+
+
+def query_args(filters):
+    """Returns the ProcessIndex query arguments of parsed filters."""
+    return {'sort': filters['sort'].lstrip('-'),
+            'reverse': filters['sort'].startswith('-'),
+            'name': filters['name'],
+            'uid': filters['uid']}
+
+
+class ProcessIndex(object):
+    """Sort orders and filter indexes over the processes of a snapshot.
+
+    Each index is built on first use and kept for the lifetime of the
+    snapshot, so paging, sorting and filtering a cached snapshot does not
+    scan its records again.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._orders = {}
+        self._names = None
+        self._uids = None
+        self._row_positions = None
+
+    def __len__(self):
+        return len(self.processes)
+
+    def _order(self, key, reverse):
+        """Returns the positions in sort order and the rank of each one."""
+        order = self._orders.get((key, reverse))
+        if order is None:
+            field = operator.attrgetter(key)
+            processes = self.processes
+            positions = sorted(
+                range(len(processes)),
+                key=lambda i: (field(processes[i]), processes[i].pid),
+                reverse=reverse)
+            rank = [0] * len(positions)
+            for i, position in enumerate(positions):
+                rank[position] = i
+            order = self._orders[(key, reverse)] = (positions, rank)
+        return order
+
+    def _name_positions(self):
+        if self._names is None:
+            names = {}
+            for position, process in enumerate(self.processes):
+                names.setdefault(process.name, []).append(position)
+            self._names = names
+        return self._names
+
+    def _uid_positions(self):
+        if self._uids is None:
+            uids = {}
+            for position, process in enumerate(self.processes):
+                uids.setdefault(process.uid, []).append(position)
+            self._uids = uids
+        return self._uids
+
+    def position(self, process_row_id):
+        """Returns the position of the process with the given row id."""
+        if self._row_positions is None:
+            self._row_positions = dict(
+                (row_id(process), position)
+                for position, process in enumerate(self.processes))
+        return self._row_positions.get(process_row_id)
+
+    def select(self, name=None, uid=None):
+        """Returns the positions of processes matching every given filter.
+
+        ``name`` matches case-insensitively anywhere in the process name;
+        only the distinct names are scanned, not the processes.
+        """
+        selected = None
+        if name:
+            name = name.lower()
+            selected = set()
+            for process_name, positions in self._name_positions().items():
+                if name in (u'%s' % process_name).lower():
+                    selected.update(positions)
+        if uid is not None:
+            positions = set(self._uid_positions().get(uid, ()))
+            selected = positions if selected is None else selected & positions
+        return selected
+
+    def _positions(self, sort, reverse, name, uid):
+        positions, rank = self._order(sort, reverse)
+        selected = self.select(name=name, uid=uid)
+        if selected is not None:
+            positions = sorted(selected, key=rank.__getitem__)
+        return positions, rank, selected
+
+    def iterate(self, sort='pid', reverse=False, name=None, uid=None):
+        """Yields the processes matching the filters in sort order."""
+        positions, _rank, _selected = self._positions(sort, reverse,
+                                                      name, uid)
+        processes = self.processes
+        for position in positions:
+            yield processes[position]
+
+    def query(self, sort='pid', reverse=False, name=None, uid=None,
+              marker=None, limit=None):
+        """Returns a page of processes and whether more pages follow.
+
+        ``marker`` is the position of the last process of the previous page.
+        """
+        positions, rank, selected = self._positions(sort, reverse, name, uid)
+        start = 0
+        if marker is not None:
+            if selected is None:
+                start = rank[marker] + 1
+            else:
+                marker_rank = rank[marker]
+                start = bisect.bisect_right(
+                    [rank[position] for position in positions], marker_rank)
+        end = len(positions) if limit is None else start + limit
+        page = [self.processes[position] for position in positions[start:end]]
+        return page, end < len(positions)
@@ -0,0 +1,498 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Local store of the process list samples of instances.
+
+Reading the process list history from Ceilometer takes seconds and is
+bounded by its retention, so the samples can also be kept in a local SQLite
+database, enabled by setting ``MONITOR_PROCESS_STORE_PATH``. Each distinct
+process is stored once, with its name and start time interned in a string
+table, and a snapshot is stored as the processes added and removed since
+the previous snapshot of the instance. Every KEYFRAME_INTERVAL-th snapshot
+of an instance lists all of its processes instead, which bounds the number
+of deltas applied to read a snapshot back.
+
+The store only holds the samples synced since it was enabled: an instance
+with no stored snapshot is synced from the start of the history requested
+first, or from its latest sample, and an instance is never synced from
+earlier than ``MONITOR_PROCESS_STORE_BACKFILL`` seconds ago. If the database cannot be written, the
+samples are read from Ceilometer as if the store was not enabled.
+"""
+
+import datetime
+import operator
+import sqlite3
+import threading
+
+from django.conf import settings
+
+from oslo_log import log
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import process_list
+
+LOG = log.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS processes (
+    id INTEGER PRIMARY KEY,
+    offset NOT NULL, name INTEGER, pid INTEGER, uid INTEGER, gid INTEGER,
+    dtb NOT NULL, start_time INTEGER,
+    UNIQUE (offset, name, pid, uid, gid, dtb, start_time)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    instance_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    UNIQUE (instance_id, timestamp)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    snapshot INTEGER NOT NULL,
+    process INTEGER NOT NULL,
+    added INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_snapshot ON changes (snapshot);
+CREATE INDEX IF NOT EXISTS changes_process ON changes (process);
+CREATE INDEX IF NOT EXISTS processes_name ON processes (name);
+CREATE INDEX IF NOT EXISTS processes_start_time ON processes (start_time);
+"""
+
+KEYFRAME_INTERVAL = 32
+
+DEFAULT_SYNC_INTERVAL = 60
+DEFAULT_RETENTION = 7 * 24 * 3600
+DEFAULT_BACKFILL = 3600
+
+# Budget of the process ids of the latest snapshots kept in memory to
+# compute the next deltas.
+DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+_MEMBER_SIZE = 150
+
+# Number of interned string ids kept in memory.
+_STRING_CACHE_SIZE = 100000
+
+# SQLite bounds the number of parameters of a statement.
+_QUERY_CHUNK = 500
+
+# The offset and dtb of a process may be null, which a UNIQUE constraint
+# does not compare; they are stored as an empty blob instead, a value the
+# decoded payloads never hold.
+_SELECT_PROCESSES = """
+SELECT p.id, NULLIF(p.offset, X''), n.value, p.pid, p.uid, p.gid,
+       NULLIF(p.dtb, X''), t.value
+FROM processes p
+JOIN strings n ON n.id = p.name
+JOIN strings t ON t.id = p.start_time
+WHERE p.id IN (%s)
+"""
+
+
+class StoredSample(object):
+    """A process list sample read back from the store.
+
+    It has the sample attributes used by the process list tab; its
+    processes are read from the store by load_processes().
+    """
+
+    def __init__(self, store, instance_id, timestamp):
+        self.store = store
+        self.resource_id = instance_id
+        self.timestamp = timestamp
+        self.resource_metadata = {}
+
+    def load_processes(self):
+        return self.store.snapshot(self.resource_id, self.timestamp)
+
+
+class ProcessStore(object):
+    """Delta encoded process list snapshots in a SQLite database."""
+
+    def __init__(self, path, retention=DEFAULT_RETENTION,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._strings = {}
+        self._latest = cache.LRUCache(cache_size)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _intern(self, cursor, value):
+        string_id = self._strings.get(value)
+        if string_id is None:
+            if len(self._strings) >= _STRING_CACHE_SIZE:
+                self._strings.clear()
+            cursor.execute('INSERT OR IGNORE INTO strings (value) VALUES (?)',
+                           (value,))
+            cursor.execute('SELECT id FROM strings WHERE value = ?', (value,))
+            string_id = self._strings[value] = cursor.fetchone()[0]
+        return string_id
+
+    def _process_id(self, cursor, process):
+        row = (process.offset, self._intern(cursor, process.name),
+               process.pid, process.uid, process.gid, process.dtb,
+               self._intern(cursor, process.start_time))
+        cursor.execute("INSERT OR IGNORE INTO processes (offset, name, pid, "
+                       "uid, gid, dtb, start_time) "
+                       "VALUES (COALESCE(?, X''), ?, ?, ?, ?, "
+                       "COALESCE(?, X''), ?)", row)
+        if cursor.rowcount == 1:
+            return cursor.lastrowid
+        cursor.execute("SELECT id FROM processes WHERE "
+                       "offset = COALESCE(?, X'') AND name = ? AND pid = ? "
+                       "AND uid = ? AND gid = ? AND dtb = COALESCE(?, X'') "
+                       "AND start_time = ?", row)
+        return cursor.fetchone()[0]
+
+    def _latest_snapshot(self, cursor, instance_id):
+        cursor.execute('SELECT id, timestamp, depth FROM snapshots '
+                       'WHERE instance_id = ? ORDER BY id DESC LIMIT 1',
+                       (instance_id,))
+        return cursor.fetchone()
+
+    def _member_ids(self, cursor, instance_id, snapshot_id):
+        """Returns the ids of the processes of a snapshot."""
+        cursor.execute('SELECT MAX(id) FROM snapshots WHERE instance_id = ? '
+                       'AND depth = 0 AND id <= ?', (instance_id, snapshot_id))
+        keyframe = cursor.fetchone()[0]
+        cursor.execute('SELECT c.process, c.added FROM changes c '
+                       'JOIN snapshots s ON s.id = c.snapshot '
+                       'WHERE s.instance_id = ? AND s.id BETWEEN ? AND ? '
+                       'ORDER BY s.id', (instance_id, keyframe, snapshot_id))
+        members = set()
+        for process_id, added in cursor.fetchall():
+            if added:
+                members.add(process_id)
+            else:
+                members.discard(process_id)
+        return members
+
+    def _load(self, cursor, process_ids):
+        """Returns the Process records of the given ids, keyed by id."""
+        process_ids = list(process_ids)
+        shared = {}
+        processes = {}
+        for start in range(0, len(process_ids), _QUERY_CHUNK):
+            chunk = process_ids[start:start + _QUERY_CHUNK]
+            cursor.execute(_SELECT_PROCESSES % ', '.join('?' * len(chunk)),
+                           chunk)
+            for row in cursor.fetchall():
+                # Share the names and start times between the records, as
+                # process_list.decode() does.
+                name = shared.setdefault(row[2], row[2])
+                start_time = shared.setdefault(row[7], row[7])
+                processes[row[0]] = process_list.Process(
+                    row[1], name, row[3], row[4], row[5], row[6], start_time)
+        return processes
+
+    def _members(self, cursor, instance_id, snapshot_id):
+        """Returns a snapshot as a dict of process fields to process id."""
+        cached = self._latest.get(instance_id)
+        if cached is not None and cached[0] == snapshot_id:
+            return cached[1]
+        processes = self._load(cursor, self._member_ids(cursor, instance_id,
+                                                        snapshot_id))
+        return dict((tuple(process), process_id)
+                    for process_id, process in processes.items())
+
+    def ingest(self, instance_id, timestamp, processes):
+        """Stores a snapshot of an instance.
+
+        Returns False without storing it if the instance has a snapshot at
+        or after ``timestamp``.
+        """
+        with self._lock:
+            try:
+                return self._ingest(instance_id, timestamp, processes)
+            except Exception:
+                # Interned ids of a rolled back transaction are invalid.
+                self._strings.clear()
+                self._latest.pop(instance_id)
+                raise
+
+    def _ingest(self, instance_id, timestamp, processes):
+        with self._db:
+            cursor = self._db.cursor()
+            latest = self._latest_snapshot(cursor, instance_id)
+            if latest is not None and timestamp <= latest[1]:
+                return False
+            previous = {}
+            if latest is not None:
+                previous = self._members(cursor, instance_id, latest[0])
+            current = {}
+            added = []
+            for process in processes:
+                key = tuple(process)
+                if key in current:
+                    continue
+                process_id = previous.get(key)
+                if process_id is None:
+                    process_id = self._process_id(cursor, process)
+                    added.append(process_id)
+                current[key] = process_id
+            removed = [process_id for key, process_id in previous.items()
+                       if key not in current]
+
+            keyframe = (latest is None or
+                        latest[2] + 1 >= KEYFRAME_INTERVAL or
+                        len(added) + len(removed) >= len(current))
+            depth = 0 if keyframe else latest[2] + 1
+            cursor.execute('INSERT INTO snapshots (instance_id, timestamp, '
+                           'depth) VALUES (?, ?, ?)',
+                           (instance_id, timestamp, depth))
+            snapshot_id = cursor.lastrowid
+            if keyframe:
+                changes = [(snapshot_id, process_id, 1)
+                           for process_id in current.values()]
+            else:
+                changes = ([(snapshot_id, process_id, 1)
+                            for process_id in added] +
+                           [(snapshot_id, process_id, 0)
+                            for process_id in removed])
+            cursor.executemany('INSERT INTO changes (snapshot, process, '
+                               'added) VALUES (?, ?, ?)', changes)
+            if keyframe:
+                self._prune(cursor, instance_id)
+        self._latest.set(instance_id, (snapshot_id, current),
+                         size=len(current) * _MEMBER_SIZE)
+        return True
+
+    def _prune(self, cursor, instance_id):
+        """Drops the snapshots of an instance older than the retention.
+
+        The newest keyframe before the cutoff is kept with its deltas, so
+        every snapshot after the cutoff can still be read.
+        """
+        cutoff = (datetime.datetime.utcnow() -
+                  datetime.timedelta(seconds=self.retention)).isoformat()
+        cursor.execute('SELECT MAX(id) FROM snapshots WHERE instance_id = ? '
+                       'AND depth = 0 AND timestamp <= ?',
+                       (instance_id, cutoff))
+        keep = cursor.fetchone()[0]
+        if keep is None:
+            return
+        cursor.execute('SELECT DISTINCT c.process FROM changes c '
+                       'JOIN snapshots s ON s.id = c.snapshot '
+                       'WHERE s.instance_id = ? AND s.id < ?',
+                       (instance_id, keep))
+        dropped = [row[0] for row in cursor.fetchall()]
+        cursor.execute('DELETE FROM changes WHERE snapshot IN (SELECT id '
+                       'FROM snapshots WHERE instance_id = ? AND id < ?)',
+                       (instance_id, keep))
+        cursor.execute('DELETE FROM snapshots WHERE instance_id = ? '
+                       'AND id < ?', (instance_id, keep))
+        self._collect(cursor, dropped)
+
+    def _collect(self, cursor, process_ids):
+        """Deletes the given processes no snapshot refers to any more.
+
+        The strings only the deleted processes referred to are deleted too.
+        """
+        strings = set()
+        for start in range(0, len(process_ids), _QUERY_CHUNK):
+            chunk = process_ids[start:start + _QUERY_CHUNK]
+            cursor.execute('SELECT id, name, start_time FROM processes p '
+                           'WHERE id IN (%s) AND NOT EXISTS (SELECT 1 '
+                           'FROM changes WHERE process = p.id)'
+                           % ', '.join('?' * len(chunk)), chunk)
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+            cursor.executemany('DELETE FROM processes WHERE id = ?',
+                               [(row[0],) for row in rows])
+            for row in rows:
+                strings.update(row[1:])
+        strings = list(strings)
+        deleted = 0
+        for start in range(0, len(strings), _QUERY_CHUNK):
+            chunk = strings[start:start + _QUERY_CHUNK]
+            cursor.execute('DELETE FROM strings WHERE id IN (%s) '
+                           'AND NOT EXISTS (SELECT 1 FROM processes '
+                           'WHERE name = strings.id) '
+                           'AND NOT EXISTS (SELECT 1 FROM processes '
+                           'WHERE start_time = strings.id)'
+                           % ', '.join('?' * len(chunk)), chunk)
+            deleted += cursor.rowcount
+        if deleted:
+            # The interned ids of the deleted strings are no longer valid.
+            self._strings.clear()
+
+    def latest(self, instance_id):
+        """Returns the latest StoredSample of an instance, or None."""
+        with self._lock:
+            latest = self._latest_snapshot(self._db.cursor(), instance_id)
+        if latest is None:
+            return None
+        return StoredSample(self, instance_id, latest[1])
+
+    def sample(self, instance_id, timestamp):
+        """Returns the StoredSample at ``timestamp``, or None."""
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute('SELECT 1 FROM snapshots WHERE instance_id = ? '
+                           'AND timestamp = ?', (instance_id, timestamp))
+            if cursor.fetchone() is None:
+                return None
+        return StoredSample(self, instance_id, timestamp)
+
+    def timestamps(self, instance_id):
+        """Returns the timestamps of the snapshots of an instance, sorted."""
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute('SELECT timestamp FROM snapshots '
+                           'WHERE instance_id = ? ORDER BY id', (instance_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def snapshot(self, instance_id, timestamp):
+        """Returns the processes of a snapshot, or None if it is unknown."""
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute('SELECT id FROM snapshots WHERE instance_id = ? '
+                           'AND timestamp = ?', (instance_id, timestamp))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            processes = self._load(cursor, self._member_ids(
+                cursor, instance_id, row[0]))
+        return [processes[process_id] for process_id in sorted(processes)]
+
+    def history(self, instance_id, since):
+        """Returns the snapshots of an instance after ``since``.
+
+        Snapshots are returned oldest first as (timestamp, processes) pairs.
+        Only the first one is rebuilt from its keyframe; each following one
+        is derived from its predecessor, reading only the added processes.
+        """
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute('SELECT id, timestamp, depth FROM snapshots '
+                           'WHERE instance_id = ? AND timestamp > ? '
+                           'ORDER BY id', (instance_id, since))
+            rows = cursor.fetchall()
+            if not rows:
+                return []
+            members = self._load(cursor, self._member_ids(
+                cursor, instance_id, rows[0][0]))
+            history = [(rows[0][1], members)]
+            for snapshot_id, timestamp, depth in rows[1:]:
+                cursor.execute('SELECT process, added FROM changes '
+                               'WHERE snapshot = ?', (snapshot_id,))
+                changes = cursor.fetchall()
+                # A keyframe lists every process of its snapshot.
+                members = {} if depth == 0 else dict(members)
+                for process_id, added in changes:
+                    if not added:
+                        members.pop(process_id, None)
+                members.update(self._load(cursor, [
+                    process_id for process_id, added in changes
+                    if added and process_id not in members]))
+                history.append((timestamp, members))
+        return [(timestamp, [members[process_id]
+                             for process_id in sorted(members)])
+                for timestamp, members in history]
+
+    def stats(self):
+        with self._lock:
+            cursor = self._db.cursor()
+            counts = {}
+            for table in ('strings', 'processes', 'snapshots', 'changes'):
+                cursor.execute('SELECT COUNT(*) FROM %s' % table)
+                counts[table] = cursor.fetchone()[0]
+        return counts
+
+
+_store = cache.Shared(lambda: ProcessStore(
+    settings.MONITOR_PROCESS_STORE_PATH,
+    retention=getattr(settings, 'MONITOR_PROCESS_STORE_RETENTION',
+                      DEFAULT_RETENTION)))
+_synced = cache.from_setting(cache.TTLCache,
+                             'MONITOR_PROCESS_STORE_SYNC_INTERVAL',
+                             DEFAULT_SYNC_INTERVAL)
+
+
+def get_store():
+    """Returns the ProcessStore, or None if the store is not enabled."""
+    if not getattr(settings, 'MONITOR_PROCESS_STORE_PATH', None):
+        return None
+    return _store.get()
+
+
+def get_synced_store(request, instance_id, since=None):
+    """Returns the ProcessStore synced with the samples of an instance.
+
+    Returns None if the store is not enabled, or if it could not be synced
+    because of a database error, for the samples to be read from Ceilometer
+    instead.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        sync(request, instance_id, since=since)
+    except sqlite3.Error as e:
+        LOG.warning('Unable to store the process list samples of instance '
+                    '%s: %s', instance_id, e)
+        return None
+    return store
+
+
+def sync(request, instance_id, since=None):
+    """Stores the samples of an instance published since the latest one.
+
+    An instance is synced at most once every
+    ``MONITOR_PROCESS_STORE_SYNC_INTERVAL`` seconds per worker, from its
+    latest stored snapshot, or if it has none yet from ``since``, or from
+    its latest sample if no start is given. Either way no sample older than
+    ``MONITOR_PROCESS_STORE_BACKFILL`` seconds is fetched, so an instance
+    left unsynced for long is not caught up on all at once. Ceilometer
+    errors are logged, leaving the stored snapshots to be read as they are.
+    """
+    store = get_store()
+    synced = _synced.get()
+    if instance_id in synced:
+        return
+    latest = store.latest(instance_id)
+    backfill = getattr(settings, 'MONITOR_PROCESS_STORE_BACKFILL',
+                       DEFAULT_BACKFILL)
+    oldest = (datetime.datetime.utcnow() -
+              datetime.timedelta(seconds=backfill)).isoformat()
+    try:
+        if latest is not None:
+            samples = meters.get_samples_since(
+                request, instance_id, max(latest.timestamp, oldest))
+        elif since is not None:
+            samples = meters.get_samples_since(request, instance_id,
+                                               max(since, oldest))
+        else:
+            sample = meters.get_latest_sample(request, instance_id)
+            samples = [sample] if sample is not None else []
+    except Exception as e:
+        LOG.warning('Unable to sync the process list samples of instance '
+                    '%s: %s', instance_id, e)
+        return
+    stored = 0
+    for timestamp, processes in meters.decode_samples(
+            instance_id, sorted(samples,
+                                key=operator.attrgetter('timestamp'))):
+        stored += store.ingest(instance_id, timestamp, processes)
+    synced.set(instance_id, True)
+    LOG.debug('process store: %d samples of %s stored', stored, instance_id)
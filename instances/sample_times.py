@@ -0,0 +1,165 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Sample times of the process list of instances.
+
+Selecting the snapshot nearest to a point in time is a binary search over
+the sorted timestamps of the samples of an instance. The timestamps come
+from the local sample store when it is enabled. Otherwise each worker keeps
+the timestamps it has learnt of, and which intervals between them hold no
+other sample: a time that falls in such an interval is answered from the
+index, any other time with two single-sample queries for the samples on
+either side of it. Only the last ``MONITOR_PROCESS_HISTORY_WINDOW`` seconds
+are indexed.
+"""
+
+import bisect
+import datetime
+import threading
+
+from django.conf import settings
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import sample_store
+
+DEFAULT_WINDOW = 24 * 3600
+DEFAULT_CACHE_SIZE = 4 * 1024 * 1024
+
+# Rough memory footprint of an indexed timestamp.
+_TIMESTAMP_SIZE = 80
+
+TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+
+def parse_time(value):
+    """Returns a requested time as a datetime, or None if it is invalid."""
+    value = (value or '').strip()
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def _to_datetime(timestamp):
+    # Sample timestamps may have fractional seconds or a time zone suffix;
+    # the nearest sample is chosen to the second.
+    return datetime.datetime.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def nearest_timestamp(timestamps, when):
+    """Returns the timestamp of ``timestamps`` nearest to ``when``.
+
+    ``timestamps`` is a sorted list of sample timestamps and ``when`` a
+    datetime; returns None if the list is empty.
+    """
+    if not timestamps:
+        return None
+    position = bisect.bisect_left(timestamps, when.isoformat())
+    candidates = timestamps[max(0, position - 1):position + 1]
+    return min(candidates,
+               key=lambda timestamp: abs(_to_datetime(timestamp) - when))
+
+
+class SampleTimes(object):
+    """Known timestamps of the samples of an instance, sorted.
+
+    ``closed[i]`` tells whether the instance is known to have no sample
+    between ``timestamps[i]`` and ``timestamps[i + 1]``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timestamps = []
+        self.closed = []
+
+    def _insert(self, timestamp):
+        position = bisect.bisect_left(self.timestamps, timestamp)
+        if self.timestamps[position:position + 1] != [timestamp]:
+            self.timestamps.insert(position, timestamp)
+            # The new timestamp splits the interval it falls in.
+            self.closed.insert(position,
+                               position > 0 and self.closed[position - 1])
+
+    def add(self, lower, upper):
+        """Records the samples at ``lower`` and ``upper`` as adjacent.
+
+        Either may be None, if there is no sample on that side.
+        """
+        for timestamp in (lower, upper):
+            if timestamp is not None:
+                self._insert(timestamp)
+        if lower is not None and upper is not None:
+            for position in range(self.timestamps.index(lower),
+                                  self.timestamps.index(upper)):
+                self.closed[position] = True
+
+    def bracket(self, timestamp):
+        """Returns the samples around ``timestamp``, or None if unknown.
+
+        Returns the timestamps of the latest sample at or before
+        ``timestamp`` and of the earliest sample at or after it.
+        """
+        position = bisect.bisect_left(self.timestamps, timestamp)
+        if self.timestamps[position:position + 1] == [timestamp]:
+            return timestamp, timestamp
+        if 0 < position < len(self.timestamps) and self.closed[position - 1]:
+            return self.timestamps[position - 1], self.timestamps[position]
+        return None
+
+    def expire(self, before):
+        position = bisect.bisect_left(self.timestamps, before)
+        del self.timestamps[:position]
+        del self.closed[:position]
+
+
+_cache = cache.from_setting(cache.LRUCache,
+                            'MONITOR_SAMPLE_TIMES_CACHE_SIZE',
+                            DEFAULT_CACHE_SIZE)
+
+
+def nearest(request, instance_id, when):
+    """Returns the timestamp of the sample nearest to ``when``, or None."""
+    window = getattr(settings, 'MONITOR_PROCESS_HISTORY_WINDOW',
+                     DEFAULT_WINDOW)
+    cutoff = (datetime.datetime.utcnow() -
+              datetime.timedelta(seconds=window)).isoformat()
+    store = sample_store.get_synced_store(request, instance_id,
+                                          since=cutoff)
+    if store is not None:
+        return nearest_timestamp(
+            [timestamp for timestamp in store.timestamps(instance_id)
+             if timestamp >= cutoff], when)
+
+    times_cache = _cache.get()
+    sample_times = times_cache.get(instance_id)
+    if sample_times is None:
+        sample_times = SampleTimes()
+    timestamp = when.isoformat()
+    with sample_times.lock:
+        sample_times.expire(cutoff)
+        bracket = sample_times.bracket(timestamp)
+    if bracket is None:
+        bracket = tuple(
+            meters.get_adjacent_timestamp(request, instance_id, op,
+                                          timestamp, since=cutoff)
+            for op in ('<=', '>='))
+        with sample_times.lock:
+            sample_times.add(*bracket)
+    times_cache.set(instance_id, sample_times,
+                    size=len(sample_times.timestamps) * _TIMESTAMP_SIZE)
+    return nearest_timestamp(
+        [timestamp for timestamp in bracket if timestamp is not None], when)
@@ -0,0 +1,250 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Search indexes over the servers of the server cache.
+
+The filters of the admin instance list are answered by narrowing the
+cached servers down to candidates with an index, then checking the
+candidates against every filter, so a filtered page costs time in the
+number of matches rather than in the number of servers:
+
+* names, which Nova matches as regular expressions, by the trigrams of the
+  literal parts of the expression;
+* IPv4 and IPv6 addresses, which Nova matches as regular expressions from
+  their start, by the literal characters and wildcards the expression
+  starts with, in sorted lists of the addresses;
+* projects, hosts, statuses, images and flavors by value.
+
+A filter the indexes cannot narrow down, such as a name expression without
+three literal characters in a row, is checked against every server.
+"""
+
+import bisect
+import collections
+
+
+GRAM = 3
+
+# Characters of regular expressions other than the '.' wildcard, which
+# separates literal parts.
+_METACHARACTERS = frozenset('^$*+?{}[]\\|()')
+
+# Quantifiers that make the character before them optional.
+_OPTIONAL = frozenset('*?{')
+
+
+def _host(server):
+    return getattr(server, 'OS-EXT-SRV-ATTR:host', None)
+
+
+def _resource_id(attr):
+    def get(server):
+        return (getattr(server, attr, None) or {}).get('id')
+    return get
+
+
+# The search options answered by value, and how to get the value of a
+# server.
+VALUES = {
+    'tenant_id': lambda server: server.tenant_id,
+    'host': _host,
+    'status': lambda server: server.status.lower(),
+    'image': _resource_id('image'),
+    'flavor': _resource_id('flavor'),
+}
+
+# The search options answered by address, and the address version.
+ADDRESSES = {'ip': 4, 'ip6': 6}
+
+
+def grams(text):
+    """Returns the trigrams of a lower-cased text."""
+    text = text.lower()
+    return set(text[i:i + GRAM] for i in range(len(text) - GRAM + 1))
+
+
+def pattern_grams(pattern):
+    """Returns the trigrams every name matching a pattern contains.
+
+    Returns None if the pattern is not made of literal parts separated by
+    wildcards, or if the parts are too short.
+    """
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    if pattern.endswith('$'):
+        pattern = pattern[:-1]
+    if _METACHARACTERS.intersection(pattern):
+        return None
+    found = set()
+    for part in pattern.split('.'):
+        found.update(grams(part))
+    return found or None
+
+
+def address_pattern(value):
+    """Returns the start every address matching a filter value has.
+
+    The start is returned as a list of lower-cased characters, with None
+    for the '.' wildcard, up to the first other construct of the
+    expression. Returns None if it is empty or if the expression has
+    alternatives.
+    """
+    if '|' in value:
+        return None
+    if value.startswith('^'):
+        value = value[1:]
+    value = value.lower()
+    pattern = []
+    position = 0
+    while position < len(value):
+        character = value[position]
+        if character == '\\':
+            escaped = value[position + 1:position + 2]
+            if not escaped or escaped.isalnum():
+                break
+            item, step = escaped, 2
+        elif character == '.':
+            item, step = None, 1
+        elif character in _METACHARACTERS:
+            break
+        else:
+            item, step = character, 1
+        following = value[position + step:position + step + 1]
+        if following and following in _OPTIONAL:
+            break
+        pattern.append(item)
+        position += step
+    return pattern or None
+
+
+def _addresses(server, version):
+    for addresses in (getattr(server, 'addresses', None) or {}).values():
+        for address in addresses:
+            if address.get('version') == version and address.get('addr'):
+                yield address['addr'].lower()
+
+
+class ServerIndex(object):
+    """Indexes of servers by name, address and value.
+
+    Servers are added and removed one at a time, so the index follows the
+    deltas of the server cache.
+    """
+
+    def __init__(self, servers=()):
+        self._names = collections.defaultdict(set)
+        self._addresses = dict((version, [])
+                               for version in ADDRESSES.values())
+        self._values = dict((key, collections.defaultdict(set))
+                            for key in VALUES)
+        self._indexed = {}
+        for server in servers:
+            self.add(server)
+
+    def __len__(self):
+        return len(self._indexed)
+
+    def add(self, server):
+        if server.id in self._indexed:
+            self.remove(server.id)
+        self._indexed[server.id] = server
+        for gram in grams(server.name or ''):
+            self._names[gram].add(server.id)
+        for version, addresses in self._addresses.items():
+            for address in _addresses(server, version):
+                bisect.insort(addresses, (address, server.id))
+        for key, get in VALUES.items():
+            self._values[key][get(server)].add(server.id)
+
+    def remove(self, server_id):
+        server = self._indexed.pop(server_id, None)
+        if server is None:
+            return
+        for gram in grams(server.name or ''):
+            self._discard(self._names, gram, server_id)
+        for version, addresses in self._addresses.items():
+            for address in _addresses(server, version):
+                position = bisect.bisect_left(addresses, (address, server_id))
+                if (position < len(addresses) and
+                        addresses[position] == (address, server_id)):
+                    del addresses[position]
+        for key, get in VALUES.items():
+            self._discard(self._values[key], get(server), server_id)
+
+    @staticmethod
+    def _discard(index, key, server_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(server_id)
+            if not ids:
+                del index[key]
+
+    def _matching(self, version, pattern):
+        """Returns the ids of the servers with an address starting with a
+        pattern of address_pattern().
+        """
+        addresses = self._addresses[version]
+        ids = set()
+        # Prefixes of addresses, with the length of the pattern they match.
+        pending = [('', 0)]
+        while pending:
+            prefix, length = pending.pop()
+            while length < len(pattern) and pattern[length] is not None:
+                prefix += pattern[length]
+                length += 1
+            position = bisect.bisect_left(addresses, (prefix,))
+            while (position < len(addresses) and
+                   addresses[position][0].startswith(prefix)):
+                address = addresses[position][0]
+                if length == len(pattern):
+                    ids.add(addresses[position][1])
+                    position += 1
+                elif len(address) == len(prefix):
+                    position += 1
+                else:
+                    # A wildcard: each character following the prefix
+                    # extends it once, then its addresses are skipped.
+                    extended = address[:len(prefix) + 1]
+                    pending.append((extended, length + 1))
+                    position = bisect.bisect_left(
+                        addresses,
+                        (extended[:-1] + chr(ord(extended[-1]) + 1),))
+        return ids
+
+    def candidates(self, search_opts):
+        """Returns the ids of the servers that may match search options.
+
+        Returns None if no option can be answered from the indexes. The
+        candidates still have to be checked against the options.
+        """
+        found = []
+        for key, value in search_opts.items():
+            if value is None:
+                continue
+            if key in VALUES:
+                if key == 'status':
+                    value = value.lower()
+                found.append(self._values[key].get(value, set()))
+            elif key in ADDRESSES:
+                pattern = address_pattern(value)
+                if pattern is not None:
+                    found.append(self._matching(ADDRESSES[key], pattern))
+            elif key == 'name':
+                pattern = pattern_grams(value)
+                if pattern is not None:
+                    found.extend(self._names.get(gram, set())
+                                 for gram in pattern)
+        if not found:
+            return None
+        found.sort(key=len)
+        return found[0].intersection(*found[1:])
@@ -0,0 +1,290 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Servers of all projects kept in memory and synced with deltas.
+
+Listing every server of a cloud on each load of the admin instance list is
+the heaviest request the panel makes to Nova. With ``MONITOR_SERVER_CACHE``
+set, the servers of a region are listed once, then brought up to date with
+the servers changed since the previous sync, deleted ones included, at most
+every ``MONITOR_SERVER_CACHE_REFRESH`` seconds. Pages and filters of the
+list are answered from memory, with the help of the indexes of
+search_index.
+
+A full listing is made again every ``MONITOR_SERVER_CACHE_MAX_AGE`` seconds,
+which bounds how long a change missed by the deltas is shown, and whenever
+the list is requested with the ``refresh`` parameter.
+"""
+
+import copy
+import datetime
+import re
+import threading
+import time
+
+from django.conf import settings
+from horizon.utils import functions as utils
+
+from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor.instances import search_index
+
+DEFAULT_REFRESH = 10
+DEFAULT_MAX_AGE = 3600
+DEFAULT_LIST_LIMIT = 1000
+
+# Seconds by which a delta overlaps the previous sync, to allow for the
+# clocks of the dashboard and Nova to differ.
+SYNC_OVERLAP = 5
+
+REFRESH_PARAM = 'refresh'
+
+# ServerCache by region.
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'MONITOR_SERVER_CACHE', False)
+
+
+def _regex(value):
+    # Nova matches names and addresses as regular expressions; a value
+    # that is not one is matched literally.
+    try:
+        return re.compile(value, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(value), re.IGNORECASE)
+
+
+def _address_filter(version):
+    def build(value):
+        # Nova matches addresses from their start.
+        match_address = _regex(value).match
+
+        def match(server):
+            for addresses in (getattr(server, 'addresses', None) or
+                              {}).values():
+                for address in addresses:
+                    if (address.get('version') == version and
+                            match_address(address.get('addr', ''))):
+                        return True
+            return False
+        return match
+    return build
+
+
+def _name_filter(value):
+    search = _regex(value).search
+    return lambda server: bool(search(server.name or ''))
+
+
+def _equal_filter(get):
+    return lambda value: lambda server: get(server) == value
+
+
+def _id_of(attr):
+    def get(server):
+        # Servers booted from volumes have no image, which Nova returns as
+        # an empty string.
+        return (getattr(server, attr, None) or {}).get('id')
+    return get
+
+
+# Builds a predicate from the value of each search option answered from
+# memory.
+FILTERS = {
+    'tenant_id': _equal_filter(lambda server: server.tenant_id),
+    'host': _equal_filter(
+        lambda server: getattr(server, 'OS-EXT-SRV-ATTR:host', None)),
+    'name': _name_filter,
+    'ip': _address_filter(4),
+    'ip6': _address_filter(6),
+    'status': lambda value: (
+        lambda server: server.status.lower() == value.lower()),
+    'image': _equal_filter(_id_of('image')),
+    'flavor': _equal_filter(_id_of('flavor')),
+}
+
+_PAGING = ('marker', 'paginate')
+
+
+def supports(search_opts):
+    """Whether the servers of search options can be listed from memory."""
+    return all(key in FILTERS or key in _PAGING for key in search_opts)
+
+
+def _sort_key(server):
+    # The default order of Nova: newest first.
+    return getattr(server, 'created', None) or '', server.id
+
+
+def iter_pages(request, search_opts):
+    """Yields the servers of all projects matching search options from
+    Nova, a page of up to ``API_RESULT_LIMIT`` servers at a time.
+
+    Each page is requested with an explicit limit and the last server of
+    the previous page as marker, rather than at the page size of the
+    tables. As Horizon does, ``API_RESULT_LIMIT`` is assumed not to exceed
+    the ``osapi_max_limit`` of Nova, so a shorter page is the last one.
+    """
+    limit = getattr(settings, 'API_RESULT_LIMIT', DEFAULT_LIST_LIMIT)
+    opts = dict(search_opts, limit=limit)
+    while True:
+        page, more = api.nova.server_list(request,
+                                          search_opts=dict(opts),
+                                          all_tenants=True)
+        if page:
+            yield page
+        if len(page) < limit:
+            return
+        opts['marker'] = page[-1].id
+
+
+def list_all(request, search_opts):
+    """Lists every server of all projects matching search options from
+    Nova.
+    """
+    servers = []
+    for page in iter_pages(request, search_opts):
+        servers.extend(page)
+    return servers
+
+
+class ServerCache(object):
+    """The servers of all projects of a region."""
+
+    def __init__(self, timer=time.time):
+        self._timer = timer
+        # Syncs are made one at a time; the servers are only locked while
+        # a sync applies its changes, not while it waits on Nova.
+        self._sync_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._servers = {}
+        self._order = []
+        self._index = search_index.ServerIndex()
+        self.loaded = None
+        self.synced = None
+
+    def __len__(self):
+        return len(self._order)
+
+    def sync(self, request, force=False):
+        """Brings the servers up to date, if they are due to be."""
+        refresh = getattr(settings, 'MONITOR_SERVER_CACHE_REFRESH',
+                          DEFAULT_REFRESH)
+        max_age = getattr(settings, 'MONITOR_SERVER_CACHE_MAX_AGE',
+                          DEFAULT_MAX_AGE)
+        with self._sync_lock:
+            now = self._timer()
+            if force or self.loaded is None or now - self.loaded >= max_age:
+                servers = list_all(request, {})
+                index = search_index.ServerIndex(servers)
+                with self._lock:
+                    self._servers = dict((server.id, server)
+                                         for server in servers)
+                    self._index = index
+                    self._sort()
+                self.loaded = now
+            elif now - self.synced >= refresh:
+                since = datetime.datetime.utcfromtimestamp(
+                    int(self.synced) - SYNC_OVERLAP)
+                changes = list_all(request,
+                                   {'changes-since': since.isoformat()})
+                with self._lock:
+                    for server in changes:
+                        if server.status.upper() == 'DELETED':
+                            self._servers.pop(server.id, None)
+                            self._index.remove(server.id)
+                        else:
+                            self._servers[server.id] = server
+                            self._index.add(server)
+                    if changes:
+                        self._sort()
+            else:
+                return
+            self.synced = now
+
+    def _sort(self):
+        self._order = sorted(self._servers.values(), key=_sort_key,
+                             reverse=True)
+
+    def servers(self):
+        """Returns every server, newest first.
+
+        The servers are shared by the requests of the worker and must not
+        be changed.
+        """
+        return self._order
+
+    def query(self, request, search_opts):
+        """Returns the servers matching search options and whether more
+        follow, a page at a time if ``paginate`` is set.
+        """
+        opts = dict(search_opts)
+        marker = opts.pop('marker', None)
+        paginate = opts.pop('paginate', False)
+        predicates = [FILTERS[key](value) for key, value in opts.items()
+                      if value is not None]
+        with self._lock:
+            candidates = self._index.candidates(opts)
+            if candidates is None:
+                servers = self._order
+            else:
+                servers = sorted((self._servers[server_id]
+                                  for server_id in candidates),
+                                 key=_sort_key, reverse=True)
+        if predicates:
+            servers = [server for server in servers
+                       if all(match(server) for match in predicates)]
+        start = 0
+        if marker is not None:
+            for position, server in enumerate(servers):
+                if server.id == marker:
+                    start = position + 1
+                    break
+        end = len(servers)
+        if paginate:
+            end = min(end, start + utils.get_page_size(request))
+        # The servers are shared by the requests of the worker, which
+        # annotate the ones they show.
+        page = []
+        for server in servers[start:end]:
+            server = copy.copy(server)
+            if hasattr(server, 'request'):
+                server.request = request
+            page.append(server)
+        return page, end < len(servers)
+
+
+def _region(request):
+    return getattr(request.user, 'services_region', None)
+
+
+def get_cache(request):
+    region = _region(request)
+    server_cache = _cache.get(region)
+    if server_cache is None:
+        with _cache_lock:
+            server_cache = _cache.setdefault(region, ServerCache())
+    return server_cache
+
+
+def list_servers(request, search_opts, force=False):
+    """Lists servers of all projects from the cache of the region.
+
+    Takes the same search options as ``api.nova.server_list``, which must be
+    ones supports() accepts; ``force`` lists every server from Nova again.
+    """
+    server_cache = get_cache(request)
+    server_cache.sync(request, force=force)
+    return server_cache.query(request, search_opts)
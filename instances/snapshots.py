@@ -0,0 +1,217 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Process list snapshots of instances.
+
+A snapshot is the decoded process list of one ``instance.process.list``
+sample. A new sample only arrives once per polling interval, so decoded
+snapshots and their indexes are kept in a per-worker LRU cache keyed on
+the instance and the sample timestamp, bounded by
+``MONITOR_PROCESS_LIST_CACHE_SIZE`` bytes.
+"""
+
+from horizon.utils import memoized
+
+from oslo_log import log
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.instances import sample_store
+from openstack_dashboard.dashboards.monitor.instances import sample_times
+
+LOG = log.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# The attribute of a request holding its snapshots.
+_REQUEST_ATTR = '_monitor_snapshots'
+
+# The request parameter pinning the snapshot to the timestamp of a sample.
+SNAPSHOT_PARAM = 'process_snapshot'
+
+_cache = cache.from_setting(cache.LRUCache, 'MONITOR_PROCESS_LIST_CACHE_SIZE',
+                            DEFAULT_CACHE_SIZE)
+
+
+def cache_stats():
+    """Returns the hit, miss and eviction counters of the snapshot cache."""
+    return _cache.get().stats()
+
+
+def get_index(instance_id, sample):
+    """Returns the ProcessIndex of the decoded process list of a sample.
+
+    Raises process_list.ProcessListDecodeError if the payload is invalid;
+    invalid payloads are not cached.
+    """
+    snapshot_cache = _cache.get()
+    index = snapshot_cache.get((instance_id, sample.timestamp))
+    if index is None:
+        if isinstance(sample, sample_store.StoredSample):
+            processes = sample.load_processes()
+        else:
+            processes = process_list.decode(sample.counter_volume)
+        index = remember(instance_id, sample.timestamp, processes)
+    LOG.debug('process list cache: %s', snapshot_cache.stats())
+    return index
+
+
+def remember(instance_id, timestamp, processes):
+    """Caches the processes of a snapshot decoded elsewhere.
+
+    Returns the ProcessIndex of the processes.
+    """
+    index = process_list.ProcessIndex(processes)
+    _cache.get().set((instance_id, timestamp), index,
+                    size=process_list.estimate_size(processes))
+    return index
+
+
+def get_processes(instance_id, sample):
+    """Returns the decoded process list of a sample of an instance."""
+    return get_index(instance_id, sample).processes
+
+
+def get_processes_at(request, instance_id, timestamp):
+    """Returns the processes of the snapshot of an instance at a timestamp.
+
+    The snapshot is read from the cache, or else fetched and cached; None
+    is returned if there is no such sample.
+    """
+    index = _cache.get().get((instance_id, timestamp))
+    if index is not None:
+        return index.processes
+    sample = meters.get_sample_at(request, instance_id, timestamp)
+    if sample is None:
+        return None
+    return get_processes(instance_id, sample)
+
+
+class Snapshot(object):
+    """A process list snapshot of an instance.
+
+    The snapshot is the sample at ``timestamp``, or the latest sample if no
+    timestamp is given. The sample, the meter descriptor and the decoded
+    processes are each retrieved on first use, so the sample metadata can
+    be shown without decoding the process list.
+    """
+
+    def __init__(self, request, instance_id, timestamp=None):
+        self.request = request
+        self.instance_id = instance_id
+        self.timestamp = timestamp
+
+    @memoized.memoized_method
+    def get_sample(self):
+        """Returns the process list sample, or None.
+
+        The sample is read from the local sample store when it is enabled
+        and holds a snapshot of the instance.
+        """
+        if self.timestamp is not None:
+            store = sample_store.get_store()
+            sample = None
+            if store is not None:
+                sample = store.sample(self.instance_id, self.timestamp)
+            return sample or meters.get_sample_at(
+                self.request, self.instance_id, self.timestamp)
+        store = sample_store.get_synced_store(self.request,
+                                              self.instance_id)
+        if store is not None:
+            sample = store.latest(self.instance_id)
+            if sample is not None:
+                return sample
+        return meters.get_latest_sample(self.request, self.instance_id)
+
+    @memoized.memoized_method
+    def get_meter(self):
+        return meters.get_meter(self.request, meters.PROCESS_LIST_METER)
+
+    @memoized.memoized_method
+    def get_index(self):
+        """Returns the ProcessIndex of the sample, or None without one."""
+        sample = self.get_sample()
+        if sample is None:
+            return None
+        return get_index(self.instance_id, sample)
+
+    def query(self, params, marker=None, limit=None):
+        """Returns a page of processes and whether more pages follow.
+
+        The processes are sorted and filtered by the request parameters
+        read by process_list.parse_filters(); ``marker`` is the row id of
+        the last process of the previous page. A marker that is not in the
+        snapshot, one from another sample, gets an empty last page rather
+        than the first one, so the rows already shown are not repeated.
+        """
+        index = self.get_index()
+        if index is None:
+            return [], False
+        if marker is not None:
+            marker = index.position(marker)
+            if marker is None:
+                return [], False
+        filters = process_list.parse_filters(params)
+        processes, more = index.query(marker=marker, limit=limit,
+                                      **process_list.query_args(filters))
+        LOG.debug('process_list: %d of %d processes', len(processes),
+                  len(index))
+        return processes, more
+
+    def get_info(self, instance_name=None):
+        """Returns the sample metadata shown by SampleInfoTable."""
+        sample = self.get_sample()
+        meter = self.get_meter()
+        if instance_name is None:
+            metadata = getattr(sample, 'resource_metadata', None) or {}
+            instance_name = metadata.get('display_name', self.instance_id)
+        return {"instance": instance_name,
+                "meter": meters.PROCESS_LIST_METER,
+                "description": getattr(meter, 'description', ''),
+                "timestamp": getattr(sample, 'timestamp', None)}
+
+
+def get_snapshot(request, instance_id, timestamp=None):
+    """Returns the Snapshot of an instance, shared within a request.
+
+    The snapshots of a request are held by the request itself, so they are
+    released with it rather than kept by a module-level memo.
+    """
+    snapshots = getattr(request, _REQUEST_ATTR, None)
+    if snapshots is None:
+        snapshots = {}
+        setattr(request, _REQUEST_ATTR, snapshots)
+    key = (instance_id, timestamp)
+    snapshot = snapshots.get(key)
+    if snapshot is None:
+        snapshot = snapshots[key] = Snapshot(request, instance_id, timestamp)
+    return snapshot
+
+
+def get_requested_snapshot(request, instance_id):
+    """Returns the Snapshot selected by the request parameters.
+
+    The ``process_snapshot`` parameter selects the sample with that
+    timestamp, so the pages of a process list are all read from the sample
+    of the first one. Otherwise the sample nearest to the ``process_time``
+    parameter is selected; without it, or if the instance has no sample in
+    the history window, the latest one.
+    """
+    timestamp = request.GET.get(SNAPSHOT_PARAM)
+    if timestamp:
+        return get_snapshot(request, instance_id, timestamp)
+    when = sample_times.parse_time(request.GET.get('process_time'))
+    timestamp = None
+    if when is not None:
+        timestamp = sample_times.nearest(request, instance_id, when)
+    return get_snapshot(request, instance_id, timestamp)
@@ -13,7 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from django.core.urlresolvers import reverse
+from django import http
 from django.template.defaultfilters import title  # noqa
+from django.utils.translation import pgettext_lazy
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ungettext_lazy
 
@@ -21,6 +24,11 @@ from horizon import tables
 from horizon.utils import filters
 
 from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import tenants
+from openstack_dashboard.dashboards.monitor.instances import batch
+from openstack_dashboard.dashboards.monitor.instances \
+    import process_list
+from openstack_dashboard.dashboards.monitor.instances import server_cache
 from openstack_dashboard.dashboards.project.instances \
     import tables as project_tables
 from openstack_dashboard import policy
@@ -38,7 +46,8 @@ class AdminLogLink(project_tables.LogLink):
     url = "horizon:monitor:instances:detail"
 
 
-class MigrateInstance(policy.PolicyTargetMixin, tables.BatchAction):
+class MigrateInstance(batch.ConcurrentBatchMixin, policy.PolicyTargetMixin,
+                      tables.BatchAction):
     name = "migrate"
     classes = ("btn-migrate",)
     policy_rules = (("compute", "compute_extension:admin_actions:migrate"),)
@@ -70,6 +79,21 @@ class MigrateInstance(policy.PolicyTargetMixin, tables.BatchAction):
         api.nova.server_migrate(request, obj_id)
 
 
+class AdminSoftRebootInstance(batch.ConcurrentBatchMixin,
+                              project_tables.SoftRebootInstance):
+    pass
+
+
+class AdminRebootInstance(batch.ConcurrentBatchMixin,
+                          project_tables.RebootInstance):
+    pass
+
+
+class AdminDeleteInstance(batch.ConcurrentBatchMixin,
+                          project_tables.DeleteInstance):
+    pass
+
+
 class LiveMigrateInstance(policy.PolicyTargetMixin,
                           tables.LinkAction):
     name = "live_migrate"
@@ -88,12 +112,17 @@ class LiveMigrateInstance(policy.PolicyTargetMixin,
 class AdminUpdateRow(project_tables.UpdateRow):
     def get_data(self, request, instance_id):
         instance = super(AdminUpdateRow, self).get_data(request, instance_id)
-        tenant = api.keystone.tenant_get(request,
-                                         instance.tenant_id,
-                                         admin=True)
-        instance.tenant_name = getattr(tenant, "name", None)
+        instance.tenant_name = tenants.get_name(request, instance.tenant_id)
         return instance
 
+    def load_cells(self, datum=None):
+        super(AdminUpdateRow, self).load_cells(datum)
+        # The rows of transitioning instances are polled together by the
+        # script of the index page rather than one request per row.
+        if "ajax-update" in self.classes:
+            self.classes.remove("ajax-update")
+            self.classes.append("batch-update")
+
 
 class AdminInstanceFilterAction(tables.FilterAction):
     # Change default name of 'filter' to distinguish this one from the
@@ -111,6 +140,16 @@ class AdminInstanceFilterAction(tables.FilterAction):
                       ('flavor', _("Flavor ID ="), True))
 
 
+class RefreshInstances(tables.LinkAction):
+    name = "refresh"
+    verbose_name = _("Refresh")
+    url = "horizon:monitor:instances:index"
+    icon = "refresh"
+
+    def get_link_url(self, datum=None):
+        return "%s?%s=1" % (reverse(self.url), server_cache.REFRESH_PARAM)
+
+
 class AdminInstancesTable(tables.DataTable):
     TASK_STATUS_CHOICES = (
         (None, True),
@@ -173,7 +212,8 @@ class AdminInstancesTable(tables.DataTable):
         name = "instances"
         verbose_name = _("Instances")
         status_columns = ["status", "task"]
-        table_actions = (project_tables.DeleteInstance,
+        table_actions = (RefreshInstances,
+                         AdminDeleteInstance,
                          AdminInstanceFilterAction)
         row_class = AdminUpdateRow
         row_actions = (project_tables.ConfirmResize,
@@ -187,24 +227,33 @@ class AdminInstancesTable(tables.DataTable):
                        project_tables.ToggleShelve,
                        MigrateInstance,
                        LiveMigrateInstance,
-                       project_tables.SoftRebootInstance,
-                       project_tables.RebootInstance,
-                       project_tables.DeleteInstance)
-
-class ModifyUsageReportParameters(tables.LinkAction):
-    name = "create"
-    verbose_name = _("Modify Usage Report Parameters")
-    url = "horizon:monitor:instances:create"
-    classes = ("ajax-modal",)
-    icon = "edit"
+                       AdminSoftRebootInstance,
+                       AdminRebootInstance,
+                       AdminDeleteInstance)
 
-
-class CreateCSVUsageReport(tables.LinkAction):
+class ExportProcessList(tables.LinkAction):
     name = "csv"
-    verbose_name = _("Download CSV Summary")
-    url = "horizon:monitor:instances:csvreport"
+    verbose_name = _("Download CSV")
+    url = "horizon:monitor:instances:process_export"
     classes = ("btn-create",)
     icon = "download"
+    export_format = "csv"
+
+    def get_link_url(self, datum=None):
+        url = reverse(self.url, args=[self.table.kwargs['instance_id']])
+        params = http.QueryDict('', mutable=True)
+        for key in ('process_sort', 'process_name', 'process_uid',
+                    'process_time'):
+            if self.table.request.GET.get(key):
+                params[key] = self.table.request.GET[key]
+        params['format'] = self.export_format
+        return "%s?%s" % (url, params.urlencode())
+
+
+class ExportProcessListJSON(ExportProcessList):
+    name = "json"
+    verbose_name = _("Download JSON")
+    export_format = "json"
 
 # @Author  : Zhang Chen
 # @Email    : zhangchen.shaanxi@gmail.com
@@ -218,13 +267,21 @@ class ProcessListTable(tables.DataTable):
     start_time = tables.Column('start_time', verbose_name=_('Start Time'))
 
     def get_object_id(self, obj):
-        return "%s-%s-%s-%s-%s-%s-%s" % (obj['offset'],obj['name'],obj['pid'],obj['uid'], obj['gid'], obj['dtb'], obj['start_time'])
+        return process_list.row_id(obj)
+
+    def get_pagination_string(self):
+        # Keep the sort order and filters of the current page.
+        params = self.request.GET.copy()
+        params[self._meta.pagination_param] = self.get_object_id(
+            self.data[-1])
+        return "?%s" % params.urlencode()
 
     class Meta(object):
         name = 'process_list_table'
         verbose_name = _("Daily Usage Report")
-        table_actions = (ModifyUsageReportParameters, CreateCSVUsageReport)
+        table_actions = (ExportProcessList, ExportProcessListJSON)
         multi_select = False
+        pagination_param = 'process_marker'
 
 class SampleInfoTable(tables.DataTable):
     service = tables.Column('instance', verbose_name=_('Instance'))
@@ -240,3 +297,27 @@ class SampleInfoTable(tables.DataTable):
         verbose_name = _("Sample Info")
         multi_select = False
 
+
+class ProcessEventTable(tables.DataTable):
+    ACTION_DISPLAY_CHOICES = (
+        ("started", pgettext_lazy("Process event", u"Started")),
+        ("exited", pgettext_lazy("Process event", u"Exited")),
+    )
+    timestamp = tables.Column('timestamp', verbose_name=_('Sample Time'))
+    action = tables.Column('action', verbose_name=_('Event'),
+                           display_choices=ACTION_DISPLAY_CHOICES)
+    name = tables.Column('name', verbose_name=_('Name'))
+    pid = tables.Column('pid', verbose_name=_('Pid'))
+    uid = tables.Column('uid', verbose_name=_('Uid'))
+    start_time = tables.Column('start_time', verbose_name=_('Start Time'))
+
+    def get_object_id(self, obj):
+        # Kernel threads share pid 0 and a start time; the offset tells
+        # their events apart, as it does their processes.
+        return "%s-%s-%s-%s-%s" % (obj.timestamp, obj.action, obj.pid,
+                                   obj.start_time, obj.offset)
+
+    class Meta(object):
+        name = 'process_events'
+        verbose_name = _("Process Events")
+        multi_select = False
@@ -26,12 +26,12 @@ from openstack_dashboard.dashboards.project.instances \
 from openstack_dashboard import api
 from openstack_dashboard.dashboards.project.instances import console
 
-from openstack_dashboard.api import ceilometer
+from openstack_dashboard.dashboards.monitor.instances \
+    import process_list
+from openstack_dashboard.dashboards.monitor.instances import snapshots
 from openstack_dashboard.dashboards.monitor.instances \
     import tables as metering_tables
-
-from openstack_dashboard.utils import metering
-import json
+from openstack_dashboard.dashboards.monitor.instances import timeline
 
 from oslo_log import log
 LOG = log.getLogger(__name__)
@@ -116,6 +116,16 @@ class AuditTab(tabs.TableTab):
 
         return sorted(actions, reverse=True, key=lambda y: y.start_time)
 
+PROCESS_SORT_CHOICES = (('pid', _("Pid")),
+                        ('-pid', _("Pid (descending)")),
+                        ('name', _("Name")),
+                        ('-name', _("Name (descending)")),
+                        ('uid', _("Uid")),
+                        ('-uid', _("Uid (descending)")),
+                        ('start_time', _("Start Time")),
+                        ('-start_time', _("Start Time (descending)")))
+
+
 # @Author  : Zhang Chen
 # @Email    : zhangchen.shaanxi@gmail.com
 class ProcessListTab(tabs.TableTab):
@@ -123,86 +133,101 @@ class ProcessListTab(tabs.TableTab):
     slug = "usage_report"
     template_name = "monitor/instances/_detail_table.html"
     table_classes = (metering_tables.ProcessListTable, metering_tables.SampleInfoTable,)
+    preload = False
+
+    def get_snapshot(self):
+        return snapshots.get_requested_snapshot(
+            self.request, self.tab_group.kwargs['instance_id'])
+
+    def get_process_filters(self):
+        return process_list.parse_filters(self.request.GET)
 
     def get_process_list_table_data(self):
-        meters = ceilometer.Meters(self.request)
+        self._more = False
         instance = self.tab_group.kwargs['instance']
-        services = {
-            _('Nova'): meters.list_nova(),
-            _('Neutron'): meters.list_neutron(),
-            _('Glance'): meters.list_glance(),
-            _('Cinder'): meters.list_cinder(),
-            _('Swift_meters'): meters.list_swift(),
-            _('Kwapi'): meters.list_kwapi(),
-            _('IPMI'): meters.list_ipmi(),
-        }
-        report_rows = []
-
-        date_options = self.request.session.get('period', 1)
-        date_from = self.request.session.get('date_from', '')
-        date_to = self.request.session.get('date_to', '')
+        pagination_param = \
+            metering_tables.ProcessListTable._meta.pagination_param
+        try:
+            processes, self._more = self.get_snapshot().query(
+                self.request.GET,
+                marker=self.request.GET.get(pagination_param),
+                limit=utils.get_page_size(self.request))
+        except process_list.ProcessListDecodeError:
+            processes = []
+            exceptions.handle(self.request,
+                              _('Unable to decode the process list of '
+                                'instance "%s".') % instance.id)
+        except Exception:
+            processes = []
+            exceptions.handle(self.request,
+                              _('Unable to retrieve the process list of '
+                                'instance "%s".') % instance.id)
+        return processes
+
+    def has_more_data(self, table):
+        if table.name == metering_tables.ProcessListTable._meta.name:
+            return getattr(self, '_more', False)
+        return False
+
+    def get_context_data(self, request, **kwargs):
+        context = super(ProcessListTab, self).get_context_data(request,
+                                                               **kwargs)
+        context['process_filters'] = self.get_process_filters()
+        context['process_sort_choices'] = PROCESS_SORT_CHOICES
+        context['tab_id'] = self.get_id()
+        context['instance_id'] = self.tab_group.kwargs['instance_id']
+        context['process_time'] = request.GET.get('process_time', '')
+        # Shown to operators sizing MONITOR_PROCESS_LIST_CACHE_SIZE.
+        context['snapshot_cache_stats'] = snapshots.cache_stats()
+        # The parameters the rows of the following pages are requested
+        # with, once the first page is shown. They are read from the sample
+        # of the first page, even if a newer one is stored meanwhile.
+        params = request.GET.copy()
+        for key in ('tab', metering_tables.ProcessListTable._meta
+                    .pagination_param):
+            params.pop(key, None)
+        try:
+            sample = self.get_snapshot().get_sample()
+        except Exception:
+            # Already reported by the tables.
+            sample = None
+        if sample is not None:
+            params[snapshots.SNAPSHOT_PARAM] = sample.timestamp
+        context['process_query'] = params.urlencode()
+        return context
 
+    def get_sample_info_table_data(self):
+        # Only the sample metadata is needed here; the process list is not
+        # decoded unless the process table is rendered too.
+        instance = self.tab_group.kwargs['instance']
         try:
-            date_from, date_to = metering.calc_date_args(date_from,
-                                                         date_to,
-                                                         date_options)
+            return [self.get_snapshot().get_info(instance.name)]
         except Exception:
-            exceptions.handle(self.request, _('Dates cannot be recognized.'))
+            exceptions.handle(self.request,
+                              _('Unable to retrieve meter information.'))
+            return []
+
+
+class ProcessTimelineTab(tabs.TableTab):
+    name = _("Process Timeline")
+    slug = "process_timeline"
+    table_classes = (metering_tables.ProcessEventTable,)
+    template_name = "horizon/common/_detail_table.html"
+    preload = False
+
+    def get_process_events_data(self):
+        instance_id = self.tab_group.kwargs['instance_id']
         try:
-            project_aggregates = metering.ProjectAggregatesQuery(self.request,
-                                                                 date_from,
-                                                                 date_to,
-                                                                 3600 * 24)
+            return timeline.refresh(self.request, instance_id).get_events()
         except Exception:
             exceptions.handle(self.request,
-                              _('Unable to retrieve project list.'))
-
-        meter_name = 'instance.process.list'
-        meter = meters._get_meter(meter_name)
-        self._meter = meter
-        LOG.debug('meter: %s' % meter.__dict__)
-        res, unit = project_aggregates.query(meter.name)
-        LOG.debug('unit: %s' % unit)
-        query = [
-                 {"field": "resource_id",
-                  "op": "eq",
-                  "value": instance.id},
-                 ]
-        sample_list = api.ceilometer.sample_list(self.request, meter.name, query, limit=1)
-        sample = sample_list[0]
-        self._timestamp = sample.timestamp
-        LOG.debug("sample: %s" % sample)
-        counter_volume = sample.counter_volume
-        LOG.debug("counter_volume: %s" % counter_volume)
-        LOG.debug("counter_volume first char: %s" % counter_volume[0])
-        LOG.debug("counter_volume last char: %s" % counter_volume[-1])
-        process_lists = eval(counter_volume)
-        LOG.debug("process_lists: %s" % len(process_lists))
-        for process_list in process_lists:
-            plist = dict(process_list)
-            LOG.debug("plist: %s" % plist)
-            row = {"offset": plist['offset'],
-                   "name": plist['process_name'],
-                   "pid": plist['pid'],
-                   "uid": plist['uid'],
-                   "gid": plist['gid'],
-                   "dtb": plist['dtb'],
-                   "start_time": plist['start_time'],
-                   }
-            report_rows.append(row)
-        return report_rows
+                              _('Unable to retrieve the process timeline of '
+                                'instance "%s".') % instance_id)
+            return []
 
-    def get_sample_info_table_data(self):
-        report_rows = []
-        row = {"instance": self.tab_group.kwargs['instance'].name,
-               "meter": "instance.process.list",
-               "description": self._meter.description,
-               "timestamp": self._timestamp,
-               }
-        report_rows.append(row)
-        return report_rows
 
 class InstanceDetailTabs(tabs.TabGroup):
     slug = "instance_details"
-    tabs = (OverviewTab, LogTab, ConsoleTab, AuditTab, ProcessListTab)
+    tabs = (OverviewTab, LogTab, ConsoleTab, AuditTab, ProcessListTab,
+            ProcessTimelineTab)
     sticky = True
@@ -13,22 +13,88 @@
 #    under the License.
 
 from collections import OrderedDict
+import copy
+import datetime
+import gc
+import json
+import threading
+import time
 import uuid
+import weakref
 
 from django.core.urlresolvers import reverse
 from django import http
 
+from horizon import exceptions
+from horizon import messages
+from horizon import tables
+
+from mox3.mox import Func  # noqa
 from mox3.mox import IgnoreArg  # noqa
 from mox3.mox import IsA  # noqa
 
 from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_ceilometer
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_nova
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor import concurrency
+from openstack_dashboard.dashboards.monitor import tenants
+from openstack_dashboard.dashboards.monitor.instances import batch
+from openstack_dashboard.dashboards.monitor.instances import flavors
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import pages
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.instances import sample_store
+from openstack_dashboard.dashboards.monitor.instances import sample_times
+from openstack_dashboard.dashboards.monitor.instances import search_index
+from openstack_dashboard.dashboards.monitor.instances import server_cache
+from openstack_dashboard.dashboards.monitor.instances import snapshots
+from openstack_dashboard.dashboards.monitor.instances \
+    import tables as project_tables
+from openstack_dashboard.dashboards.monitor.instances import tabs
+from openstack_dashboard.dashboards.monitor.instances import timeline
 from openstack_dashboard.test import helpers as test
 
 
 INDEX_URL = reverse('horizon:admin:instances:index')
 
 
+def separate_request(request):
+    """Returns a new request of the same user and session."""
+    separate = http.HttpRequest()
+    separate.session = request.session
+    separate.user = request.user
+    separate.horizon = request.horizon
+    return separate
+
+
+class FakeSample(object):
+    def __init__(self, timestamp, counter_volume, resource_id=None):
+        self.timestamp = timestamp
+        self.counter_volume = counter_volume
+        self.resource_id = resource_id
+
+
+class FakeMeter(object):
+    def __init__(self, name):
+        self.name = name
+        self.label = ''
+        self.description = ''
+
+    def augment(self, label=None, description=None):
+        self.label = label
+        self.description = description
+
+
 class InstanceViewTest(test.BaseAdminViewTests):
+    def setUp(self):
+        super(InstanceViewTest, self).setUp()
+        flavors._cache.reset()
+        flavors._lookups.reset()
+        tenants._cache.reset()
+        tenants._lookups.reset()
+        pages._cache.reset()
+
     @test.create_stubs({api.nova: ('flavor_list', 'server_list',
                                    'extension_supported',),
                         api.keystone: ('tenant_list',),
@@ -81,9 +147,10 @@ class InstanceViewTest(test.BaseAdminViewTests):
             AndRaise(self.exceptions.nova)
         api.keystone.tenant_list(IsA(http.HttpRequest)).\
             AndReturn([tenants, False])
-        for server in servers:
-            api.nova.flavor_get(IsA(http.HttpRequest), server.flavor["id"]). \
-                AndReturn(full_flavors[server.flavor["id"]])
+        # Each distinct flavor is looked up once, concurrently.
+        for flavor_id in set(server.flavor["id"] for server in servers):
+            api.nova.flavor_get(IsA(http.HttpRequest), flavor_id). \
+                InAnyOrder().AndReturn(full_flavors[flavor_id])
 
         self.mox.ReplayAll()
 
@@ -121,7 +188,7 @@ class InstanceViewTest(test.BaseAdminViewTests):
             AndReturn([tenants, False])
         for server in servers:
             api.nova.flavor_get(IsA(http.HttpRequest), server.flavor["id"]). \
-                AndRaise(self.exceptions.nova)
+                InAnyOrder().AndRaise(self.exceptions.nova)
         self.mox.ReplayAll()
 
         res = self.client.get(INDEX_URL)
@@ -133,7 +200,7 @@ class InstanceViewTest(test.BaseAdminViewTests):
         self.assertMessageCount(res, error=1)
         self.assertItemsEqual(instances, servers)
 
-    @test.create_stubs({api.nova: ('server_list',),
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',),
                         api.keystone: ('tenant_list',)})
     def test_index_server_list_exception(self):
         tenants = self.tenants.list()
@@ -143,6 +210,9 @@ class InstanceViewTest(test.BaseAdminViewTests):
             .AndRaise(self.exceptions.nova)
         api.keystone.tenant_list(IsA(http.HttpRequest)).\
             AndReturn([tenants, False])
+        # Flavors are retrieved alongside the instances.
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
 
         self.mox.ReplayAll()
 
@@ -150,6 +220,302 @@ class InstanceViewTest(test.BaseAdminViewTests):
         self.assertTemplateUsed(res, 'admin/instances/index.html')
         self.assertEqual(len(res.context['instances_table'].data), 0)
 
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',
+                                   'extension_supported',),
+                        api.keystone: ('tenant_list',),
+                        api.network: ('servers_update_addresses',)})
+    def test_index_flavor_catalog_shared(self):
+        servers = self.servers.list()
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        search_opts = {'marker': None, 'paginate': True}
+        api.keystone.tenant_list(IsA(http.HttpRequest)) \
+            .AndReturn([self.tenants.list(), False])
+        for _i in range(3):
+            api.nova.server_list(IsA(http.HttpRequest),
+                                 all_tenants=True, search_opts=search_opts) \
+                .AndReturn([servers, False])
+            api.network.servers_update_addresses(IsA(http.HttpRequest),
+                                                 servers, all_tenants=True)
+        # Loaded once, and again when the list is refreshed.
+        for _i in range(2):
+            api.nova.flavor_list(IsA(http.HttpRequest)) \
+                .AndReturn(self.flavors.list())
+        self.mox.ReplayAll()
+
+        for i in range(3):
+            params = {server_cache.REFRESH_PARAM: 1} if i == 2 else {}
+            res = self.client.get(INDEX_URL, params)
+            for instance in res.context['table'].data:
+                self.assertEqual(instance.flavor['id'],
+                                 instance.full_flavor.id)
+
+    @test.create_stubs({api.nova: ('flavor_list', 'flavor_get')})
+    def test_get_flavor_from_catalog(self):
+        flavor = self.flavors.first()
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        api.nova.flavor_get(IsA(http.HttpRequest), 'private') \
+            .AndReturn(flavor)
+        self.mox.ReplayAll()
+
+        self.assertEqual(flavor,
+                         flavors.get_flavor(self.request, flavor.id))
+        for _i in range(2):
+            self.assertEqual(flavor,
+                             flavors.get_flavor(self.request, 'private'))
+
+    @test.create_stubs({api.nova: ('flavor_list', 'flavor_get',
+                                   'server_list', 'extension_supported',),
+                        api.keystone: ('tenant_list',),
+                        api.network: ('servers_update_addresses',)})
+    def test_index_deleted_flavor_looked_up_once(self):
+        servers = []
+        for i in range(100):
+            server = copy.deepcopy(self.servers.first())
+            server.id = 'server-%d' % i
+            server.flavor['id'] = 'deleted'
+            servers.append(server)
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        search_opts = {'marker': None, 'paginate': True}
+        api.keystone.tenant_list(IsA(http.HttpRequest)) \
+            .AndReturn([self.tenants.list(), False])
+        for _i in range(2):
+            api.nova.server_list(IsA(http.HttpRequest),
+                                 all_tenants=True, search_opts=search_opts) \
+                .AndReturn([servers, False])
+            api.network.servers_update_addresses(IsA(http.HttpRequest),
+                                                 servers, all_tenants=True)
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        # Not found is remembered: the second page load does not ask again.
+        api.nova.flavor_get(IsA(http.HttpRequest), 'deleted') \
+            .AndRaise(exceptions.NotFound())
+        self.mox.ReplayAll()
+
+        for _i in range(2):
+            res = self.client.get(INDEX_URL)
+            self.assertEqual(100, len(res.context['table'].data))
+
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',
+                                   'server_get', 'flavor_get',
+                                   'extension_supported',),
+                        api.keystone: ('tenant_list', 'tenant_get'),
+                        api.network: ('servers_update_addresses',)})
+    def test_index_tenant_names_shared(self):
+        servers = self.servers.list()
+        server = servers[0]
+        unknown = copy.deepcopy(server)
+        unknown.id = 'unknown-server'
+        unknown.tenant_id = 'unknown-tenant'
+        servers.append(unknown)
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.keystone.tenant_list(IsA(http.HttpRequest)) \
+            .AndReturn([self.tenants.list(), False])
+        search_opts = {'marker': None, 'paginate': True}
+        for _i in range(2):
+            api.nova.server_list(IsA(http.HttpRequest),
+                                 all_tenants=True, search_opts=search_opts) \
+                .AndReturn([servers, False])
+            api.network.servers_update_addresses(IsA(http.HttpRequest),
+                                                 servers, all_tenants=True)
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        # The project missing from the list is looked up once.
+        api.keystone.tenant_get(IsA(http.HttpRequest), 'unknown-tenant',
+                                admin=True) \
+            .AndRaise(exceptions.NotFound())
+        # Row updates resolve the project from the same index.
+        api.nova.server_get(IsA(http.HttpRequest), server.id) \
+            .AndReturn(server)
+        api.nova.flavor_get(IsA(http.HttpRequest), server.flavor['id']) \
+            .AndReturn(self.flavors.first())
+        self.mox.ReplayAll()
+
+        for _i in range(2):
+            res = self.client.get(INDEX_URL)
+            names = dict((instance.id, instance.tenant_name)
+                         for instance in res.context['table'].data)
+            self.assertEqual(self.tenants.get(id=server.tenant_id).name,
+                             names[server.id])
+            self.assertIsNone(names[unknown.id])
+        url = (INDEX_URL +
+               "?action=row_update&table=instances&obj_id=" + server.id)
+        res = self.client.get(url, {}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertContains(res, self.tenants.get(id=server.tenant_id).name,
+                            1, 200)
+
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',
+                                   'extension_supported',),
+                        api.keystone: ('tenant_get',),
+                        api.network: ('servers_update_addresses',)})
+    def test_row_status(self):
+        servers = self.servers.list()
+        changed = servers[0]
+        deleted = copy.deepcopy(servers[1])
+        deleted.status = 'DELETED'
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        # One call for every polled row; instances that were not polled or
+        # did not change are left out.
+        api.nova.server_list(
+            IsA(http.HttpRequest),
+            search_opts={'changes-since': '2026-10-18T12:00:00'},
+            all_tenants=True) \
+            .AndReturn([[changed, deleted, servers[2]], False])
+        api.network.servers_update_addresses(IsA(http.HttpRequest),
+                                             [changed], all_tenants=True)
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        api.keystone.tenant_get(IsA(http.HttpRequest), changed.tenant_id,
+                                admin=True) \
+            .AndReturn(self.tenants.get(id=changed.tenant_id))
+        self.mox.ReplayAll()
+
+        res = self.client.get(reverse('horizon:monitor:instances:row_status'),
+                              {'id': [changed.id, deleted.id, 'unchanged'],
+                               'since': '2026-10-18T12:00:00'})
+        data = json.loads(res.content.decode('utf-8'))
+        self.assertEqual([changed.id], list(data['rows']))
+        self.assertIn(self.tenants.get(id=changed.tenant_id).name,
+                      data['rows'][changed.id])
+        self.assertEqual([deleted.id], data['deleted'])
+        self.assertIn('since', data)
+
+    def test_row_status_requires_since(self):
+        res = self.client.get(reverse('horizon:monitor:instances:row_status'),
+                              {'id': [self.servers.first().id]})
+        self.assertEqual(400, res.status_code)
+
+    def test_batch_progress(self):
+        url = reverse('horizon:monitor:instances:batch_progress')
+        batch.Progress(self.request, '1234', 3).finished()
+        res = self.client.get(url, {'batch_id': '1234'})
+        self.assertEqual({'total': 3, 'done': 1, 'failed': 0},
+                         json.loads(res.content.decode('utf-8')))
+        res = self.client.get(url, {'batch_id': '5678'})
+        self.assertEqual(404, res.status_code)
+
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',
+                                   'extension_supported',),
+                        api.keystone: ('tenant_list',),
+                        api.network: ('servers_update_addresses',)})
+    def test_index_next_page_prefetched(self):
+        servers = self.servers.list()
+        first, second = servers[:2], servers[2:]
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.keystone.tenant_list(IsA(http.HttpRequest)) \
+            .AndReturn([self.tenants.list(), False])
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        api.nova.server_list(IsA(http.HttpRequest), all_tenants=True,
+                             search_opts={'marker': None, 'paginate': True}) \
+            .AndReturn([first, True])
+        api.network.servers_update_addresses(IsA(http.HttpRequest), first,
+                                             all_tenants=True)
+        # Loaded in the background after the first page, with a copy of
+        # the credentials of the request, and not again when requested.
+        api.nova.server_list(IsA(concurrency.DetachedRequest),
+                             all_tenants=True,
+                             search_opts={'marker': first[-1].id,
+                                          'paginate': True}) \
+            .AndReturn([second, False])
+        api.network.servers_update_addresses(
+            IsA(concurrency.DetachedRequest), second, all_tenants=True)
+        self.mox.ReplayAll()
+
+        res = self.client.get(INDEX_URL)
+        self.assertItemsEqual(res.context['table'].data, first)
+        res = self.client.get(INDEX_URL, {'marker': first[-1].id})
+        self.assertItemsEqual(res.context['table'].data, second)
+        for instance in res.context['table'].data:
+            self.assertEqual(instance.flavor['id'], instance.full_flavor.id)
+
+    @test.create_stubs({api.nova: ('extension_supported',)})
+    def test_index_backend_calls_are_concurrent(self):
+        servers = self.servers.list()
+        lock = threading.Lock()
+        arrived = []
+        all_arrived = threading.Event()
+
+        def concurrent(value):
+            # Each call waits for the other two to have started: run one
+            # after the other, the first would time out waiting.
+            def call(*args, **kwargs):
+                with lock:
+                    arrived.append(value)
+                    if len(arrived) == 3:
+                        all_arrived.set()
+                all_arrived.wait(5)
+                return value
+            return call
+
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        self.mox.ReplayAll()
+        self.mox.stubs.Set(api.keystone, 'tenant_list',
+                           concurrent([self.tenants.list(), False]))
+        self.mox.stubs.Set(api.nova, 'server_list',
+                           concurrent([servers, False]))
+        self.mox.stubs.Set(api.nova, 'flavor_list',
+                           concurrent(self.flavors.list()))
+        self.mox.stubs.Set(api.network, 'servers_update_addresses',
+                           lambda *args, **kwargs: None)
+
+        res = self.client.get(INDEX_URL)
+        self.assertTrue(all_arrived.is_set())
+        self.assertItemsEqual(res.context['table'].data, servers)
+        self.assertMessageCount(res, error=0)
+
+    @test.update_settings(MONITOR_BACKEND_TIMEOUT=0.1)
+    @test.create_stubs({api.nova: ('flavor_list', 'server_list',
+                                   'extension_supported',),
+                        api.network: ('servers_update_addresses',)})
+    def test_index_tenant_list_timeout(self):
+        servers = self.servers.list()
+        api.nova.extension_supported('AdminActions', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        api.nova.extension_supported('Shelve', IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(True)
+        search_opts = {'marker': None, 'paginate': True}
+        api.nova.server_list(IsA(http.HttpRequest),
+                             all_tenants=True, search_opts=search_opts) \
+            .AndReturn([servers, False])
+        api.network.servers_update_addresses(IsA(http.HttpRequest), servers,
+                                             all_tenants=True)
+        api.nova.flavor_list(IsA(http.HttpRequest)) \
+            .AndReturn(self.flavors.list())
+        self.mox.ReplayAll()
+        released = threading.Event()
+
+        def hung_tenant_list(*args, **kwargs):
+            released.wait(5)
+            return [self.tenants.list(), False]
+        self.mox.stubs.Set(api.keystone, 'tenant_list', hung_tenant_list)
+
+        try:
+            res = self.client.get(INDEX_URL)
+        finally:
+            released.set()
+        self.assertItemsEqual(res.context['table'].data, servers)
+        self.assertMessageCount(res, error=1)
+        self.assertIsNone(res.context['table'].data[0].tenant_name)
+
     @test.create_stubs({api.nova: ('server_get', 'flavor_get',
                                    'extension_supported', ),
                         api.network: ('servers_update_addresses',),
@@ -407,3 +773,852 @@ class InstanceViewTest(test.BaseAdminViewTests):
         self.assertTemplateUsed(res, 'admin/instances/index.html')
         instances = res.context['table'].data
         self.assertItemsEqual(instances, [])
+
+
+class ProcessListDecodeTests(test.TestCase):
+    ENTRY = [('offset', '0xffff880000001000'), ('process_name', 'sshd'),
+             ('pid', 1024), ('uid', 0), ('gid', 0), ('dtb', '0x3a2b1000'),
+             ('start_time', '2016-10-18 02:39:00 UTC+0000')]
+
+    def test_decode_literal(self):
+        processes = process_list.decode(repr([self.ENTRY, self.ENTRY]))
+        self.assertEqual(2, len(processes))
+        self.assertEqual('sshd', processes[0].name)
+        self.assertEqual(1024, processes[0].pid)
+        self.assertEqual('0x3a2b1000', processes[1].dtb)
+
+    def test_decode_literal_with_quotes_and_parentheses(self):
+        entry = dict(self.ENTRY, process_name="it's (sd-pam)")
+        processes = process_list.decode(repr([sorted(entry.items())]))
+        self.assertEqual("it's (sd-pam)", processes[0].name)
+
+    def test_decode_json(self):
+        payload = json.dumps([dict(self.ENTRY, pid='1024')])
+        processes = process_list.decode(payload)
+        self.assertEqual(1024, processes[0].pid)
+        self.assertEqual('2016-10-18 02:39:00 UTC+0000',
+                         processes[0].start_time)
+
+    def test_decode_shares_repeated_values(self):
+        other = dict(self.ENTRY, pid=1025)
+        processes = process_list.decode(json.dumps([dict(self.ENTRY),
+                                                    other]))
+        self.assertIs(processes[0].name, processes[1].name)
+        self.assertEqual(
+            '1024-2016-10-18 02:39:00 UTC+0000-0xffff880000001000',
+            processes[0].id)
+        self.assertEqual(list(self.ENTRY[i][1] for i in range(7)),
+                         list(processes[0]))
+
+    def test_decode_does_not_evaluate_code(self):
+        self.assertRaises(process_list.ProcessListDecodeError,
+                          process_list.decode, "__import__('os').getpid()")
+
+    def test_decode_missing_field(self):
+        payload = repr([self.ENTRY[:-1]])
+        self.assertRaises(process_list.ProcessListDecodeError,
+                          process_list.decode, payload)
+
+    def test_decode_invalid_pid(self):
+        entry = dict(self.ENTRY, pid='init')
+        self.assertRaises(process_list.ProcessListDecodeError,
+                          process_list.decode, json.dumps([entry]))
+
+
+class ProcessIndexTests(test.TestCase):
+    def setUp(self):
+        super(ProcessIndexTests, self).setUp()
+        self.processes = [
+            process_list.Process('0x1', 'systemd', 1, 0, 0, '0xa', '09:00'),
+            process_list.Process('0x2', 'sshd', 812, 0, 0, '0xb', '09:01'),
+            process_list.Process('0x3', 'bash', 1040, 1000, 1000, '0xc',
+                                 '10:30'),
+            process_list.Process('0x4', 'sshd', 1039, 1000, 1000, '0xd',
+                                 '10:29'),
+        ]
+        self.index = process_list.ProcessIndex(self.processes)
+
+    def test_sort(self):
+        page, more = self.index.query(sort='start_time', reverse=True)
+        self.assertEqual([1040, 1039, 812, 1], [p.pid for p in page])
+        self.assertFalse(more)
+
+    def test_filter(self):
+        page, more = self.index.query(sort='pid', name='SSH', uid=1000)
+        self.assertEqual([1039], [p.pid for p in page])
+
+    def test_marker_pagination(self):
+        page, more = self.index.query(sort='name', limit=2)
+        self.assertEqual(['bash', 'sshd'], [p.name for p in page])
+        self.assertTrue(more)
+        marker = self.index.position(process_list.row_id(page[-1]))
+        page, more = self.index.query(sort='name', marker=marker, limit=2)
+        self.assertEqual([(1039, 'sshd'), (1, 'systemd')],
+                         [(p.pid, p.name) for p in page])
+        self.assertFalse(more)
+
+    def test_filtered_marker_pagination(self):
+        page, more = self.index.query(sort='pid', name='sshd', limit=1)
+        self.assertTrue(more)
+        marker = self.index.position(process_list.row_id(page[-1]))
+        page, more = self.index.query(sort='pid', name='sshd',
+                                      marker=marker, limit=1)
+        self.assertEqual([1039], [p.pid for p in page])
+        self.assertFalse(more)
+
+    def test_marker_pagination_with_duplicate_pids(self):
+        processes = [process_list.Process('0x%x' % offset, 'kthread', 0, 0,
+                                          0, '0x0', '')
+                     for offset in range(5)]
+        self.assertEqual(5, len(set(process_list.row_id(p)
+                                    for p in processes)))
+        index = process_list.ProcessIndex(processes)
+        seen = []
+        marker = None
+        while True:
+            page, more = index.query(sort='pid', marker=marker, limit=2)
+            seen.extend(p.offset for p in page)
+            if not more:
+                break
+            marker = index.position(process_list.row_id(page[-1]))
+        self.assertEqual(['0x%x' % offset for offset in range(5)], seen)
+
+
+class ProcessListCacheTests(test.TestCase):
+    def test_lru_eviction_by_size(self):
+        lru = cache.LRUCache(10)
+        lru.set('a', 'a', size=4)
+        lru.set('b', 'b', size=4)
+        self.assertEqual('a', lru.get('a'))
+        lru.set('c', 'c', size=4)
+        self.assertIn('a', lru)
+        self.assertNotIn('b', lru)
+        lru.set('d', 'd', size=11)
+        self.assertNotIn('d', lru)
+        stats = lru.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['evictions'])
+        self.assertEqual(8, stats['bytes'])
+
+    def test_ttl_cache_purges_expired_entries(self):
+        now = [0]
+        ttl_cache = cache.TTLCache(10, timer=lambda: now[0])
+        for key in range(100):
+            ttl_cache.set(key, key)
+        now[0] = 20
+        # Keys never read again are purged as new ones are set.
+        for key in range(100, 200):
+            ttl_cache.set(key, key)
+        self.assertEqual(100, len(ttl_cache))
+        self.assertIsNone(ttl_cache.get(0))
+        self.assertEqual(150, ttl_cache.get(150))
+
+    @test.update_settings(MONITOR_PROCESS_LIST_CACHE_SIZE=1024 * 1024)
+    def test_snapshot_decoded_once_per_sample(self):
+        self.mox.StubOutWithMock(process_list, 'decode')
+        process_list.decode('[]').AndReturn([])
+        self.mox.ReplayAll()
+
+        snapshots._cache.reset()
+        sample = FakeSample('2016-10-18T02:39:00', '[]')
+        self.assertEqual([], snapshots.get_processes('instance-1', sample))
+        self.assertEqual([], snapshots.get_processes('instance-1', sample))
+        stats = snapshots.cache_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+
+class ProcessListTabTests(test.BaseAdminViewTests):
+    PAYLOAD = repr([ProcessListDecodeTests.ENTRY])
+
+    def setUp(self):
+        super(ProcessListTabTests, self).setUp()
+        meters._catalog.reset()
+        snapshots._cache.reset()
+
+    def _get_tab(self, server, request):
+        tab_group = tabs.InstanceDetailTabs(request, instance=server,
+                                            instance_id=server.id)
+        return tab_group.get_tab('usage_report')
+
+    def _render_tab(self, server):
+        # Each render stands for a separate request.
+        request = separate_request(self.request)
+        return self._get_tab(server, request).get_context_data(request)
+
+    def _stub_sample_list(self, server, sample):
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": server.id}],
+            limit=1).AndReturn([sample])
+
+    @test.create_stubs({api.ceilometer: ('meter_list', 'sample_list')})
+    def test_ceilometer_calls_per_render(self):
+        server = self.servers.first()
+        sample = FakeSample('2016-10-18T02:39:00', self.PAYLOAD, server.id)
+        # The meter catalog is shared between renders; only the latest
+        # sample is queried again.
+        api.ceilometer.meter_list(IsA(http.HttpRequest)) \
+            .AndReturn([FakeMeter('cpu'),
+                        FakeMeter(meters.PROCESS_LIST_METER)])
+        for _i in range(2):
+            self._stub_sample_list(server, sample)
+        self.mox.ReplayAll()
+
+        for _i in range(2):
+            context = self._render_tab(server)
+            processes = context['process_list_table_table'].data
+            self.assertEqual(['sshd'], [p.name for p in processes])
+            info = context['sample_info_table_table'].data
+            self.assertEqual(sample.timestamp, info[0]['timestamp'])
+            self.assertEqual(
+                sample.timestamp,
+                http.QueryDict(context['process_query'])['process_snapshot'])
+        # The second render is served from the snapshot cache.
+        stats = context['snapshot_cache_stats']
+        self.assertEqual(1, stats['misses'])
+        self.assertGreater(stats['hits'], 0)
+
+    @test.create_stubs({api.ceilometer: ('meter_list', 'sample_list')})
+    def test_sample_info_does_not_decode(self):
+        server = self.servers.first()
+        sample = FakeSample('2016-10-18T02:39:00', self.PAYLOAD, server.id)
+        api.ceilometer.meter_list(IsA(http.HttpRequest)) \
+            .AndReturn([FakeMeter(meters.PROCESS_LIST_METER)])
+        self._stub_sample_list(server, sample)
+        # Any call of the decoder fails the test.
+        self.mox.StubOutWithMock(process_list, 'decode')
+        self.mox.ReplayAll()
+
+        tab = self._get_tab(server, self.request)
+        info = tab.get_sample_info_table_data()
+        self.assertEqual(server.name, info[0]['instance'])
+        self.assertEqual(sample.timestamp, info[0]['timestamp'])
+
+    @test.create_stubs({api.ceilometer: ('meter_list', 'sample_list')})
+    def test_sample_info_view(self):
+        server = self.servers.first()
+        sample = FakeSample('2016-10-18T02:39:00', self.PAYLOAD, server.id)
+        sample.resource_metadata = {'display_name': 'incident-vm'}
+        api.ceilometer.meter_list(IsA(http.HttpRequest)) \
+            .AndReturn([FakeMeter(meters.PROCESS_LIST_METER)])
+        self._stub_sample_list(server, sample)
+        self.mox.ReplayAll()
+
+        res = self.client.get(reverse('horizon:monitor:instances:sample_info',
+                                      args=[server.id]),
+                              HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateUsed(res, 'monitor/instances/_sample_info.html')
+        self.assertContains(res, 'incident-vm')
+        self.assertContains(res, sample.timestamp)
+
+    def test_snapshot_released_with_request(self):
+        request = separate_request(self.request)
+        snapshot = snapshots.get_snapshot(request, 'vm')
+        self.assertIs(snapshot, snapshots.get_snapshot(request, 'vm'))
+        self.assertIsNot(snapshot,
+                         snapshots.get_snapshot(self.request, 'vm'))
+        released = weakref.ref(snapshot)
+        del request, snapshot
+        gc.collect()
+        self.assertIsNone(released())
+
+    def test_process_tab_is_not_preloaded(self):
+        self.assertFalse(tabs.ProcessListTab.preload)
+
+    @test.update_settings(MONITOR_PROCESS_CHUNK_SIZE=2)
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_process_rows_chunk(self):
+        server = self.servers.first()
+        entries = [sorted(dict(ProcessListDecodeTests.ENTRY, pid=pid,
+                               process_name='p%d' % pid).items())
+                   for pid in (1, 2, 3, 4)]
+        sample = FakeSample('2016-10-18T02:39:00', repr(entries), server.id)
+        self._stub_sample_list(server, sample)
+        self.mox.ReplayAll()
+
+        first = process_list.decode(sample.counter_volume)[0]
+        res = self.client.get(
+            reverse('horizon:monitor:instances:process_rows',
+                    args=[server.id]),
+            {'process_marker': process_list.row_id(first)})
+        data = json.loads(res.content.decode('utf-8'))
+        self.assertTrue(data['more'])
+        self.assertIn('p2', data['rows'])
+        self.assertIn('p3', data['rows'])
+        self.assertNotIn('p4', data['rows'])
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_process_rows_read_from_first_page_sample(self):
+        server = self.servers.first()
+        entries = [sorted(dict(ProcessListDecodeTests.ENTRY, pid=pid,
+                               process_name='p%d' % pid).items())
+                   for pid in (1, 2)]
+        sample = FakeSample('2016-10-18T02:39:00', repr(entries), server.id)
+        # Not the latest sample, which may have been stored since the
+        # first page was shown.
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": server.id},
+             {"field": "timestamp", "op": "eq", "value": sample.timestamp}],
+            limit=1).AndReturn([sample])
+        self.mox.ReplayAll()
+
+        first = process_list.decode(sample.counter_volume)[0]
+        res = self.client.get(
+            reverse('horizon:monitor:instances:process_rows',
+                    args=[server.id]),
+            {'process_marker': process_list.row_id(first),
+             'process_snapshot': sample.timestamp})
+        data = json.loads(res.content.decode('utf-8'))
+        self.assertFalse(data['more'])
+        self.assertIn('p2', data['rows'])
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_process_rows_after_unknown_marker(self):
+        server = self.servers.first()
+        sample = FakeSample('2016-10-18T02:39:00', self.PAYLOAD, server.id)
+        self._stub_sample_list(server, sample)
+        self.mox.ReplayAll()
+
+        # The marker process is not in the sample: no row is sent again.
+        res = self.client.get(
+            reverse('horizon:monitor:instances:process_rows',
+                    args=[server.id]),
+            {'process_marker': 'exited'})
+        data = json.loads(res.content.decode('utf-8'))
+        self.assertEqual({'rows': '', 'more': False}, data)
+
+
+class ProcessListExportTests(test.BaseAdminViewTests):
+    def setUp(self):
+        super(ProcessListExportTests, self).setUp()
+        snapshots._cache.reset()
+
+    def _stub_sample(self, server):
+        entries = [ProcessListDecodeTests.ENTRY,
+                   sorted(dict(ProcessListDecodeTests.ENTRY, pid=1, uid=1000,
+                               process_name='bash').items())]
+        sample = FakeSample('2016-10-18T02:39:00', repr(entries), server.id)
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": server.id}],
+            limit=1).AndReturn([sample])
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_export_json(self):
+        server = self.servers.first()
+        self._stub_sample(server)
+        self.mox.ReplayAll()
+
+        url = reverse('horizon:monitor:instances:process_export',
+                      args=[server.id])
+        res = self.client.get(url, {'format': 'json',
+                                    'process_sort': '-pid'})
+        lines = b''.join(res.streaming_content).decode('utf-8').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([1024, 1], [row['pid'] for row in rows])
+        self.assertEqual('sshd', rows[0]['name'])
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_export_csv_filtered(self):
+        server = self.servers.first()
+        self._stub_sample(server)
+        self.mox.ReplayAll()
+
+        url = reverse('horizon:monitor:instances:process_export',
+                      args=[server.id])
+        res = self.client.get(url, {'process_uid': '1000'})
+        content = b''.join(res.streaming_content).decode('utf-8')
+        self.assertIn('bash', content)
+        self.assertNotIn('sshd', content)
+
+
+class BatchedSampleTests(test.TestCase):
+    class FakeQuerySamples(object):
+        def __init__(self, samples):
+            self.samples = samples
+            self.queries = []
+
+        def query(self, filter=None, orderby=None, limit=None):
+            resource_ids = json.loads(filter)['and'][1]['in']['resource_id']
+            self.queries.append((resource_ids, limit))
+            samples = sorted((s for s in self.samples
+                              if s.resource_id in resource_ids),
+                             key=lambda s: s.timestamp, reverse=True)
+            return samples[:limit]
+
+    class QueriedSample(object):
+        def __init__(self, resource_id, timestamp):
+            self.resource_id = resource_id
+            self.project_id = 'project-%s' % resource_id
+            self.timestamp = timestamp
+            self.volume = '[]'
+
+    @test.update_settings(MONITOR_SAMPLE_BATCH_SIZE=2,
+                          MONITOR_SAMPLE_BATCH_SAMPLES=1)
+    @test.create_stubs({api.ceilometer: ('ceilometerclient',)})
+    def test_get_latest_samples(self):
+        query_samples = self.FakeQuerySamples([
+            self.QueriedSample('a', '2016-10-18T02:10:00'),
+            self.QueriedSample('a', '2016-10-18T02:00:00'),
+            self.QueriedSample('b', '2016-10-18T02:05:00'),
+            self.QueriedSample('c', '2016-10-18T02:07:00'),
+            self.QueriedSample('c', '2016-10-18T02:08:00')])
+        client = self.mox.CreateMockAnything()
+        client.query_samples = query_samples
+        api.ceilometer.ceilometerclient(IsA(http.HttpRequest)) \
+            .MultipleTimes().AndReturn(client)
+        self.mox.ReplayAll()
+
+        samples = meters.get_latest_samples(self.request,
+                                            ['a', 'b', 'c', 'd', 'a'])
+        # 'd' has no sample in the batch window and is left out, rather
+        # than looked up alone.
+        self.assertEqual(['a', 'b', 'c'], sorted(samples))
+        self.assertEqual('2016-10-18T02:10:00', samples['a'].timestamp)
+        self.assertEqual('2016-10-18T02:08:00', samples['c'].timestamp)
+        self.assertEqual('[]', samples['c'].counter_volume)
+        self.assertEqual('project-c', samples['c'].project_id)
+        # The samples of 'c' fill the bounded query of the second chunk,
+        # so 'd' is queried again without 'c'.
+        self.assertEqual([(['a', 'b'], 2), (['c', 'd'], 2), (['d'], 1)],
+                         sorted(query_samples.queries))
+
+
+class ProcessTimelineTests(test.TestCase):
+    def setUp(self):
+        super(ProcessTimelineTests, self).setUp()
+        timeline._cache.reset()
+        snapshots._cache.reset()
+
+    def _payload(self, *pids):
+        return repr([sorted(dict(ProcessListDecodeTests.ENTRY, pid=pid,
+                                 process_name='p%d' % pid).items())
+                     for pid in pids])
+
+    def _timestamp(self, minutes_ago):
+        return (datetime.datetime.utcnow() -
+                datetime.timedelta(minutes=minutes_ago)).isoformat()
+
+    def test_apply_diffs_consecutive_snapshots(self):
+        events = timeline.Timeline('vm')
+        events.apply('t1', process_list.decode(self._payload(1, 2)))
+        self.assertEqual([], events.get_events())
+        events.apply('t2', process_list.decode(self._payload(2, 3)))
+        self.assertEqual([('t2', timeline.STARTED, 3),
+                          ('t2', timeline.EXITED, 1)],
+                         [(e.timestamp, e.action, e.pid)
+                          for e in events.get_events()])
+
+    def test_restarted_pid_is_a_new_process(self):
+        events = timeline.Timeline('vm')
+        events.apply('t1', process_list.decode(self._payload(1)))
+        restarted = dict(ProcessListDecodeTests.ENTRY, pid=1,
+                         process_name='p1', start_time='later')
+        events.apply('t2', process_list.decode(
+            repr([sorted(restarted.items())])))
+        self.assertEqual([timeline.STARTED, timeline.EXITED],
+                         [e.action for e in events.get_events()])
+
+    def test_kernel_thread_events_have_distinct_row_ids(self):
+        events = timeline.Timeline('vm')
+        events.apply('t1', [])
+        events.apply('t2', [
+            process_list.Process('0x%x' % offset, 'kthreadd', 0, 0, 0,
+                                 '0x0', '09:00')
+            for offset in range(3)])
+        table = project_tables.ProcessEventTable(self.request,
+                                                 data=events.get_events())
+        self.assertEqual(3, len(set(table.get_object_id(event)
+                                    for event in table.data)))
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_refresh_diffs_only_new_samples(self):
+        first = FakeSample(self._timestamp(3), self._payload(1, 2), 'vm')
+        second = FakeSample(self._timestamp(2), self._payload(2, 3), 'vm')
+        third = FakeSample(self._timestamp(1), self._payload(3), 'vm')
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            IgnoreArg()).AndReturn([second, first])
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": 'vm'},
+             {"field": "timestamp", "op": "gt", "value": second.timestamp}]
+        ).AndReturn([third])
+        self.mox.ReplayAll()
+
+        self.assertEqual(2, len(timeline.refresh(self.request, 'vm').events))
+        events = timeline.refresh(self.request, 'vm').get_events()
+        self.assertEqual([(third.timestamp, timeline.EXITED, 2),
+                          (second.timestamp, timeline.STARTED, 3),
+                          (second.timestamp, timeline.EXITED, 1)],
+                         [(e.timestamp, e.action, e.pid) for e in events])
+
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_refresh_fetches_evicted_baseline(self):
+        first = FakeSample(self._timestamp(2), self._payload(1, 2), 'vm')
+        second = FakeSample(self._timestamp(1), self._payload(2, 3), 'vm')
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            IgnoreArg()).AndReturn([first])
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": 'vm'},
+             {"field": "timestamp", "op": "gt", "value": first.timestamp}]
+        ).AndReturn([second])
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": 'vm'},
+             {"field": "timestamp", "op": "eq", "value": first.timestamp}],
+            limit=1).AndReturn([first])
+        self.mox.ReplayAll()
+
+        events = timeline.refresh(self.request, 'vm')
+        # Between refreshes the timeline only holds its events.
+        self.assertEqual(0, events.estimate_size())
+        snapshots._cache.reset()
+        events = timeline.refresh(self.request, 'vm')
+        self.assertEqual([(timeline.STARTED, 3), (timeline.EXITED, 1)],
+                         [(e.action, e.pid) for e in events.get_events()])
+
+    def test_refresh_against_fake_backend(self):
+        backend = fake_ceilometer.FakeCeilometer(processes=1000, depth=3)
+        instance_id = backend.instance_ids[0]
+        with backend.patch():
+            events = timeline.refresh(self.request, instance_id).events
+            # 2% of the processes exit and as many start between samples.
+            self.assertEqual(80, len(events))
+            self.assertEqual({'sample_list': 1}, dict(backend.calls))
+            timeline.refresh(self.request, instance_id)
+            self.assertEqual({'sample_list': 2}, dict(backend.calls))
+        self.assertEqual(80, len(events))
+
+
+class SampleStoreTests(test.TestCase):
+    def setUp(self):
+        super(SampleStoreTests, self).setUp()
+        sample_store._store.reset()
+        sample_store._synced.reset()
+        snapshots._cache.reset()
+
+    def _processes(self, *pids):
+        return process_list.decode(repr([
+            sorted(dict(ProcessListDecodeTests.ENTRY, pid=pid).items())
+            for pid in pids]))
+
+    def test_snapshots_stored_as_deltas(self):
+        store = sample_store.ProcessStore(':memory:')
+        self.assertTrue(store.ingest('vm', 't1', self._processes(1, 2, 3)))
+        self.assertTrue(store.ingest('vm', 't2', self._processes(2, 3, 4)))
+        self.assertFalse(store.ingest('vm', 't1', self._processes(1)))
+        stats = store.stats()
+        self.assertEqual(4, stats['processes'])
+        # The keyframe lists three processes, the delta one added and one
+        # removed process.
+        self.assertEqual(5, stats['changes'])
+        self.assertEqual([2, 3, 4], sorted(process.pid for process
+                                           in store.snapshot('vm', 't2')))
+        self.assertEqual([('t1', [1, 2, 3]), ('t2', [2, 3, 4])],
+                         [(timestamp, sorted(p.pid for p in processes))
+                          for timestamp, processes
+                          in store.history('vm', '')])
+
+    def test_prune_collects_unreferenced_rows(self):
+        store = sample_store.ProcessStore(':memory:', retention=3600)
+        now = datetime.datetime.utcnow()
+        old = (now - datetime.timedelta(hours=3)).isoformat()
+        older = (now - datetime.timedelta(hours=4)).isoformat()
+        store.ingest('vm', older, self._processes(1, 2))
+        store.ingest('vm', old, self._processes(3, 4))
+        store.ingest('vm', now.isoformat(), self._processes(5, 6))
+        # The snapshot before the cutoff is dropped with the processes only
+        # it referred to; the strings are still used by the others.
+        self.assertEqual({'strings': 2, 'processes': 4, 'snapshots': 2,
+                          'changes': 4}, store.stats())
+        store.ingest('vm', (now + datetime.timedelta(seconds=1)).isoformat(),
+                     self._processes(1, 5))
+        processes = store.latest('vm').load_processes()
+        self.assertEqual([1, 5], sorted(process.pid for process in processes))
+
+    def test_processes_without_offset_stored_once(self):
+        store = sample_store.ProcessStore(':memory:')
+        processes = [process_list.Process(None, 'kthread', 0, 0, 0, None,
+                                          '09:00'),
+                     process_list.Process('0x1', 'init', 1, 0, 0, None,
+                                          '09:00')]
+        store.ingest('vm', 't1', processes)
+        store.ingest('vm', 't2', processes)
+        # Null fields compare equal, so the second snapshot changes nothing.
+        self.assertEqual({'strings': 3, 'processes': 2, 'snapshots': 2,
+                          'changes': 2}, store.stats())
+        self.assertEqual(sorted(processes, key=lambda p: p.pid),
+                         sorted(store.snapshot('vm', 't2'),
+                                key=lambda p: p.pid))
+
+    @test.update_settings(MONITOR_PROCESS_STORE_PATH=':memory:',
+                          MONITOR_PROCESS_STORE_BACKFILL=3600)
+    def test_sync_after_a_gap_is_bounded(self):
+        store = sample_store.get_store()
+        stale = (datetime.datetime.utcnow() -
+                 datetime.timedelta(days=3)).isoformat()
+        store.ingest('vm', stale, self._processes(1))
+        oldest = (datetime.datetime.utcnow() -
+                  datetime.timedelta(seconds=3600)).isoformat()
+        self.mox.StubOutWithMock(meters, 'get_samples_since')
+        meters.get_samples_since(
+            IsA(http.HttpRequest), 'vm',
+            Func(lambda since: since >= oldest)).AndReturn([])
+        self.mox.ReplayAll()
+
+        sample_store.sync(self.request, 'vm')
+
+    @test.update_settings(MONITOR_PROCESS_STORE_PATH=':memory:')
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_snapshot_read_from_store(self):
+        sample = FakeSample('2016-10-18T02:39:00',
+                            repr([ProcessListDecodeTests.ENTRY]), 'vm')
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": 'vm'}],
+            limit=1).AndReturn([sample])
+        self.mox.ReplayAll()
+
+        index = snapshots.get_snapshot(self.request, 'vm').get_index()
+        self.assertEqual(1024, index.processes[0].pid)
+        # Synced recently, so the snapshot is read back from the store
+        # without querying Ceilometer.
+        snapshots._cache.reset()
+        snapshot = snapshots.get_snapshot(separate_request(self.request),
+                                          'vm')
+        self.assertIsInstance(snapshot.get_sample(),
+                              sample_store.StoredSample)
+        self.assertEqual('sshd', snapshot.get_index().processes[0].name)
+
+    @test.update_settings(MONITOR_PROCESS_STORE_PATH=':memory:')
+    @test.create_stubs({api.ceilometer: ('sample_list',)})
+    def test_snapshot_read_from_ceilometer_on_store_error(self):
+        sample = FakeSample('2016-10-18T02:39:00',
+                            repr([ProcessListDecodeTests.ENTRY]), 'vm')
+        api.ceilometer.sample_list(
+            IsA(http.HttpRequest), meters.PROCESS_LIST_METER,
+            [{"field": "resource_id", "op": "eq", "value": 'vm'}],
+            limit=1).AndReturn([sample])
+        self.mox.ReplayAll()
+
+        sample_store.get_store().close()
+        snapshot = snapshots.get_snapshot(self.request, 'vm')
+        self.assertIs(sample, snapshot.get_sample())
+
+
+class SampleTimesTests(test.TestCase):
+    def setUp(self):
+        super(SampleTimesTests, self).setUp()
+        sample_times._cache.reset()
+        snapshots._cache.reset()
+
+    def test_nearest_timestamp(self):
+        timestamps = ['2016-10-18T02:00:00', '2016-10-18T02:10:00.123',
+                      '2016-10-18T02:20:00']
+        when = sample_times.parse_time('2016-10-18T02:14')
+        self.assertEqual('2016-10-18T02:10:00.123',
+                         sample_times.nearest_timestamp(timestamps, when))
+        when = sample_times.parse_time('2016-10-18 03:00:00')
+        self.assertEqual('2016-10-18T02:20:00',
+                         sample_times.nearest_timestamp(timestamps, when))
+        self.assertIsNone(sample_times.nearest_timestamp([], when))
+        self.assertIsNone(sample_times.parse_time('yesterday'))
+
+    def test_nearest_sample_queried_once_per_interval(self):
+        ceilometer = fake_ceilometer.FakeCeilometer(processes=5, depth=4)
+        timestamps = sorted(set(sample.timestamp
+                                for sample in ceilometer.samples))
+        start = sample_times._to_datetime(timestamps[1])
+        with ceilometer.patch():
+            for seconds in (100, 400, 250):
+                when = start + datetime.timedelta(seconds=seconds)
+                self.assertEqual(
+                    timestamps[1] if seconds < 300 else timestamps[2],
+                    sample_times.nearest(self.request, 'instance-0', when))
+        # The first lookup queries the samples on either side of it; the
+        # others fall between the same two samples.
+        self.assertEqual(2, ceilometer.calls['query_samples'])
+        self.assertEqual(0, ceilometer.calls['sample_list'])
+
+    def test_requested_snapshot_is_nearest_sample(self):
+        ceilometer = fake_ceilometer.FakeCeilometer(processes=5, depth=4)
+        timestamps = sorted(set(sample.timestamp
+                                for sample in ceilometer.samples))
+        when = (sample_times._to_datetime(timestamps[1]) +
+                datetime.timedelta(minutes=2))
+        self.request.GET = http.QueryDict('process_time=%s'
+                                          % when.isoformat())
+        with ceilometer.patch():
+            snapshot = snapshots.get_requested_snapshot(self.request,
+                                                        'instance-0')
+            self.assertEqual(timestamps[1], snapshot.get_sample().timestamp)
+            self.assertEqual(5, len(snapshot.get_index().processes))
+
+
+class ServerCacheTests(test.TestCase):
+    def setUp(self):
+        super(ServerCacheTests, self).setUp()
+        server_cache._cache.clear()
+
+    @test.update_settings(MONITOR_SERVER_CACHE_REFRESH=0,
+                          API_RESULT_LIMIT=20)
+    def test_delta_sync(self):
+        nova = fake_nova.FakeNova(servers=50, page_size=5)
+        with nova.patch():
+            servers, more = server_cache.list_servers(self.request, {})
+            self.assertEqual(50, len(servers))
+            # A full listing takes one call for each API_RESULT_LIMIT
+            # servers, whatever the page size of the tables.
+            self.assertEqual(3, nova.calls['server_list'])
+            self.assertEqual([20, 20, 20], nova.limits)
+
+            nova.update('server-1', status='SHUTOFF')
+            nova.delete('server-2')
+            nova.create()
+            servers, more = server_cache.list_servers(self.request, {})
+            self.assertEqual(4, nova.calls['server_list'])
+            by_id = dict((server.id, server) for server in servers)
+            self.assertEqual(50, len(by_id))
+            self.assertEqual('SHUTOFF', by_id['server-1'].status)
+            self.assertNotIn('server-2', by_id)
+            # Newest first, as Nova lists them.
+            self.assertEqual('server-50', servers[0].id)
+
+            server_cache.list_servers(self.request, {}, force=True)
+            self.assertEqual(7, nova.calls['server_list'])
+
+    @test.update_settings(MONITOR_SERVER_CACHE_REFRESH=60,
+                          MONITOR_SERVER_CACHE_MAX_AGE=3600)
+    def test_filters_and_pages_answered_from_memory(self):
+        nova = fake_nova.FakeNova(servers=50, projects=5, page_size=100)
+        with nova.patch():
+            server_cache.list_servers(self.request, {})
+            servers, more = server_cache.list_servers(
+                self.request, {'tenant_id': 'project-1', 'host': 'host-3'})
+            self.assertEqual(['server-11'], [s.id for s in servers])
+            servers, more = server_cache.list_servers(
+                self.request, {'name': '^vm-4', 'ip': r'10\.0\.0\.4[0-9]$'})
+            self.assertEqual(10, len(servers))
+            servers, more = server_cache.list_servers(
+                self.request, {'marker': 'server-40', 'paginate': True})
+            self.assertEqual('server-39', servers[0].id)
+            # The sync interval has not elapsed: Nova was listed once.
+            self.assertEqual(1, nova.calls['server_list'])
+        self.assertFalse(server_cache.supports({'changes-since': 'now'}))
+
+    @test.update_settings(MONITOR_SERVER_CACHE_REFRESH=0)
+    def test_search_index_matches_scan(self):
+        nova = fake_nova.FakeNova(servers=300, projects=7, hosts=5,
+                                  page_size=1000)
+        with nova.patch():
+            server_cache.list_servers(self.request, {})
+            nova.update('server-5', name='renamed')
+            nova.delete('server-6')
+            cached = server_cache.get_cache(self.request)
+            for opts in ({'name': 'vm-12'}, {'name': '^vm-2.1$'},
+                         {'name': 'renamed'}, {'name': 'vm-6$'},
+                         {'ip': '10.0.1.1'}, {'ip': '10.0.0'},
+                         {'ip': '0.5'}, {'ip': r'0\.5'}, {'ip': '10.0.0.1$'},
+                         {'ip': r'10\.0\.0\.1[0-9]'}, {'ip': '10.0.0.(1|2)'},
+                         {'host': 'host-2', 'status': 'active'},
+                         {'tenant_id': 'project-3', 'name': 'vm-1'}):
+                servers, more = server_cache.list_servers(self.request, opts)
+                # Index lookups give the same servers as checking each one.
+                predicates = [server_cache.FILTERS[key](value)
+                              for key, value in opts.items()]
+                expected = [server.id for server in cached._order
+                            if all(match(server) for match in predicates)]
+                self.assertEqual(expected, [server.id for server in servers])
+            servers, more = server_cache.list_servers(self.request,
+                                                      {'name': 'renamed'})
+            self.assertEqual(['server-5'], [server.id for server in servers])
+            index = search_index.ServerIndex(cached._order)
+            # Nova matches addresses from their start: an address containing
+            # the value elsewhere is not a candidate.
+            self.assertEqual(set(), index.candidates({'ip': '0.5'}))
+            # A '.' stands for any character.
+            self.assertEqual(set('server-1%d1' % i for i in range(10)),
+                             index.candidates({'ip': '10.0.0.1.1'}))
+            # Candidates contain the trigrams of the name; they are checked
+            # against the expression afterwards.
+            self.assertEqual(
+                set(['server-12'] + ['server-12%d' % i for i in range(10)]),
+                index.candidates({'name': '^vm-12$'}))
+            self.assertIsNone(index.candidates({'name': 'vm'}))
+
+
+class BatchActionTests(test.TestCase):
+    @test.update_settings(MONITOR_BATCH_ACTION_WORKERS=3)
+    def test_run_bounded_with_result_of_each_id(self):
+        lock = threading.Lock()
+        running = [0]
+        most = [0]
+
+        def action(request, obj_id):
+            with lock:
+                running[0] += 1
+                most[0] = max(most[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if obj_id == 'server-3':
+                raise self.exceptions.nova
+
+        ids = ['server-%d' % i for i in range(10)]
+        errors = batch.run(self.request, action, ids, batch_id='batch-1')
+        self.assertEqual([None] * 3 + [self.exceptions.nova] + [None] * 6,
+                         errors)
+        self.assertLessEqual(most[0], 3)
+        self.assertGreater(most[0], 1)
+        self.assertEqual({'total': 10, 'done': 10, 'failed': 1},
+                         batch.get_progress(self.request, 'batch-1'))
+        self.assertIsNone(batch.get_progress(self.request, '../batch-1'))
+
+    def test_errors_handled_as_batch_action_does(self):
+        error = self.exceptions.nova
+
+        class RebootInstance(batch.ConcurrentBatchMixin, tables.BatchAction):
+            name = 'reboot'
+
+            @staticmethod
+            def action_present(count):
+                return u'Reboot Instance'
+
+            @staticmethod
+            def action_past(count):
+                return u'Rebooted Instance'
+
+            def action(self, request, obj_id):
+                if obj_id == 'server-2':
+                    raise error
+
+        class Table(object):
+            def get_object_by_id(self, obj_id):
+                return obj_id
+
+            def get_object_display(self, datum):
+                return datum
+
+            def _filter_action(self, action, request, datum):
+                return True
+
+        self.mox.StubOutWithMock(exceptions, 'handle')
+        self.mox.StubOutWithMock(messages, 'error')
+        self.mox.StubOutWithMock(messages, 'info')
+        # The error of the failed instance is handled in the request thread,
+        # and reported with the failures rather than on its own.
+        exceptions.handle(IsA(http.HttpRequest), ignore=True)
+        messages.error(IsA(http.HttpRequest), IgnoreArg())
+        messages.info(IsA(http.HttpRequest), IgnoreArg())
+        self.mox.ReplayAll()
+
+        action = RebootInstance(success_url=INDEX_URL)
+        res = action.handle(Table(), self.request,
+                            ['server-1', 'server-2', 'server-3'])
+        self.assertEqual(['server-1', 'server-3'], action.success_ids)
+        self.assertEqual(302, res.status_code)
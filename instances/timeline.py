@@ -0,0 +1,197 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Process start and exit timeline of instances.
+
+Consecutive ``instance.process.list`` samples of an instance are diffed to
+find the processes started and exited between them. A timeline remembers
+the last sample it applied, so a refresh only fetches and diffs the samples
+published since then.
+
+A cached timeline holds its events only. The processes of the last snapshot
+it applied, which the next new snapshot is diffed against, are left to the
+snapshot cache between refreshes and fetched again if they were evicted, so
+the timelines of large snapshots fit the cache budget.
+"""
+
+import collections
+import datetime
+import operator
+import threading
+
+from django.conf import settings
+
+from oslo_log import log
+
+from openstack_dashboard.dashboards.monitor import cache
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.instances import sample_store
+from openstack_dashboard.dashboards.monitor.instances import snapshots
+
+LOG = log.getLogger(__name__)
+
+STARTED = 'started'
+EXITED = 'exited'
+
+DEFAULT_WINDOW = 3600
+DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+
+# Rough memory footprint of an event, used to budget the timeline cache.
+EVENT_SIZE = 300
+
+ProcessEvent = collections.namedtuple(
+    'ProcessEvent',
+    ('timestamp', 'action', 'pid', 'name', 'uid', 'start_time', 'offset'))
+
+
+def process_key(process):
+    """Returns the key identifying a process across snapshots."""
+    return (process.pid, process.start_time, process.offset)
+
+
+def diff(previous, current):
+    """Returns the processes started and exited between two snapshots.
+
+    Both snapshots map process_key() to processes.
+    """
+    started = [process for key, process in current.items()
+               if key not in previous]
+    exited = [process for key, process in previous.items()
+              if key not in current]
+    return started, exited
+
+
+class Timeline(object):
+    """Process events of an instance, in chronological order."""
+
+    def __init__(self, instance_id):
+        self.instance_id = instance_id
+        self.lock = threading.Lock()
+        self.timestamp = None
+        self.events = collections.deque()
+        # The processes of the last snapshot applied, by process_key(),
+        # while a refresh applies snapshots.
+        self._processes = None
+
+    def apply(self, timestamp, processes):
+        """Records the events between the last snapshot and this one.
+
+        The first snapshot applied is the baseline and records no events.
+        """
+        current = dict((process_key(process), process)
+                       for process in processes)
+        if self._processes is not None:
+            started, exited = diff(self._processes, current)
+            for action, changed in ((EXITED, exited), (STARTED, started)):
+                for process in sorted(changed,
+                                      key=operator.attrgetter('pid')):
+                    self.events.append(ProcessEvent(
+                        timestamp, action, process.pid, process.name,
+                        process.uid, process.start_time, process.offset))
+        self._processes = current
+        self.timestamp = timestamp
+
+    def resume(self, processes):
+        """Restores the processes of the last snapshot applied."""
+        self._processes = dict((process_key(process), process)
+                               for process in processes)
+
+    def release(self):
+        """Drops the processes of the last snapshot applied.
+
+        The next snapshot applied is then a new baseline, unless they are
+        restored with resume().
+        """
+        self._processes = None
+
+    def expire(self, before):
+        """Drops the events recorded for samples older than ``before``."""
+        while self.events and self.events[0].timestamp < before:
+            self.events.popleft()
+
+    def get_events(self):
+        """Returns the events, newest first."""
+        return list(reversed(self.events))
+
+    def estimate_size(self):
+        size = len(self.events) * EVENT_SIZE
+        if self._processes is not None:
+            size += process_list.estimate_size(
+                list(self._processes.values()))
+        return size
+
+
+_cache = cache.from_setting(cache.LRUCache,
+                            'MONITOR_PROCESS_TIMELINE_CACHE_SIZE',
+                            DEFAULT_CACHE_SIZE)
+
+
+def get_snapshots(request, instance_id, since):
+    """Returns the timestamp and processes of the snapshots since ``since``.
+
+    The snapshots are read from the local sample store when it is enabled,
+    and from Ceilometer otherwise; they are returned oldest first.
+    """
+    store = sample_store.get_synced_store(request, instance_id, since=since)
+    if store is not None:
+        return store.history(instance_id, since)
+    samples = meters.get_samples_since(request, instance_id, since)
+    return list(meters.decode_samples(instance_id, samples))
+
+
+def get_baseline(request, instance_id, timestamp):
+    """Returns the processes of the snapshot a timeline last applied."""
+    store = sample_store.get_store()
+    if store is not None:
+        return store.snapshot(instance_id, timestamp)
+    return snapshots.get_processes_at(request, instance_id, timestamp)
+
+
+def refresh(request, instance_id):
+    """Returns the timeline of an instance, updated with its new samples.
+
+    Only events of the last ``MONITOR_PROCESS_TIMELINE_WINDOW`` seconds are
+    kept.
+    """
+    timeline_cache = _cache.get()
+    timeline = timeline_cache.get(instance_id)
+    if timeline is None:
+        timeline = Timeline(instance_id)
+    window = getattr(settings, 'MONITOR_PROCESS_TIMELINE_WINDOW',
+                     DEFAULT_WINDOW)
+    cutoff = (datetime.datetime.utcnow() -
+              datetime.timedelta(seconds=window)).isoformat()
+    with timeline.lock:
+        history = get_snapshots(request, instance_id,
+                                timeline.timestamp or cutoff)
+        if history and timeline.timestamp is not None:
+            baseline = get_baseline(request, instance_id, timeline.timestamp)
+            if baseline is None:
+                LOG.warning('The process list of instance %s at %s is gone; '
+                            'the process timeline restarts from %s.',
+                            instance_id, timeline.timestamp, history[0][0])
+            else:
+                timeline.resume(baseline)
+        for timestamp, processes in history:
+            timeline.apply(timestamp, processes)
+        if history:
+            timestamp, processes = history[-1]
+            snapshots.remember(instance_id, timestamp, processes)
+        timeline.release()
+        timeline.expire(cutoff)
+        size = timeline.estimate_size()
+    timeline_cache.set(instance_id, timeline, size=size)
+    LOG.debug('process timeline of %s: %d snapshots applied, %d events',
+              instance_id, len(history), len(timeline.events))
+    return timeline
@@ -26,6 +26,9 @@ INSTANCES = r'^(?P<instance_id>[^/]+)/%s$'
 
 urlpatterns = [
     url(r'^$', views.AdminIndexView.as_view(), name='index'),
+    url(r'^row_status$', views.RowStatusView.as_view(), name='row_status'),
+    url(r'^batch_progress$', views.BatchProgressView.as_view(),
+        name='batch_progress'),
     url(INSTANCES % 'update', views.AdminUpdateView.as_view(), name='update'),
     url(INSTANCES % 'detail', views.DetailView.as_view(), name='detail'),
     url(INSTANCES % 'console', views.console, name='console'),
@@ -34,4 +37,10 @@ urlpatterns = [
     url(INSTANCES % 'rdp', views.rdp, name='rdp'),
     url(INSTANCES % 'live_migrate', views.LiveMigrateView.as_view(),
         name='live_migrate'),
+    url(INSTANCES % 'processes', views.ProcessListExportView.as_view(),
+        name='process_export'),
+    url(INSTANCES % 'process_rows', views.ProcessRowsView.as_view(),
+        name='process_rows'),
+    url(INSTANCES % 'sample_info', views.SampleInfoView.as_view(),
+        name='sample_info'),
 ]
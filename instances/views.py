@@ -18,24 +18,43 @@
 #    under the License.
 
 from collections import OrderedDict
+import datetime
+import functools
+import json
 
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import reverse_lazy
+from django import http
 from django.utils.translation import ugettext_lazy as _
+from django.views import generic
 
 from horizon import exceptions
 from horizon import forms
 from horizon import tables
+from horizon.utils import csvbase
+from horizon.utils import filters
 from horizon.utils import memoized
 
 from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import concurrency
+from openstack_dashboard.dashboards.monitor import tenants
+from openstack_dashboard.dashboards.monitor.instances import batch
+from openstack_dashboard.dashboards.monitor.instances import flavors
 from openstack_dashboard.dashboards.monitor.instances \
     import forms as project_forms
+from openstack_dashboard.dashboards.monitor.instances import pages
+from openstack_dashboard.dashboards.monitor.instances \
+    import process_list
+from openstack_dashboard.dashboards.monitor.instances import sample_times
+from openstack_dashboard.dashboards.monitor.instances import server_cache
+from openstack_dashboard.dashboards.monitor.instances import snapshots
 from openstack_dashboard.dashboards.monitor.instances \
     import tables as project_tables
 from openstack_dashboard.dashboards.monitor.instances \
     import tabs as project_tabs
+from openstack_dashboard.dashboards.project.instances \
+    import tables as instance_tables
 from openstack_dashboard.dashboards.project.instances import views
 from openstack_dashboard.dashboards.project.instances.workflows \
     import update_instance
@@ -66,18 +85,113 @@ class AdminUpdateView(views.UpdateView):
     success_url = reverse_lazy("horizon:monitor:instances:index")
 
 
+# Seconds the admin instance list waits for each backend call.
+DEFAULT_BACKEND_TIMEOUT = 30
+
+
+def _result(outcome):
+    """Returns the value of a concurrent call, or raises its error.
+
+    Errors are raised in the calling thread so exceptions.handle() treats
+    them as if the call had been made there; a timeout is reported as the
+    service being unavailable.
+    """
+    if isinstance(outcome.error, concurrency.CallTimeout):
+        raise exceptions.NotAvailable(_('The request timed out.'))
+    if outcome.error is not None:
+        raise outcome.error
+    return outcome.value
+
+
+# Seconds by which the instances changed since a status poll overlap the
+# previous poll, to allow for the clocks of the dashboard and Nova to differ.
+ROW_STATUS_OVERLAP = 5
+
+
+def _status_poll_time():
+    """Returns the changes-since time of the next poll of row statuses."""
+    polled = (datetime.datetime.utcnow() -
+              datetime.timedelta(seconds=ROW_STATUS_OVERLAP))
+    return polled.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _load_instances(request, search_opts, force=False):
+    """Returns the instances, whether more follow, and the error of
+    updating their addresses if there was one.
+
+    The instances are listed from the server cache when it is enabled and
+    answers the search options; ``force`` resyncs the cache first.
+    """
+    if server_cache.enabled() and server_cache.supports(search_opts):
+        instances, more = server_cache.list_servers(request, search_opts,
+                                                    force=force)
+    else:
+        instances, more = api.nova.server_list(request,
+                                               search_opts=search_opts,
+                                               all_tenants=True)
+    address_error = None
+    if instances:
+        try:
+            api.network.servers_update_addresses(request, instances,
+                                                 all_tenants=True)
+        except Exception as e:
+            address_error = e
+    return instances, more, address_error
+
+
+def _prefetch_instances(request, search_opts):
+    """Loads a page of instances ahead of it being requested."""
+    page = _load_instances(request, search_opts)
+    # The flavors and projects of the page are resolved into the shared
+    # caches too, so rendering it does not wait on them either. Failures
+    # are left for the request of the page to report.
+    try:
+        catalog = flavors.get_catalog(request)
+        flavors.lookup(request, [inst.flavor["id"] for inst in page[0]
+                                 if inst.flavor["id"] not in catalog])
+        tenants.resolve(request, [inst.tenant_id for inst in page[0]],
+                        index=tenants.get_index(request))
+    except Exception:
+        pass
+    return page
+
+
 class AdminIndexView(tables.DataTableView):
     table_class = project_tables.AdminInstancesTable
     template_name = 'monitor/instances/index.html'
     page_title = _("Instances")
 
+    def get_context_data(self, **kwargs):
+        context = super(AdminIndexView, self).get_context_data(**kwargs)
+        context['row_status_since'] = self._row_status_since
+        return context
+
     def has_more_data(self, table):
         return self._more
 
     def needs_filter_first(self, table):
         return self._needs_filter_first
 
+    def _get_tenants(self):
+        return tenants.get_index(self.request)
+
+    def _get_flavors(self):
+        if self.request.GET.get(server_cache.REFRESH_PARAM):
+            flavors.invalidate(self.request)
+        return flavors.get_catalog(self.request)
+
+    def _get_instances(self, search_opts):
+        self._search_opts = dict(search_opts)
+        force = bool(self.request.GET.get(server_cache.REFRESH_PARAM))
+        page = pages.take(self.request, search_opts)
+        if page is None or force:
+            page = _load_instances(self.request, search_opts, force=force)
+        return page
+
     def get_data(self):
+        # Rows still transitioning are refreshed with the instances changed
+        # after the list was retrieved.
+        self._row_status_since = _status_poll_time()
         instances = []
         marker = self.request.GET.get(
             project_tables.AdminInstancesTable._meta.pagination_param, None)
@@ -96,63 +210,88 @@ class AdminIndexView(tables.DataTableView):
             return instances
 
         self._needs_filter_first = False
+        # Tenants, flavors and instances are retrieved concurrently, unless
+        # the instances are filtered by project name, which needs the
+        # tenants first.
+        timeout = getattr(settings, 'MONITOR_BACKEND_TIMEOUT',
+                          DEFAULT_BACKEND_TIMEOUT)
+        project = search_opts.pop('project', None)
+        calls = [self._get_tenants, self._get_flavors]
+        if project is None:
+            calls.append(functools.partial(self._get_instances, search_opts))
+        outcomes = concurrency.call_concurrently(calls,
+                                                 max_workers=len(calls),
+                                                 timeout=timeout)
+
         # Gather our tenants to correlate against IDs
+        tenant_index = None
         try:
-            tenants, has_more = api.keystone.tenant_list(self.request)
+            tenant_index = _result(outcomes[0])
         except Exception:
-            tenants = []
             msg = _('Unable to retrieve instance project information.')
             exceptions.handle(self.request, msg)
 
-        if 'project' in search_opts:
-            ten_filter_ids = [t.id for t in tenants
-                              if t.name == search_opts['project']]
-            del search_opts['project']
-            if len(ten_filter_ids) > 0:
-                search_opts['tenant_id'] = ten_filter_ids[0]
+        if project is not None:
+            tenant_id = (tenant_index.id_of(project)
+                         if tenant_index is not None else None)
+            if tenant_id is not None:
+                search_opts['tenant_id'] = tenant_id
             else:
                 self._more = False
                 return []
+            outcomes.extend(concurrency.call_concurrently(
+                [functools.partial(self._get_instances, search_opts)],
+                timeout=timeout))
 
+        address_error = None
         try:
-            instances, self._more = api.nova.server_list(
-                self.request,
-                search_opts=search_opts,
-                all_tenants=True)
+            instances, self._more, address_error = _result(outcomes[2])
+            if self._more and instances:
+                # The following page is loaded while this one is rendered.
+                pages.prefetch(self.request,
+                               dict(self._search_opts,
+                                    marker=instances[-1].id),
+                               _prefetch_instances)
         except Exception:
             self._more = False
             exceptions.handle(self.request,
                               _('Unable to retrieve instance list.'))
         if instances:
-            try:
-                api.network.servers_update_addresses(self.request, instances,
-                                                     all_tenants=True)
-            except Exception:
-                exceptions.handle(
-                    self.request,
-                    message=_('Unable to retrieve IP addresses from Neutron.'),
-                    ignore=True)
+            if address_error is not None:
+                try:
+                    raise address_error
+                except Exception:
+                    exceptions.handle(
+                        self.request,
+                        message=_('Unable to retrieve IP addresses from '
+                                  'Neutron.'),
+                        ignore=True)
 
             # Gather our flavors to correlate against IDs
             try:
-                flavors = api.nova.flavor_list(self.request)
+                full_flavors = OrderedDict(_result(outcomes[1]))
             except Exception:
                 # If fails to retrieve flavor list, creates an empty list.
-                flavors = []
-
-            full_flavors = OrderedDict([(f.id, f) for f in flavors])
-            tenant_dict = OrderedDict([(t.id, t) for t in tenants])
+                full_flavors = OrderedDict()
+
+            # Flavors missing from the flavor list are looked up via nova
+            # api, once for each distinct flavor.
+            found, errors = flavors.lookup(
+                self.request, [inst.flavor["id"] for inst in instances
+                               if inst.flavor["id"] not in full_flavors])
+            full_flavors.update(found)
+            tenant_dict = {}
+            if tenant_index is not None:
+                tenant_dict, tenant_errors = tenants.resolve(
+                    self.request, [inst.tenant_id for inst in instances],
+                    index=tenant_index)
             # Loop through instances to get flavor and tenant info.
             for inst in instances:
                 flavor_id = inst.flavor["id"]
                 try:
-                    if flavor_id in full_flavors:
-                        inst.full_flavor = full_flavors[flavor_id]
-                    else:
-                        # If the flavor_id is not in full_flavors list,
-                        # gets it via nova api.
-                        inst.full_flavor = api.nova.flavor_get(
-                            self.request, flavor_id)
+                    if flavor_id in errors:
+                        raise errors[flavor_id]
+                    inst.full_flavor = full_flavors[flavor_id]
                 except Exception:
                     msg = _('Unable to retrieve instance size information.')
                     exceptions.handle(self.request, msg)
@@ -161,6 +300,85 @@ class AdminIndexView(tables.DataTableView):
         return instances
 
 
+class BatchProgressView(generic.View):
+    """Returns the progress of a batch action of the admin instance table."""
+
+    def get(self, request):
+        progress = batch.get_progress(request,
+                                      request.GET.get(batch.BATCH_PARAM))
+        if progress is None:
+            raise http.Http404()
+        return http.JsonResponse(progress)
+
+
+class RowStatusView(generic.View):
+    """Returns the rows of the admin instance table that changed.
+
+    The rows of instances in a transitional state are polled together: the
+    ids of the polled rows and the time of the previous poll are sent, and
+    one ``server_list`` call filtered with ``changes-since`` returns the
+    instances changed since. Only the rows of those are rendered, with
+    their flavors and project names resolved from the shared caches; rows
+    of deleted instances are listed to be removed.
+    """
+
+    def get(self, request):
+        ids = set(request.GET.getlist('id'))
+        since = sample_times.parse_time(request.GET.get('since'))
+        if not ids or since is None:
+            return http.HttpResponseBadRequest()
+        polled = _status_poll_time()
+        search_opts = {'changes-since': since.isoformat()}
+        try:
+            servers, more = api.nova.server_list(request,
+                                                 search_opts=search_opts,
+                                                 all_tenants=True)
+        except Exception:
+            exceptions.handle(request, ignore=True)
+            msg = _('Unable to retrieve instance list.')
+            return http.JsonResponse({'error': u'%s' % msg}, status=500)
+        instances = []
+        deleted = []
+        for server in servers:
+            if server.id not in ids:
+                continue
+            if server.status.lower() in ('deleted', 'soft_deleted'):
+                deleted.append(server.id)
+            else:
+                instances.append(server)
+        if instances:
+            self._set_details(request, instances)
+        table = project_tables.AdminInstancesTable(request, data=instances)
+        rows = dict((table.get_object_id(row.datum), row.render())
+                    for row in table.get_rows())
+        return http.JsonResponse({'rows': rows,
+                                  'deleted': deleted,
+                                  'since': polled})
+
+    def _set_details(self, request, instances):
+        try:
+            api.network.servers_update_addresses(request, instances,
+                                                 all_tenants=True)
+        except Exception:
+            exceptions.handle(request, ignore=True)
+        try:
+            full_flavors = OrderedDict(flavors.get_catalog(request))
+        except Exception:
+            exceptions.handle(request, ignore=True)
+            full_flavors = OrderedDict()
+        found, errors = flavors.lookup(
+            request, [inst.flavor["id"] for inst in instances
+                      if inst.flavor["id"] not in full_flavors])
+        full_flavors.update(found)
+        tenant_dict, errors = tenants.resolve(
+            request, [inst.tenant_id for inst in instances])
+        for inst in instances:
+            if inst.flavor["id"] in full_flavors:
+                inst.full_flavor = full_flavors[inst.flavor["id"]]
+            tenant = tenant_dict.get(inst.tenant_id)
+            inst.tenant_name = getattr(tenant, "name", None)
+
+
 class LiveMigrateView(forms.ModalFormView):
     form_class = project_forms.LiveMigrateForm
     template_name = 'monitor/instances/live_migrate.html'
@@ -213,3 +431,179 @@ class DetailView(views.DetailView):
     def _get_actions(self, instance):
         table = project_tables.AdminInstancesTable(self.request)
         return table.render_row_actions(instance)
+
+    @memoized.memoized_method
+    def get_data(self):
+        # Same as the project instance details, except that the flavor is
+        # resolved from the shared flavor catalog.
+        instance_id = self.kwargs['instance_id']
+
+        try:
+            instance = api.nova.server_get(self.request, instance_id)
+        except Exception:
+            redirect = reverse(self.redirect_url)
+            exceptions.handle(self.request,
+                              _('Unable to retrieve details for '
+                                'instance "%s".') % instance_id,
+                              redirect=redirect)
+            # Not all exception types handled above will result in a redirect.
+            # Need to raise here just in case.
+            raise exceptions.Http302(redirect)
+
+        choices = instance_tables.STATUS_DISPLAY_CHOICES
+        instance.status_label = (
+            filters.get_display_label(choices, instance.status))
+
+        try:
+            instance.volumes = api.nova.instance_volumes_list(self.request,
+                                                              instance_id)
+            # Sort by device name
+            instance.volumes.sort(key=lambda vol: vol.device)
+        except Exception:
+            msg = _('Unable to retrieve volume list for instance '
+                    '"%(name)s" (%(id)s).') % {'name': instance.name,
+                                                'id': instance_id}
+            exceptions.handle(self.request, msg, ignore=True)
+
+        try:
+            instance.full_flavor = flavors.get_flavor(self.request,
+                                                      instance.flavor["id"])
+        except Exception:
+            msg = _('Unable to retrieve flavor information for instance '
+                    '"%(name)s" (%(id)s).') % {'name': instance.name,
+                                                'id': instance_id}
+            exceptions.handle(self.request, msg, ignore=True)
+
+        try:
+            instance.security_groups = api.network.server_security_groups(
+                self.request, instance_id)
+        except Exception:
+            msg = _('Unable to retrieve security groups for instance '
+                    '"%(name)s" (%(id)s).') % {'name': instance.name,
+                                                'id': instance_id}
+            exceptions.handle(self.request, msg, ignore=True)
+
+        try:
+            api.network.servers_update_addresses(self.request, [instance])
+        except Exception:
+            msg = _('Unable to retrieve IP addresses from Neutron for '
+                    'instance "%(name)s" (%(id)s).') % {'name': instance.name,
+                                                         'id': instance_id}
+            exceptions.handle(self.request, msg, ignore=True)
+
+        return instance
+
+
+class ProcessListCsvRenderer(csvbase.BaseCsvStreamingResponse):
+
+    columns = [_("Offset"), _("Name"), _("Pid"), _("Uid"), _("Gid"),
+               _("DTB"), _("Start Time")]
+
+    def get_row_data(self):
+        for process in self.context['processes']:
+            yield tuple(process)
+
+
+# Number of processes serialized per chunk of a JSON export.
+EXPORT_CHUNK_SIZE = 500
+
+
+def _ndjson_chunks(processes):
+    chunk = []
+    for process in processes:
+        chunk.append(json.dumps(dict(zip(process_list.FIELDS, process))))
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+class ProcessListExportView(generic.View):
+    """Streams the latest process list of an instance as CSV or JSON.
+
+    The ``format`` parameter selects CSV (the default) or newline-delimited
+    JSON; the sort and filter parameters of the process table apply.
+    Processes are written as they are read from the cached snapshot, so no
+    table rows are built for the export.
+    """
+
+    def get(self, request, instance_id):
+        redirect = reverse('horizon:monitor:instances:detail',
+                           args=[instance_id])
+        index = None
+        try:
+            index = snapshots.get_requested_snapshot(request,
+                                                     instance_id).get_index()
+        except Exception:
+            exceptions.handle(request,
+                              _('Unable to retrieve the process list of '
+                                'instance "%s".') % instance_id,
+                              redirect=redirect)
+        if index is None:
+            raise http.Http404()
+        filters = process_list.parse_filters(request.GET)
+        processes = index.iterate(**process_list.query_args(filters))
+        filename = 'processes-%s' % instance_id
+        if request.GET.get('format') == 'json':
+            response = http.StreamingHttpResponse(
+                _ndjson_chunks(processes),
+                content_type='application/x-ndjson')
+            response['Content-Disposition'] = \
+                'attachment; filename="%s.json"' % filename
+            return response
+        return ProcessListCsvRenderer(request=request,
+                                      template=None,
+                                      context={'processes': processes},
+                                      content_type='text/csv',
+                                      filename='%s.csv' % filename)
+
+
+# Number of processes of each chunk appended to the process list table.
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ProcessRowsView(generic.View):
+    """Returns the rows of the process list table following a marker.
+
+    The tab renders the first page of processes; its script then appends
+    the following ones a chunk of ``MONITOR_PROCESS_CHUNK_SIZE`` rows at a
+    time, so the page is shown before every row is rendered. Every chunk is
+    read from the sample of the first page, named by the
+    ``process_snapshot`` parameter.
+    """
+
+    def get(self, request, instance_id):
+        table_class = project_tables.ProcessListTable
+        limit = getattr(settings, 'MONITOR_PROCESS_CHUNK_SIZE',
+                        DEFAULT_CHUNK_SIZE)
+        try:
+            snapshot = snapshots.get_requested_snapshot(request, instance_id)
+            processes, more = snapshot.query(
+                request.GET,
+                marker=request.GET.get(table_class._meta.pagination_param),
+                limit=limit)
+        except Exception:
+            exceptions.handle(request, ignore=True)
+            msg = _('Unable to retrieve the process list of instance '
+                    '"%s".') % instance_id
+            return http.JsonResponse({'error': u'%s' % msg}, status=500)
+        table = table_class(request, data=processes, instance_id=instance_id)
+        rows = ''.join(row.render() for row in table.get_rows())
+        return http.JsonResponse({'rows': rows, 'more': more})
+
+
+class SampleInfoView(tables.DataTableView):
+    """Renders the sample metadata of an instance without its processes."""
+    table_class = project_tables.SampleInfoTable
+    template_name = 'monitor/instances/_sample_info.html'
+
+    def get_data(self):
+        try:
+            snapshot = snapshots.get_requested_snapshot(
+                self.request, self.kwargs['instance_id'])
+            return [snapshot.get_info()]
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to retrieve meter information.'))
+            return []
@@ -26,9 +26,11 @@ from django.utils import timezone
 
 from mox3.mox import IsA  # noqa
 
+from horizon import exceptions
 from horizon.templatetags import sizeformat
 
 from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import tenants
 from openstack_dashboard.test import helpers as test
 from openstack_dashboard import usage
 
@@ -38,11 +40,17 @@ INDEX_URL = reverse('horizon:project:overview:index')
 
 class UsageViewTests(test.BaseAdminViewTests):
 
+    def setUp(self):
+        super(UsageViewTests, self).setUp()
+        tenants._cache.reset()
+        tenants._lookups.reset()
+
     def _stub_api_calls(self, nova_stu_enabled):
         self.mox.StubOutWithMock(api.nova, 'usage_list')
         self.mox.StubOutWithMock(api.nova, 'tenant_absolute_limits')
         self.mox.StubOutWithMock(api.nova, 'extension_supported')
         self.mox.StubOutWithMock(api.keystone, 'tenant_list')
+        self.mox.StubOutWithMock(api.keystone, 'tenant_get')
         self.mox.StubOutWithMock(api.neutron, 'is_extension_supported')
         self.mox.StubOutWithMock(api.network, 'floating_ip_supported')
         self.mox.StubOutWithMock(api.network, 'tenant_floating_ip_list')
@@ -89,6 +97,14 @@ class UsageViewTests(test.BaseAdminViewTests):
             api.keystone.tenant_list(IsA(http.HttpRequest)) \
                 .AndReturn([self.tenants.list(), False])
 
+        if nova_stu_enabled and tenant_deleted:
+            # Projects missing from the list are looked up before being
+            # shown as deleted.
+            for u in usage_list[1:]:
+                api.keystone.tenant_get(IsA(http.HttpRequest), u.tenant_id,
+                                        admin=True) \
+                    .InAnyOrder().AndRaise(exceptions.NotFound())
+
         if nova_stu_enabled:
             start_day, now = self._get_start_end_range(overview_days_range)
             api.nova.usage_list(IsA(http.HttpRequest),
@@ -24,7 +24,7 @@ from django.utils.translation import ugettext_lazy as _
 from horizon import exceptions
 from horizon.utils import csvbase
 
-from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import tenants
 from openstack_dashboard import usage
 
 
@@ -58,17 +58,22 @@ class GlobalOverview(usage.UsageView):
         data = super(GlobalOverview, self).get_data()
         # Pre-fill project names
         try:
-            projects, has_more = api.keystone.tenant_list(self.request)
+            index = tenants.get_index(self.request)
         except Exception:
-            projects = []
+            index = None
             exceptions.handle(self.request,
                               _('Unable to retrieve project list.'))
+        found = {}
+        if index is not None:
+            found, errors = tenants.resolve(
+                self.request, [instance.tenant_id for instance in data],
+                index=index)
         for instance in data:
-            project = [t for t in projects if t.id == instance.tenant_id]
+            project = found.get(instance.tenant_id)
             # If we could not get the project name, show the tenant_id with
             # a 'Deleted' identifier instead.
-            if project:
-                instance.project_name = getattr(project[0], "name", None)
+            if project is not None:
+                instance.project_name = getattr(project, "name", None)
             else:
                 deleted = _("Deleted")
                 instance.project_name = translation.string_concat(
@@ -0,0 +1,49 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import collections
+
+from django.template.defaultfilters import floatformat  # noqa
+from django.template.defaultfilters import yesno  # noqa
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import tables
+
+
+ProcessFrequency = collections.namedtuple(
+    'ProcessFrequency', ('name', 'instances', 'share', 'rare'))
+
+
+class ProcessFrequencyFilterAction(tables.FilterAction):
+    name = "filter_process_stats"
+    filter_type = "server"
+    filter_choices = (('project', _("Project ID ="), True),
+                      ('max_instances', _("Running On At Most"), True))
+
+
+class ProcessFrequencyTable(tables.DataTable):
+    name = tables.Column('name', verbose_name=_('Process Name'))
+    instances = tables.Column('instances', verbose_name=_('Instances'))
+    share = tables.Column(lambda row: row.share * 100,
+                          verbose_name=_('Share of Instances (%)'),
+                          filters=(lambda share: floatformat(share, 1),))
+    rare = tables.Column('rare', verbose_name=_('Rare'), filters=(yesno,))
+
+    def get_object_id(self, obj):
+        return obj.name
+
+    class Meta(object):
+        name = 'process_frequencies'
+        verbose_name = _("Process Frequencies")
+        table_actions = (ProcessFrequencyFilterAction,)
+        multi_select = False
@@ -0,0 +1,61 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from django.core.urlresolvers import reverse
+
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.processes import fleet
+from openstack_dashboard.test import helpers as test
+
+
+INDEX_URL = reverse('horizon:monitor:process_stats:index')
+
+
+def processes(*names):
+    return [process_list.Process('0x%x' % pid, name, pid, 0, 0, '0x0',
+                                 '2016-10-18 02:39:00')
+            for pid, name in enumerate(names)]
+
+
+class ProcessStatisticsViewTests(test.BaseAdminViewTests):
+    def _stub_index(self):
+        index = fleet.FleetProcessIndex()
+        for instance in range(200):
+            names = ('sshd', 'cron') if instance else ('sshd', 'xmrig')
+            index.update('vm-%d' % instance, '2016-10-18T02:00:00',
+                         processes(*names), project_id='p%d' % (instance % 2))
+        index.refreshed_at = fleet.time.time()
+        self.mox.StubOutWithMock(fleet, 'get_index')
+        fleet.get_index().MultipleTimes().AndReturn(index)
+        self.mox.ReplayAll()
+
+    def test_index(self):
+        self._stub_index()
+        res = self.client.get(INDEX_URL)
+        self.assertTemplateUsed(res, 'monitor/process_stats/index.html')
+        rows = res.context['table'].data
+        self.assertEqual([('sshd', 200, False), ('cron', 199, False),
+                          ('xmrig', 1, True)],
+                         [(row.name, row.instances, row.rare) for row in rows])
+        self.assertEqual(1, res.context['rare_count'])
+
+    def test_filter_rare_names_of_project(self):
+        self._stub_index()
+        res = self.client.post(
+            INDEX_URL,
+            {'process_frequencies__filter_process_stats__q_field':
+             'project',
+             'process_frequencies__filter_process_stats__q': 'p0'})
+        self.assertEqual(100, res.context['instance_count'])
+        self.assertEqual(['sshd', 'cron', 'xmrig'],
+                         [row.name for row in res.context['table'].data])
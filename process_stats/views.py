@@ -0,0 +1,72 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+from horizon import tables
+
+from openstack_dashboard.dashboards.monitor.process_stats \
+    import tables as project_tables
+from openstack_dashboard.dashboards.monitor.processes import fleet
+
+DEFAULT_RARE_RATIO = 0.01
+
+
+class IndexView(tables.DataTableView):
+    """Counts the instances running each process name.
+
+    The counts come from the latest process lists held by the fleet process
+    index. Names running on at most ``MONITOR_PROCESS_RARE_RATIO`` of the
+    instances, and on at least one, are flagged as rare.
+    """
+    table_class = project_tables.ProcessFrequencyTable
+    template_name = 'monitor/process_stats/index.html'
+    page_title = _("Process Statistics")
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['instance_count'] = getattr(self, '_instance_count', 0)
+        context['rare_count'] = getattr(self, '_rare_count', 0)
+        context['index_stats'] = fleet.get_index().stats()
+        return context
+
+    def get_data(self):
+        index = fleet.get_index()
+        try:
+            fleet.maybe_refresh(self.request, index)
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to refresh the process index.'))
+        filters = self.get_filters()
+        total, frequencies = index.frequencies(
+            project_id=filters.get('project') or None)
+        ratio = getattr(settings, 'MONITOR_PROCESS_RARE_RATIO',
+                        DEFAULT_RARE_RATIO)
+        rare_limit = max(1, int(total * ratio))
+        max_instances = None
+        try:
+            max_instances = int(filters['max_instances'])
+        except (KeyError, ValueError):
+            pass
+        rows = []
+        for name, count in frequencies:
+            if max_instances is not None and count > max_instances:
+                continue
+            rows.append(project_tables.ProcessFrequency(
+                name, count, float(count) / total, count <= rare_limit))
+        self._instance_count = total
+        self._rare_count = sum(1 for _name, count in frequencies
+                               if count <= rare_limit)
+        return rows
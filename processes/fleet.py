@@ -0,0 +1,371 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Fleet-wide index of the processes running on instances.
+
+The index maps each process name to the instances running it, built from
+the latest ``instance.process.list`` sample of every instance listed by
+Nova, fetched with the batched queries of meters.get_latest_samples(). It
+is refreshed incrementally in a background thread: only samples newer than
+the newest one already indexed, less ``MONITOR_PROCESS_INDEX_OVERLAP``
+seconds for samples stored late, are fetched, and only the instances they
+belong to are re-indexed.
+
+The instances are listed from the server cache of the region, which is
+synced with the servers changed since its previous sync, so a refresh does
+not list every server from Nova again.
+
+Process names are interned as integer ids, and the distinct name ids of
+each instance are kept in a compact array, so counting how many instances
+run each name is a single pass over those arrays. The id of a name no
+instance runs any more is reused for the next new name.
+"""
+
+import array
+import bisect
+import collections
+import datetime
+import itertools
+import operator
+import threading
+import time
+
+from django.conf import settings
+
+from oslo_log import log
+
+from openstack_dashboard.dashboards.monitor import concurrency
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.instances import server_cache
+from openstack_dashboard.dashboards.monitor.processes import frequency
+
+LOG = log.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 60
+DEFAULT_WINDOW = 3600
+DEFAULT_OVERLAP = 60
+
+ProcessHit = collections.namedtuple(
+    'ProcessHit',
+    ('instance_id', 'instance_name', 'name', 'pid', 'start_time', 'offset'))
+
+
+def hit_id(hit):
+    """Returns the id of the table row of a ProcessHit.
+
+    Kernel threads share pid 0 and a start time; the offset tells them
+    apart.
+    """
+    return '%s-%s-%s-%s' % (hit.instance_id, hit.pid, hit.start_time,
+                            hit.offset)
+
+
+IndexedInstance = collections.namedtuple(
+    'IndexedInstance',
+    ('timestamp', 'name', 'project_id', 'process_names', 'name_ids'))
+
+
+class FleetProcessIndex(object):
+    """Inverted index from process names to the instances running them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> {instance id: [(pid, start_time, offset), ...]}
+        self._postings = {}
+        # instance id -> IndexedInstance
+        self._instances = {}
+        # process name -> name id, and name id -> process name, or None
+        # for the ids in _free_ids
+        self._name_ids = {}
+        self._names_by_id = []
+        self._free_ids = set()
+        self._sorted_names = None
+        self.high_water = None
+        self.refreshed_at = None
+
+    def __len__(self):
+        return len(self._instances)
+
+    def _intern(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            if self._free_ids:
+                name_id = self._free_ids.pop()
+                self._names_by_id[name_id] = name
+            else:
+                name_id = len(self._names_by_id)
+                self._names_by_id.append(name)
+            self._name_ids[name] = name_id
+        return name_id
+
+    def _release(self, name):
+        # No instance runs the name any more, so no name_ids array holds
+        # its id.
+        name_id = self._name_ids.pop(name)
+        self._names_by_id[name_id] = None
+        self._free_ids.add(name_id)
+        while self._names_by_id and self._names_by_id[-1] is None:
+            self._free_ids.discard(len(self._names_by_id) - 1)
+            self._names_by_id.pop()
+
+    def update(self, instance_id, timestamp, processes, instance_name=None,
+               project_id=None):
+        """Indexes the processes of an instance sample.
+
+        Samples older than the one already indexed for the instance are
+        ignored.
+        """
+        postings = {}
+        for process in processes:
+            postings.setdefault(process.name, []).append(
+                (process.pid, process.start_time, process.offset))
+        with self._lock:
+            current = self._instances.get(instance_id)
+            if current is not None:
+                if current.timestamp >= timestamp:
+                    return False
+                self._remove(instance_id, current.process_names)
+            for name, entries in postings.items():
+                if name not in self._postings:
+                    self._postings[name] = {}
+                    self._sorted_names = None
+                self._postings[name][instance_id] = entries
+            name_ids = array.array(
+                'i', sorted(self._intern(name) for name in postings))
+            self._instances[instance_id] = IndexedInstance(
+                timestamp, instance_name, project_id, frozenset(postings),
+                name_ids)
+            if self.high_water is None or timestamp > self.high_water:
+                self.high_water = timestamp
+        return True
+
+    def _remove(self, instance_id, names):
+        for name in names:
+            instances = self._postings[name]
+            instances.pop(instance_id, None)
+            if not instances:
+                del self._postings[name]
+                self._release(name)
+                self._sorted_names = None
+
+    def remove(self, instance_id):
+        with self._lock:
+            current = self._instances.pop(instance_id, None)
+            if current is not None:
+                self._remove(instance_id, current.process_names)
+
+    def retain(self, instance_ids):
+        """Drops the instances other than the given ones."""
+        instance_ids = set(instance_ids)
+        with self._lock:
+            removed = [instance_id for instance_id in self._instances
+                       if instance_id not in instance_ids]
+            for instance_id in removed:
+                self._remove(instance_id,
+                             self._instances.pop(instance_id).process_names)
+        return len(removed)
+
+    def expire(self, before):
+        """Drops the instances whose latest sample is older than ``before``.
+
+        Deleted or stopped instances no longer publish samples, so this is
+        how they leave the index.
+        """
+        with self._lock:
+            expired = [instance_id
+                       for instance_id, indexed in self._instances.items()
+                       if indexed.timestamp < before]
+            for instance_id in expired:
+                self._remove(instance_id,
+                             self._instances.pop(instance_id).process_names)
+        return len(expired)
+
+    def _names(self, name, prefix):
+        if not prefix:
+            return [name] if name in self._postings else []
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._postings)
+        names = self._sorted_names
+        start = bisect.bisect_left(names, name)
+        end = start
+        while end < len(names) and names[end].startswith(name):
+            end += 1
+        return names[start:end]
+
+    def _hits(self, name, prefix):
+        # By process name, then instance id and pid.
+        for process_name in self._names(name, prefix):
+            instances = self._postings[process_name]
+            for instance_id in sorted(instances):
+                instance_name = self._instances[instance_id].name
+                for pid, start_time, offset in sorted(
+                        instances[instance_id], key=operator.itemgetter(0)):
+                    yield ProcessHit(instance_id, instance_name,
+                                     process_name, pid, start_time, offset)
+
+    def lookup(self, name, prefix=False, marker=None, limit=None):
+        """Returns a ProcessHit for each process called ``name``.
+
+        With ``prefix``, processes whose name starts with ``name`` match.
+        The hits are sorted by process name, instance and pid; ``marker`` is
+        the hit_id() of the last hit of the previous page, and at most
+        ``limit`` hits are returned. A marker no longer in the index gets no
+        hits, rather than the first page again.
+        """
+        with self._lock:
+            hits = self._hits(name, prefix)
+            if marker is not None:
+                for hit in hits:
+                    if hit_id(hit) == marker:
+                        break
+                else:
+                    return []
+            return list(itertools.islice(hits, limit))
+
+    def frequencies(self, project_id=None):
+        """Returns how many instances run each process name.
+
+        Returns the number of instances counted, of a single project if
+        ``project_id`` is given, and a list of (name, instance count) pairs,
+        most common names first.
+        """
+        with self._lock:
+            name_ids = [indexed.name_ids
+                        for indexed in self._instances.values()
+                        if project_id is None or
+                        indexed.project_id == project_id]
+            names = list(self._names_by_id)
+        counts = frequency.count_ids(name_ids, len(names))
+        # The count of a released id is 0.
+        frequencies = [(names[name_id], count)
+                       for name_id, count in enumerate(counts) if count]
+        frequencies.sort(key=lambda item: (-item[1], item[0]))
+        return len(name_ids), frequencies
+
+    def stats(self):
+        with self._lock:
+            return {'instances': len(self._instances),
+                    'names': len(self._postings),
+                    'high_water': self.high_water,
+                    'refreshed_at': self.refreshed_at}
+
+
+_index = FleetProcessIndex()
+_refresh_lock = threading.Lock()
+
+
+def get_index():
+    return _index
+
+
+def _to_datetime(timestamp):
+    return datetime.datetime.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def list_instance_ids(request):
+    """Returns the ids of the instances of all projects.
+
+    They are listed from the server cache of the region, whether or not the
+    admin instance list is served from it.
+    """
+    cached = server_cache.get_cache(request)
+    cached.sync(request)
+    return [server.id for server in cached.servers()]
+
+
+def fetch_samples(request, instance_ids, since):
+    """Returns the newest process list sample of each instance published
+    after ``since``, keyed by instance id.
+    """
+    return meters.get_latest_samples(request, instance_ids, since=since)
+
+
+def refresh(request, index=None):
+    """Indexes the process list samples published since the last refresh.
+
+    Returns the number of instances that were re-indexed.
+    """
+    if index is None:
+        index = _index
+    window = getattr(settings, 'MONITOR_PROCESS_INDEX_WINDOW', DEFAULT_WINDOW)
+    overlap = getattr(settings, 'MONITOR_PROCESS_INDEX_OVERLAP',
+                      DEFAULT_OVERLAP)
+    cutoff = (datetime.datetime.utcnow() -
+              datetime.timedelta(seconds=window))
+    since = cutoff
+    if index.high_water is not None:
+        # Samples are stored some time after they are taken; the overlap
+        # catches those stored after the previous refresh. Samples that
+        # are not newer than the indexed ones are ignored.
+        since = max(cutoff, _to_datetime(index.high_water) -
+                    datetime.timedelta(seconds=overlap))
+    instance_ids = list_instance_ids(request)
+    updated = 0
+    for instance_id, sample in fetch_samples(
+            request, instance_ids, since.isoformat()).items():
+        try:
+            processes = process_list.decode(sample.counter_volume)
+        except process_list.ProcessListDecodeError:
+            LOG.warning('Skipping invalid process list of instance %s.',
+                        instance_id)
+            continue
+        metadata = getattr(sample, 'resource_metadata', None) or {}
+        if index.update(instance_id, sample.timestamp, processes,
+                        instance_name=metadata.get('display_name'),
+                        project_id=sample.project_id):
+            updated += 1
+    # Deleted instances leave the index, as do stopped ones once their
+    # latest sample is older than the window.
+    index.retain(instance_ids)
+    index.expire(cutoff.isoformat())
+    index.refreshed_at = time.time()
+    LOG.debug('process index refreshed: %d instances updated, %s',
+              updated, index.stats())
+    return updated
+
+
+def _refresh_in_background(request, index):
+    try:
+        refresh(request, index)
+    except Exception:
+        LOG.exception('Unable to refresh the process index.')
+    finally:
+        _refresh_lock.release()
+
+
+def maybe_refresh(request, index=None):
+    """Refreshes the index in a background thread if it is stale.
+
+    Lookups are answered from the current index meanwhile, which is empty
+    until the first refresh of the worker completes. At most one refresh
+    runs at a time; it calls the APIs with the credentials of the request
+    that started it.
+    """
+    if index is None:
+        index = _index
+    interval = getattr(settings, 'MONITOR_PROCESS_INDEX_REFRESH',
+                       DEFAULT_REFRESH_INTERVAL)
+    refreshed_at = index.refreshed_at
+    if refreshed_at is not None and time.time() - refreshed_at < interval:
+        return
+    if not _refresh_lock.acquire(False):
+        return
+    try:
+        context = concurrency.DetachedRequest(request)
+        thread = threading.Thread(target=_refresh_in_background,
+                                  args=(context, index))
+        thread.daemon = True
+        thread.start()
+    except Exception:
+        _refresh_lock.release()
+        raise
@@ -0,0 +1,44 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Counting of process names across instances.
+
+NumPy is used when it is installed; otherwise the ids are counted by
+collections.Counter, which is slower on large fleets but has no
+dependency.
+"""
+
+import collections
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def count_ids(id_arrays, size):
+    """Returns how many times each id of ``range(size)`` occurs.
+
+    ``id_arrays`` are ``array.array('i')`` of ids; an instance's array
+    holds each of its name ids once, so the counts are instance counts.
+    """
+    id_arrays = [ids for ids in id_arrays if len(ids)]
+    if not id_arrays:
+        return [0] * size
+    if numpy is not None:
+        ids = numpy.concatenate([numpy.frombuffer(ids, dtype=numpy.intc)
+                                 for ids in id_arrays])
+        return numpy.bincount(ids, minlength=size).tolist()
+    counter = collections.Counter(itertools.chain.from_iterable(id_arrays))
+    return [counter.get(name_id, 0) for name_id in range(size)]
@@ -0,0 +1,48 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from django.core.urlresolvers import reverse
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import tables
+
+from openstack_dashboard.dashboards.monitor.processes import fleet
+
+
+def get_instance_link(hit):
+    return reverse('horizon:monitor:instances:detail',
+                   args=[hit.instance_id])
+
+
+class ProcessSearchFilterAction(tables.FilterAction):
+    name = "filter_processes"
+    filter_type = "server"
+    filter_choices = (('name', _("Process Name ="), True),
+                      ('prefix', _("Process Name Starts With"), True))
+
+
+class ProcessSearchTable(tables.DataTable):
+    instance = tables.Column(lambda hit: hit.instance_name or hit.instance_id,
+                             link=get_instance_link,
+                             verbose_name=_("Instance"))
+    name = tables.Column('name', verbose_name=_('Process Name'))
+    pid = tables.Column('pid', verbose_name=_('Pid'))
+    start_time = tables.Column('start_time', verbose_name=_('Start Time'))
+
+    def get_object_id(self, obj):
+        return fleet.hit_id(obj)
+
+    class Meta(object):
+        name = 'processes'
+        verbose_name = _("Processes")
+        table_actions = (ProcessSearchFilterAction,)
+        multi_select = False
@@ -0,0 +1,218 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import array
+
+from django.core.urlresolvers import reverse
+from django import http
+
+from mox3.mox import IgnoreArg  # noqa
+from mox3.mox import IsA  # noqa
+
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_ceilometer
+from openstack_dashboard.dashboards.monitor.benchmarks import fake_nova
+from openstack_dashboard.dashboards.monitor.instances import meters
+from openstack_dashboard.dashboards.monitor.instances import process_list
+from openstack_dashboard.dashboards.monitor.instances import server_cache
+from openstack_dashboard.dashboards.monitor.processes import fleet
+from openstack_dashboard.dashboards.monitor.processes import frequency
+from openstack_dashboard.dashboards.monitor.processes import tables
+from openstack_dashboard.test import helpers as test
+
+
+INDEX_URL = reverse('horizon:monitor:processes:index')
+
+
+def process(name, pid, start_time='2016-10-18 02:39:00'):
+    return process_list.Process('0x%x' % pid, name, pid, 0, 0, '0x0',
+                                start_time)
+
+
+class FakeSample(object):
+    def __init__(self, resource_id, timestamp, processes):
+        self.resource_id = resource_id
+        self.project_id = 'project-%s' % resource_id
+        self.timestamp = timestamp
+        self.counter_volume = repr([
+            [('offset', p.offset), ('process_name', p.name), ('pid', p.pid),
+             ('uid', p.uid), ('gid', p.gid), ('dtb', p.dtb),
+             ('start_time', p.start_time)] for p in processes])
+        self.resource_metadata = {'display_name': 'vm-%s' % resource_id}
+
+
+class FleetProcessIndexTests(test.TestCase):
+    def test_lookup(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00',
+                     [process('sshd', 10), process('nginx', 11),
+                      process('nginx', 12)])
+        index.update('b', '2016-10-18T02:00:00', [process('sshd', 20)])
+        hits = index.lookup('nginx')
+        self.assertEqual([('a', 11), ('a', 12)],
+                         sorted((h.instance_id, h.pid) for h in hits))
+        self.assertEqual(['a', 'b'],
+                         sorted(h.instance_id for h in index.lookup('sshd')))
+        self.assertEqual([], index.lookup('ssh'))
+        self.assertEqual(2, len(index.lookup('ssh', prefix=True)))
+
+    def test_kernel_thread_hits_have_distinct_row_ids(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00',
+                     [process_list.Process('0x%x' % offset, 'kthreadd', 0, 0,
+                                           0, '0x0', '09:00')
+                      for offset in range(3)])
+        table = tables.ProcessSearchTable(self.request,
+                                          data=index.lookup('kthreadd'))
+        self.assertEqual(3, len(set(table.get_object_id(hit)
+                                    for hit in table.data)))
+
+    def test_lookup_pages(self):
+        index = fleet.FleetProcessIndex()
+        for instance_id in ('c', 'a', 'b'):
+            index.update(instance_id, '2016-10-18T02:00:00',
+                         [process('sshd', 20), process('sshd', 10)])
+        hits = index.lookup('sshd', limit=4)
+        self.assertEqual([('a', 10), ('a', 20), ('b', 10), ('b', 20)],
+                         [(h.instance_id, h.pid) for h in hits])
+        hits = index.lookup('sshd', marker=fleet.hit_id(hits[-1]), limit=4)
+        self.assertEqual([('c', 10), ('c', 20)],
+                         [(h.instance_id, h.pid) for h in hits])
+        self.assertEqual([], index.lookup('sshd', marker='gone'))
+
+    def test_names_released_with_their_last_instance(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00',
+                     [process('sshd', 10), process('nginx', 11)])
+        index.update('b', '2016-10-18T03:00:00', [process('xmrig', 20)])
+        index.remove('b')
+        index.expire('2016-10-18T02:30:00')
+        self.assertEqual([], index._names_by_id)
+        index.update('a', '2016-10-18T04:00:00', [process('bash', 30)])
+        self.assertEqual(['bash'], index._names_by_id)
+        self.assertEqual((1, [('bash', 1)]), index.frequencies())
+
+    def test_update_replaces_instance_processes(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00', [process('sshd', 10)])
+        self.assertTrue(index.update('a', '2016-10-18T02:10:00',
+                                     [process('bash', 30)]))
+        self.assertEqual([], index.lookup('sshd'))
+        self.assertEqual(['a'], [h.instance_id for h in index.lookup('bash')])
+        # Older samples do not replace newer ones.
+        self.assertFalse(index.update('a', '2016-10-18T02:05:00',
+                                      [process('sshd', 10)]))
+        self.assertEqual('2016-10-18T02:10:00', index.high_water)
+
+    def test_expire(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00', [process('sshd', 10)])
+        index.update('b', '2016-10-18T03:00:00', [process('sshd', 20)])
+        self.assertEqual(1, index.expire('2016-10-18T02:30:00'))
+        self.assertEqual(['b'],
+                         [h.instance_id for h in index.lookup('sshd')])
+
+    def test_frequencies(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00',
+                     [process('sshd', 10), process('nginx', 11),
+                      process('nginx', 12)], project_id='p1')
+        index.update('b', '2016-10-18T02:00:00',
+                     [process('sshd', 20), process('xmrig', 21)],
+                     project_id='p2')
+        self.assertEqual((2, [('sshd', 2), ('nginx', 1), ('xmrig', 1)]),
+                         index.frequencies())
+        self.assertEqual((1, [('sshd', 1), ('xmrig', 1)]),
+                         index.frequencies(project_id='p2'))
+        index.remove('b')
+        self.assertEqual((1, [('nginx', 1), ('sshd', 1)]),
+                         index.frequencies())
+
+    def test_count_ids_without_numpy(self):
+        ids = [array.array('i', [0, 2]), array.array('i', [2]),
+               array.array('i')]
+        self.mox.stubs.Set(frequency, 'numpy', None)
+        self.assertEqual([1, 0, 2, 0], frequency.count_ids(ids, 4))
+
+    @test.update_settings(MONITOR_SERVER_CACHE_REFRESH=0)
+    def test_instances_listed_from_server_cache(self):
+        server_cache._cache.clear()
+        nova = fake_nova.FakeNova(servers=30)
+        with nova.patch():
+            self.assertEqual(30, len(fleet.list_instance_ids(self.request)))
+            nova.delete(sorted(nova.servers)[0])
+            calls = nova.calls['server_list']
+            # Only the servers changed since are listed again.
+            self.assertEqual(29, len(fleet.list_instance_ids(self.request)))
+            self.assertEqual(calls + 1, nova.calls['server_list'])
+
+    @test.update_settings(MONITOR_PROCESS_INDEX_WINDOW=10 ** 10,
+                          MONITOR_PROCESS_INDEX_OVERLAP=600)
+    def test_refresh_is_incremental(self):
+        index = fleet.FleetProcessIndex()
+        new = FakeSample('a', '2016-10-18T02:10:00', [process('bash', 30)])
+        other = FakeSample('b', '2016-10-18T02:05:00', [process('sshd', 20)])
+        self.mox.StubOutWithMock(fleet, 'list_instance_ids')
+        self.mox.StubOutWithMock(meters, 'get_latest_samples')
+        fleet.list_instance_ids(IsA(http.HttpRequest)).AndReturn(['a', 'b'])
+        meters.get_latest_samples(IsA(http.HttpRequest), ['a', 'b'],
+                                  since=IgnoreArg()) \
+            .AndReturn({'a': new, 'b': other})
+        # 'a' was deleted. The second refresh goes back from the newest
+        # indexed sample by the overlap, for samples stored late.
+        fleet.list_instance_ids(IsA(http.HttpRequest)).AndReturn(['b'])
+        meters.get_latest_samples(IsA(http.HttpRequest), ['b'],
+                                  since='2016-10-18T02:00:00') \
+            .AndReturn({'b': other})
+        self.mox.ReplayAll()
+
+        self.assertEqual(2, fleet.refresh(self.request, index))
+        self.assertEqual('vm-a', index.lookup('bash')[0].instance_name)
+        self.assertEqual(0, fleet.refresh(self.request, index))
+        self.assertEqual(['b'],
+                         [h.instance_id for h in index.lookup('sshd')])
+        self.assertEqual([], index.lookup('bash'))
+
+    def test_refresh_indexes_sample_projects(self):
+        index = fleet.FleetProcessIndex()
+        ceilometer = fake_ceilometer.FakeCeilometer(instances=6,
+                                                    processes=10, projects=3)
+        self.mox.StubOutWithMock(fleet, 'list_instance_ids')
+        fleet.list_instance_ids(IsA(http.HttpRequest)) \
+            .AndReturn(ceilometer.instance_ids)
+        self.mox.ReplayAll()
+
+        with ceilometer.patch():
+            self.assertEqual(6, fleet.refresh(self.request, index))
+        # The instances share their process lists.
+        count, frequencies = index.frequencies(project_id='project-1')
+        self.assertEqual(2, count)
+        self.assertTrue(frequencies)
+        self.assertEqual([2] * len(frequencies),
+                         [instances for _name, instances in frequencies])
+
+
+class ProcessSearchViewTests(test.BaseAdminViewTests):
+    def test_search(self):
+        index = fleet.FleetProcessIndex()
+        index.update('a', '2016-10-18T02:00:00', [process('sshd', 10)])
+        index.refreshed_at = fleet.time.time()
+        self.mox.StubOutWithMock(fleet, 'get_index')
+        fleet.get_index().MultipleTimes().AndReturn(index)
+        self.mox.ReplayAll()
+
+        res = self.client.post(INDEX_URL,
+                               {'processes__filter_processes__q_field':
+                                'name',
+                                'processes__filter_processes__q': 'sshd'})
+        self.assertTemplateUsed(res, 'monitor/processes/index.html')
+        self.assertEqual(['a'],
+                         [h.instance_id for h in res.context['table'].data])
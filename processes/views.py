@@ -0,0 +1,59 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+from horizon import tables
+from horizon.utils import functions as utils
+
+from openstack_dashboard.dashboards.monitor.processes import fleet
+from openstack_dashboard.dashboards.monitor.processes \
+    import tables as project_tables
+
+
+class IndexView(tables.DataTableView):
+    table_class = project_tables.ProcessSearchTable
+    template_name = 'monitor/processes/index.html'
+    page_title = _("Process Search")
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['index_stats'] = fleet.get_index().stats()
+        return context
+
+    def has_more_data(self, table):
+        return self._more
+
+    def get_data(self):
+        self._more = False
+        index = fleet.get_index()
+        try:
+            fleet.maybe_refresh(self.request, index)
+        except Exception:
+            exceptions.handle(self.request,
+                              _('Unable to refresh the process index.'))
+        filters = self.get_filters()
+        marker = self.request.GET.get(
+            project_tables.ProcessSearchTable._meta.pagination_param)
+        limit = utils.get_page_size(self.request)
+        # One more hit than shown tells whether another page follows.
+        if filters.get('name'):
+            hits = index.lookup(filters['name'], marker=marker,
+                                limit=limit + 1)
+        elif filters.get('prefix'):
+            hits = index.lookup(filters['prefix'], prefix=True,
+                                marker=marker, limit=limit + 1)
+        else:
+            hits = []
+        self._more = len(hits) > limit
+        return hits[:limit]
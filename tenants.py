@@ -0,0 +1,117 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Project names shared by the panels of the dashboard.
+
+The overview and the admin instance list show the name of the project of
+each row. Both resolve it from an index of the projects loaded with one
+``tenant_list`` call and kept for ``MONITOR_TENANT_CACHE_TTL`` seconds, so
+resolving the names of many rows takes one dictionary lookup each.
+
+Projects the index does not list, such as ones created after it was loaded
+or deleted ones, and the projects of rows updated without the index, are
+looked up once per distinct id, concurrently. Their results are kept for
+``MONITOR_TENANT_LOOKUP_TTL`` seconds, including projects Keystone reports
+as not found.
+"""
+
+import functools
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+
+from horizon import exceptions
+
+from openstack_dashboard import api
+from openstack_dashboard.dashboards.monitor import cache
+
+DEFAULT_TTL = 300
+DEFAULT_LOOKUP_TTL = 300
+DEFAULT_LOOKUP_WORKERS = 4
+
+
+def _not_found(tenant_id):
+    return exceptions.NotFound(_('Project "%s" was not found.') % tenant_id)
+
+
+_cache = cache.from_setting(cache.TTLCache, 'MONITOR_TENANT_CACHE_TTL',
+                            DEFAULT_TTL)
+_lookups = cache.from_setting(cache.LookupCache, 'MONITOR_TENANT_LOOKUP_TTL',
+                              DEFAULT_LOOKUP_TTL, not_found=_not_found)
+
+
+class TenantIndex(object):
+    """The projects of a ``tenant_list`` call, by id and by name."""
+
+    def __init__(self, tenants):
+        self.tenants = list(tenants)
+        self._by_id = dict((tenant.id, tenant) for tenant in self.tenants)
+        self._ids_by_name = {}
+        for tenant in self.tenants:
+            self._ids_by_name.setdefault(getattr(tenant, 'name', None),
+                                         tenant.id)
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def __iter__(self):
+        return iter(self.tenants)
+
+    def get(self, tenant_id, default=None):
+        return self._by_id.get(tenant_id, default)
+
+    def id_of(self, name):
+        """Returns the id of the first project named ``name``, or None."""
+        return self._ids_by_name.get(name)
+
+
+def _scope(request):
+    # The projects listed depend on the identity endpoint and, for domain
+    # admins, on the domain the dashboard is scoped to.
+    return (getattr(request.user, 'endpoint', None),
+            request.session.get('domain_context'))
+
+
+def get_index(request):
+    """Returns the index of the projects visible to a request."""
+    def load():
+        tenants, has_more = api.keystone.tenant_list(request)
+        return TenantIndex(tenants)
+    return _cache.get().get_or_load(_scope(request), load)
+
+
+def resolve(request, tenant_ids, index=None):
+    """Returns the projects of the given ids.
+
+    Ids are resolved from ``index``, or from the cached index if none is
+    given; the index is not loaded for this. Each distinct id the index does
+    not list is looked up at most once, and the lookups run concurrently on
+    at most ``MONITOR_TENANT_LOOKUP_WORKERS`` threads. Returns the projects
+    found and the errors of the others, both keyed by project id.
+    """
+    scope = _scope(request)
+    if index is None:
+        index = _cache.get().get(scope)
+    workers = getattr(settings, 'MONITOR_TENANT_LOOKUP_WORKERS',
+                      DEFAULT_LOOKUP_WORKERS)
+    return _lookups.get().lookup(
+        scope, tenant_ids,
+        functools.partial(api.keystone.tenant_get, request, admin=True),
+        workers, known=index.get if index is not None else None)
+
+
+def get_name(request, tenant_id):
+    """Returns the name of a project, or None if it cannot be resolved."""
+    found, errors = resolve(request, [tenant_id])
+    return getattr(found.get(tenant_id), 'name', None)
+